@@ -7,7 +7,11 @@ from .models import (
     TrainingQuotation, TrainingSession, TrainingAttendance,
     InternalVacancy, VacancyApplication, VacancyTransition,
     # Forum Models
-    ForumCategory, ForumPost
+    ForumCategory, ForumPost,
+    # Active Directory sync
+    LDAPSyncState,
+    # Headcount history
+    HeadcountSnapshot
 )
 
 
@@ -29,7 +33,7 @@ class LibraryDocumentAdmin(admin.ModelAdmin):
     """Admin interface for LibraryDocument model - Biblioteca de Documentos Unificada"""
     list_display = ['code', 'title', 'document_type', 'status', 'department', 'author', 'approval_decision']
     search_fields = ['code', 'title', 'description', 'content', 'tags']
-    list_filter = ['document_type', 'status', 'department', 'approval_decision', 'groups']
+    list_filter = ['document_type', 'status', 'department', 'approval_decision', 'is_public', 'groups']
     raw_id_fields = ['author', 'approver']
     filter_horizontal = ['groups']
     ordering = ['-created_at']
@@ -53,7 +57,11 @@ class LibraryDocumentAdmin(admin.ModelAdmin):
         ('Estadísticas', {
             'fields': ('download_count', 'view_count')
         }),
+        ('Metadatos del Archivo', {
+            'fields': ('file_size', 'file_mime_type', 'file_sha256', 'file_page_count')
+        }),
     )
+    readonly_fields = ['file_size', 'file_mime_type', 'file_sha256', 'file_page_count']
 
 
 @admin.register(Policy)
@@ -170,8 +178,32 @@ class ForumCategoryAdmin(admin.ModelAdmin):
 @admin.register(ForumPost)
 class ForumPostAdmin(admin.ModelAdmin):
     """Admin interface for ForumPost model"""
-    list_display = ['title', 'category', 'author', 'is_pinned', 'is_locked', 'views_count', 'created_at']
+    list_display = ['title', 'category', 'author', 'is_pinned', 'is_locked', 'views_count', 'replies_count', 'created_at']
     search_fields = ['title', 'content', 'author__username']
     list_filter = ['category', 'is_pinned', 'is_locked', 'created_at']
     raw_id_fields = ['author', 'parent_post']
     ordering = ['-created_at']
+
+
+# ========================================
+# ACTIVE DIRECTORY SYNC ADMIN
+# ========================================
+
+@admin.register(LDAPSyncState)
+class LDAPSyncStateAdmin(admin.ModelAdmin):
+    """Admin interface for LDAPSyncState; deleting a row forces the next sync to be a full one"""
+    list_display = ['server_uri', 'search_base', 'highest_usn', 'last_sync_at', 'last_full_sync_at']
+    readonly_fields = ['server_uri', 'search_base', 'highest_usn', 'last_sync_at', 'last_full_sync_at', 'updated_at']
+
+
+# ========================================
+# HEADCOUNT HISTORY ADMIN
+# ========================================
+
+@admin.register(HeadcountSnapshot)
+class HeadcountSnapshotAdmin(admin.ModelAdmin):
+    """Admin interface for HeadcountSnapshot; rows are written by the snapshot_headcount command"""
+    list_display = ['date', 'group_name', 'active_count']
+    list_filter = ['date']
+    search_fields = ['group_name']
+    readonly_fields = ['date', 'group_name', 'active_count', 'created_at']
@@ -0,0 +1,157 @@
+"""
+Token authentication backed by an in-process LRU + TTL cache.
+
+CachedTokenAuthentication accepts the token from the
+``Authorization: Token <key>`` header or from the HttpOnly ``auth_token``
+cookie set by ldap_login. Resolved tokens are kept in a process-local cache
+(settings.AUTH_TOKEN_CACHE_TTL seconds, AUTH_TOKEN_CACHE_SIZE entries), so
+cache hits authenticate without touching the database.
+
+Entries are dropped when the token is deleted (ldap_logout, admin) or the
+user is saved or deleted (deactivation, LDAP sync), see api/signals.py.
+Other worker processes pick up changes when their entry expires.
+Bulk updates that bypass signals must call invalidate_users().
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework import exceptions
+from rest_framework.authentication import (
+    SessionAuthentication, TokenAuthentication, get_authorization_header,
+)
+from rest_framework.authtoken.models import Token
+
+from . import instrumentation
+
+AUTH_COOKIE_NAME = 'auth_token'
+
+
+class TokenCache:
+    """Thread-safe LRU of token key -> (expires_at, token, user) with a per-user index"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1], entry[2]
+
+    def set(self, key, token, user, ttl, max_entries):
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, token, user)
+            self._keys_by_user.setdefault(user.pk, set()).add(key)
+            while len(self._entries) > max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_key(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def invalidate_users(self, user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                for key in list(self._keys_by_user.get(user_id, ())):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            keys = self._keys_by_user.get(entry[2].pk)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_user[entry[2].pk]
+
+
+cache = TokenCache()
+
+
+def resolve_token(key):
+    """
+    Return (token, user) for a token key, or None if the key is unknown.
+    Cached objects are never handed out directly: each caller gets its own
+    copies, so per-request state (role memo, attribute changes) does not leak.
+    """
+    if not key:
+        return None
+    ttl = getattr(settings, 'AUTH_TOKEN_CACHE_TTL', 60)
+    cached = cache.get(key) if ttl > 0 else None
+    if ttl > 0:
+        instrumentation.cache_lookup('token', cached is not None)
+    if cached is None:
+        try:
+            token = Token.objects.select_related('user').get(key=key)
+        except Token.DoesNotExist:
+            return None
+        cached = (token, token.user)
+        if ttl > 0:
+            cache.set(key, token, token.user, ttl, getattr(settings, 'AUTH_TOKEN_CACHE_SIZE', 1024))
+    token, user = cached
+    user = copy.copy(user)
+    token = copy.copy(token)
+    token.user = user
+    return token, user
+
+
+def invalidate_token(key):
+    cache.invalidate_key(key)
+
+
+def invalidate_users(user_ids):
+    cache.invalidate_users(user_ids)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that also reads the auth_token cookie and resolves
+    keys through the token cache.
+
+    A header with an unknown token fails as usual. An unknown cookie token
+    (e.g. after logout in another tab) leaves the request anonymous. Cookie
+    authentication enforces CSRF on unsafe methods like SessionAuthentication.
+    """
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if auth and auth[0].lower() == self.keyword.lower().encode():
+            return super().authenticate(request)
+
+        key = request.COOKIES.get(AUTH_COOKIE_NAME)
+        resolved = resolve_token(key)
+        if resolved is None:
+            return None
+        token, user = resolved
+        if not user.is_active:
+            return None
+        self.enforce_csrf(request)
+        return user, token
+
+    def authenticate_credentials(self, key):
+        resolved = resolve_token(key)
+        if resolved is None:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        token, user = resolved
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        return user, token
+
+    def enforce_csrf(self, request):
+        SessionAuthentication.enforce_csrf(self, request)
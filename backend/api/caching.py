@@ -0,0 +1,212 @@
+"""
+Response cache for read-mostly endpoints, invalidated by generation counters.
+
+Views opt in with ``@cached_response('<endpoint>')``; ENDPOINTS lists the
+models each one reads. A cached response is keyed by:
+
+- the endpoint name, host and query parameters (pagination, ?fields=)
+- the current generation of every model the endpoint reads
+- the caller's ACL fingerprint: staff flag plus the set of group names, so
+  users with the same groups share entries and nobody gets a response
+  computed for a different set of permissions (not for SHARED_ENDPOINTS,
+  whose response is the same for everybody allowed to call them)
+
+Saving or deleting a watched model, or changing one of its many-to-many
+relations, bumps that model's generation (receivers in api/signals.py).
+Keys built afterwards differ, and the old entries are never read again;
+they expire after settings.API_CACHE_TTL seconds (0 disables the cache).
+Bulk writes that bypass signals must call invalidate().
+
+On a miss only one caller recomputes: it takes a short lock in the cache
+(cache.add) while the others poll for its result, for at most
+API_CACHE_LOCK_TIMEOUT seconds before computing it themselves.
+
+Entries live in the Django cache (settings.API_CACHE_ALIAS). The default
+local-memory backend is per process, so other workers only see a bump once
+their entries expire; configure a shared cache (CACHE_REDIS_URL) when running
+several workers.
+"""
+import functools
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpRequest
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from . import instrumentation, roles
+
+# Endpoint -> labels of the models its response is built from (including the
+# related objects serialized with it)
+ENDPOINTS = {
+    'forum-category-active': ('api.ForumCategory', 'api.ForumPost'),
+    'training-provider-active': ('api.TrainingProvider', 'api.TrainingQuotation'),
+    'policy-published': ('api.Policy', 'api.PolicyDistribution', 'api.Department', 'auth.User'),
+    'internal-vacancy-published': ('api.InternalVacancy', 'api.VacancyApplication', 'api.Department', 'auth.User'),
+    'library-document-recent': ('api.LibraryDocument', 'api.Department', 'auth.User', 'auth.Group'),
+    'active_employees_count': ('auth.User', 'auth.Group', 'api.HeadcountSnapshot'),
+    'documents_count': ('api.LibraryDocument', 'auth.Group'),
+}
+
+# Endpoints whose response does not depend on the caller (permission checks still
+# run on every request): one entry is shared by all users instead of one per ACL
+SHARED_ENDPOINTS = frozenset({
+    'forum-category-active', 'training-provider-active', 'policy-published',
+    'internal-vacancy-published', 'active_employees_count',
+})
+
+WATCHED_MODELS = frozenset(label for labels in ENDPOINTS.values() for label in labels)
+
+KEY_PREFIX = 'api:response:'
+GENERATION_PREFIX = 'api:generation:'
+# Seconds between checks for the value another caller is computing
+LOCK_POLL_INTERVAL = 0.02
+
+_MISSING = object()
+
+
+def get_cache():
+    return caches[getattr(settings, 'API_CACHE_ALIAS', 'default')]
+
+
+# -----------------------------
+# Generations
+# -----------------------------
+
+def _initial_generation():
+    # Not 1: a counter that was evicted must not come back with a value old keys used
+    return int(time.time() * 1000)
+
+
+def generations(labels):
+    """Current generation of each model label, in order"""
+    cache = get_cache()
+    keys = [GENERATION_PREFIX + label for label in labels]
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            cache.add(key, _initial_generation(), None)
+            values[key] = cache.get(key)
+    return [values[key] for key in keys]
+
+
+def invalidate(labels=None):
+    """Bump the generation of the given model labels (every watched model when None)"""
+    cache = get_cache()
+    for label in WATCHED_MODELS if labels is None else labels:
+        key = GENERATION_PREFIX + label
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_generation(), None)
+
+
+def model_changed(model, update_fields=None):
+    """Signal entry point: bump the model's generation if a cached endpoint reads it"""
+    label = model._meta.label
+    if label not in WATCHED_MODELS:
+        return
+    if label == 'auth.User' and update_fields is not None and set(update_fields) <= {'last_login'}:
+        # login() bookkeeping; no cached response shows last_login
+        return
+    invalidate([label])
+
+
+# -----------------------------
+# Keys and single-flight computation
+# -----------------------------
+
+def acl_fingerprint(user):
+    if user is None or not user.is_authenticated:
+        return 'anonymous'
+    flags = f'{int(user.is_staff)}{int(user.is_superuser)}'
+    names = '\n'.join(sorted(roles.get_group_names(user)))
+    return flags + hashlib.sha256(names.encode()).hexdigest()[:16]
+
+
+def response_key(endpoint, request):
+    params = sorted((name, value) for name, values in request.GET.lists() for value in values)
+    parts = [
+        endpoint,
+        request.get_host(),
+        repr(params),
+        repr(generations(ENDPOINTS[endpoint])),
+        'shared' if endpoint in SHARED_ENDPOINTS else acl_fingerprint(getattr(request, 'user', None)),
+    ]
+    return KEY_PREFIX + endpoint + ':' + hashlib.sha256('\x00'.join(parts).encode()).hexdigest()
+
+
+def get_or_compute(key, compute, ttl, cacheable=lambda value: True):
+    """
+    Cached value for key, or compute() it with at most one caller per key at a time.
+    Returns (value, hit).
+    """
+    cache = get_cache()
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        return value, True
+
+    lock_key = key + ':lock'
+    lock_timeout = getattr(settings, 'API_CACHE_LOCK_TIMEOUT', 10)
+    owner = cache.add(lock_key, 1, lock_timeout)
+    if not owner:
+        deadline = time.monotonic() + lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            value = cache.get(key, _MISSING)
+            if value is not _MISSING:
+                return value, True
+            if cache.get(lock_key) is None:
+                # The owner finished without storing a value (error or uncacheable result)
+                break
+    try:
+        value = compute()
+        if cacheable(value):
+            cache.set(key, value, ttl)
+    finally:
+        if owner:
+            cache.delete(lock_key)
+    return value, False
+
+
+# -----------------------------
+# View decorator
+# -----------------------------
+
+def cached_response(endpoint):
+    """
+    Cache successful GET responses of a view function or viewset action.
+    Place it below @api_view/@action (and permission decorators), so
+    authentication and permission checks still run on every request.
+    """
+    if endpoint not in ENDPOINTS:
+        raise ValueError(f"Unknown cached endpoint '{endpoint}', add it to api.caching.ENDPOINTS")
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            request = args[0] if isinstance(args[0], (Request, HttpRequest)) else args[1]
+            ttl = getattr(settings, 'API_CACHE_TTL', 300)
+            if ttl <= 0 or request.method != 'GET':
+                return view(*args, **kwargs)
+
+            def compute():
+                response = view(*args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                return response.status_code, response.data
+
+            result, hit = get_or_compute(
+                response_key(endpoint, request), compute, ttl,
+                cacheable=lambda value: isinstance(value, tuple),
+            )
+            instrumentation.cache_lookup('response', hit)
+            if not isinstance(result, tuple):
+                return result
+            response = Response(result[1], status=result[0])
+            response['X-Cache'] = 'HIT' if hit else 'MISS'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,150 @@
+"""
+Conditional GET for the router viewsets.
+
+ConditionalGetMixin gives list and retrieve responses a weak ETag (plus
+Last-Modified and ``Cache-Control: private, no-cache``). When a request's
+If-None-Match still matches, it answers 304 Not Modified before anything is
+serialized.
+
+- retrieve: the ETag covers the object's updated_at and its
+  conditional_fields. It also covers the counts annotated by
+  CountAnnotationMixin and the ids of prefetched many-to-many relations
+  (document groups).
+- list: one aggregate over the filtered queryset is the fingerprint:
+  - Max(updated_at) and the row count
+  - aggregates of conditional_fields and of count_annotations
+  - row counts of prefetched relations
+
+  The row count is handed to the paginator, which then skips its own
+  COUNT(*), so a full response costs no extra query. Lists requested with
+  ?count=false opted out of scanning the whole result and are served
+  unconditionally.
+
+conditional_fields names the columns maintained with update(), such as
+counters and denormalized flags, because update() leaves updated_at untouched.
+ETags also depend on the user, the query string and the renderer.
+
+Only the ETag is compared. HTTP dates have one-second precision and do not
+reflect counters or deleted rows, so If-Modified-Since alone is not honoured.
+Changes that touch none of the above are not detected until the row is saved
+again, for example renaming a related department. Models without updated_at
+are served unconditionally.
+"""
+import hashlib
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import BooleanField, Count, DateField, Max, Q, Sum
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from .pagination import count_requested
+
+
+def make_etag(request, *parts):
+    """Weak ETag of the given validator parts for this user, path, query string and renderer"""
+    renderer = getattr(request, 'accepted_renderer', None)
+    key = repr([
+        request.path,
+        getattr(request.user, 'pk', None),
+        getattr(renderer, 'format', None),
+        sorted(request.GET.lists()),
+        *parts,
+    ])
+    return 'W/"%s"' % hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def not_modified(request, etag):
+    """304 response when If-None-Match matches etag, else None"""
+    return get_conditional_response(request._request, etag=etag)
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # Browsers keep the body and revalidate it on every use
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _field_aggregate(field):
+    if isinstance(field, BooleanField):
+        return Count('pk', filter=Q(**{field.name: True}))
+    if isinstance(field, DateField):
+        return Max(field.name)
+    return Sum(field.name)
+
+
+class ConditionalGetMixin:
+    """
+    ETag validators and 304 Not Modified responses for list and retrieve
+    (see api/conditional.py).
+    """
+    last_modified_field = 'updated_at'
+    # Columns updated without touching updated_at
+    conditional_fields = ()
+
+    def supports_conditional_get(self):
+        try:
+            self.queryset.model._meta.get_field(self.last_modified_field)
+        except FieldDoesNotExist:
+            return False
+        return True
+
+    def get_list_fingerprint(self, queryset):
+        model = queryset.model
+        aggregates = {
+            'conditional_modified': Max(self.last_modified_field),
+            'conditional_rows': Count('pk', distinct=True),
+        }
+        for name in self.conditional_fields:
+            aggregates[f'conditional_{name}'] = _field_aggregate(model._meta.get_field(name))
+        for name, aggregate in getattr(self, 'count_annotations', {}).items():
+            aggregates[f'conditional_{name}'] = aggregate
+        for lookup in queryset._prefetch_related_lookups:
+            if isinstance(lookup, str) and '__' not in lookup:
+                aggregates[f'conditional_{lookup}'] = Count(lookup)
+        return queryset.order_by().aggregate(**aggregates)
+
+    def get_detail_fingerprint(self, instance):
+        deferred = instance.get_deferred_fields()
+        fingerprint = [getattr(instance, name) for name in self.conditional_fields if name not in deferred]
+        fingerprint += [getattr(instance, name, None) for name in getattr(self, 'count_annotations', {})]
+        prefetched = getattr(instance, '_prefetched_objects_cache', {})
+        fingerprint += [(name, sorted(obj.pk for obj in prefetched[name])) for name in sorted(prefetched)]
+        return fingerprint
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        if not self.supports_conditional_get() or not count_requested(request):
+            return self.list_response(queryset)
+
+        fingerprint = self.get_list_fingerprint(queryset)
+        etag = make_etag(request, 'list', sorted(fingerprint.items()))
+        response = not_modified(request, etag)
+        if response is None:
+            # The paginator reuses the row count instead of running COUNT(*)
+            self.queryset_count = fingerprint['conditional_rows']
+            response = self.list_response(queryset)
+        return set_validators(response, etag, fingerprint['conditional_modified'])
+
+    def list_response(self, queryset):
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        if not self.supports_conditional_get():
+            return Response(self.get_serializer(instance).data)
+
+        last_modified = getattr(instance, self.last_modified_field)
+        etag = make_etag(request, 'detail', instance.pk, last_modified, self.get_detail_fingerprint(instance))
+        response = not_modified(request, etag)
+        if response is None:
+            response = Response(self.get_serializer(instance).data)
+        return set_validators(response, etag, last_modified)
@@ -0,0 +1,145 @@
+"""
+Write-behind counters for view, download and forum view counts.
+
+Incrementing a counter only touches an in-process buffer. The buffer is
+flushed periodically (settings.COUNTER_FLUSH_INTERVAL seconds) by a daemon
+thread that turns all pending increments into a few batched
+``UPDATE ... SET field = field + N`` statements. Using F() keeps concurrent
+workers from losing updates, and update() leaves updated_at untouched.
+
+COUNTER_FLUSH_INTERVAL = 0 disables buffering (each increment is written
+immediately), which is what the test-suite and single-shot scripts want.
+Pending increments are also flushed when the buffer grows past
+COUNTER_MAX_PENDING keys and at interpreter exit.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+# Counter name -> (model label, field)
+COUNTERS = {
+    'document_view': ('api.LibraryDocument', 'view_count'),
+    'document_download': ('api.LibraryDocument', 'download_count'),
+    'forum_view': ('api.ForumPost', 'views_count'),
+}
+
+# Keep UPDATE ... WHERE pk IN (...) below SQLite's parameter limit
+FLUSH_BATCH_SIZE = 500
+
+
+class CounterBuffer:
+    """Thread-safe buffer of pending counter increments"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = defaultdict(int)
+        self._thread = None
+
+    def increment(self, name, pk, amount=1):
+        if name not in COUNTERS:
+            raise ValueError(f"Unknown counter '{name}'")
+        with self._lock:
+            self._pending[(name, int(pk))] += amount
+            size = len(self._pending)
+
+        interval = getattr(settings, 'COUNTER_FLUSH_INTERVAL', 10)
+        if interval <= 0 or size >= getattr(settings, 'COUNTER_MAX_PENDING', 10000):
+            self.flush()
+        else:
+            self._ensure_thread(interval)
+
+    def pending(self, name, pk):
+        """Increments recorded for an object but not yet written"""
+        with self._lock:
+            return self._pending.get((name, int(pk)), 0)
+
+    def flush(self):
+        """Write all pending increments, returns the number of rows updated"""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(int)
+        if not pending:
+            return 0
+
+        # (name, amount) -> [pk, ...] so equal increments share one UPDATE
+        batches = defaultdict(list)
+        for (name, pk), amount in pending.items():
+            batches[(name, amount)].append(pk)
+
+        updated = 0
+        for (name, amount), pks in batches.items():
+            model_label, field = COUNTERS[name]
+            model = apps.get_model(model_label)
+            for start in range(0, len(pks), FLUSH_BATCH_SIZE):
+                chunk = pks[start:start + FLUSH_BATCH_SIZE]
+                try:
+                    updated += model.objects.filter(pk__in=chunk).update(**{field: F(field) + amount})
+                except Exception:
+                    logger.exception(f"Failed to flush counter '{name}', will retry")
+                    with self._lock:
+                        for pk in chunk:
+                            self._pending[(name, pk)] += amount
+        return updated
+
+    def _ensure_thread(self, interval):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run, args=(interval,), name='counter-flush', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Counter flush failed")
+            finally:
+                close_old_connections()
+
+    def _reset_after_fork(self):
+        # The flusher thread does not survive fork(); pending counts belong to the parent
+        self._lock = threading.Lock()
+        self._pending = defaultdict(int)
+        self._thread = None
+
+
+buffer = CounterBuffer()
+
+
+def increment(name, pk, amount=1):
+    buffer.increment(name, pk, amount)
+
+
+def pending(name, pk):
+    return buffer.pending(name, pk)
+
+
+def flush():
+    return buffer.flush()
+
+
+def _flush_at_exit():
+    try:
+        buffer.flush()
+    except Exception:
+        logger.exception("Counter flush at exit failed")
+
+
+atexit.register(_flush_at_exit)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=buffer._reset_after_fork)
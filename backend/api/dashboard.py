@@ -0,0 +1,144 @@
+"""
+Home page dashboard: every figure of the page in one request (/api/dashboard/).
+
+Widgets are registered with @widget and called with the request's user.
+?widgets=a,b selects which ones are computed; without it the response has
+DEFAULT_WIDGETS, the figures the home page shows. Widgets marked
+``authenticated`` are null for anonymous requests.
+
+Widget values can be cached through api/caching.py, stampede-protected:
+
+- ``cache='shared'``: one value for everybody (headcount)
+- ``cache='acl'``: one value per ACL fingerprint (group set)
+
+A cached value is recomputed after settings.DASHBOARD_CACHE_TTL seconds or as
+soon as one of the widget's ``models`` changes; those labels must be listed
+in caching.ENDPOINTS so their generations are maintained.
+"""
+from collections import namedtuple
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import caching, headcount, roles
+from .models import LibraryDocument, PolicyDistribution, TrainingAttendance
+
+# Roles that review documents pending approval
+DOCUMENT_APPROVER_ROLES = [
+    'Document_Managers', 'Department_Managers', 'Administradores_Documentos', 'Gerentes_Departamento',
+]
+
+# Rows returned by list widgets
+LIST_LIMIT = 5
+
+DEFAULT_WIDGETS = ('user', 'headcount', 'documents')
+
+Widget = namedtuple('Widget', ['name', 'compute', 'authenticated', 'cache', 'models'])
+
+WIDGETS = {}
+
+
+def widget(name, authenticated=False, cache=None, models=()):
+    """Register a dashboard widget: compute(user) -> JSON-serializable value"""
+    if cache is not None and not set(models) <= caching.WATCHED_MODELS:
+        raise ValueError(f"Widget '{name}' depends on models without cache generations")
+
+    def decorator(compute):
+        WIDGETS[name] = Widget(name, compute, authenticated, cache, tuple(models))
+        return compute
+    return decorator
+
+
+def compute_widget(spec, user):
+    if spec.authenticated and not user.is_authenticated:
+        return None
+    ttl = getattr(settings, 'DASHBOARD_CACHE_TTL', 60)
+    if spec.cache is None or ttl <= 0:
+        return spec.compute(user)
+    scope = 'shared' if spec.cache == 'shared' else caching.acl_fingerprint(user)
+    generations = ':'.join(str(value) for value in caching.generations(spec.models))
+    key = f'{caching.KEY_PREFIX}dashboard:{spec.name}:{scope}:{generations}'
+    return caching.get_or_compute(key, lambda: spec.compute(user), ttl)[0]
+
+
+def build(user, names=DEFAULT_WIDGETS):
+    return {name: compute_widget(WIDGETS[name], user) for name in names}
+
+
+# -----------------------------
+# Widgets
+# -----------------------------
+
+def user_summary(user):
+    return {
+        'id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'is_staff': user.is_staff,
+        'is_superuser': user.is_superuser,
+        'groups': sorted(roles.get_group_names(user)),
+    }
+
+
+widget('user', authenticated=True)(user_summary)
+
+
+@widget('headcount', cache='shared', models=['auth.User', 'auth.Group', 'api.HeadcountSnapshot'])
+def employee_headcount(user):
+    """Active employees now and at the end of last month (api/headcount.py)"""
+    return headcount.summary()
+
+
+@widget('documents', cache='acl', models=['api.LibraryDocument', 'auth.Group'])
+def documents(user):
+    """Published library documents the user can see"""
+    return {'count': LibraryDocument.objects.filter(status='published').visible_to(user).count()}
+
+
+@widget('pending_approvals', authenticated=True)
+def pending_approvals(user):
+    """Documents waiting for approval, for document managers (null for everybody else)"""
+    if not (user.is_staff or user.is_superuser or roles.has_role(user, DOCUMENT_APPROVER_ROLES)):
+        return None
+    pending = LibraryDocument.objects.filter(status='pending_approval').visible_to(user)
+    return {'documents': pending.count()}
+
+
+@widget('upcoming_trainings', authenticated=True)
+def upcoming_trainings(user):
+    """Next training sessions the user is invited to and has not declined"""
+    attendances = (
+        TrainingAttendance.objects
+        .filter(analyst=user, session__start_datetime__gte=timezone.now())
+        .exclude(confirmation_status='declined')
+        .order_by('session__start_datetime')
+        .values('id', 'confirmation_status', 'session_id', 'session__title',
+                'session__start_datetime', 'session__location')[:LIST_LIMIT]
+    )
+    return [
+        {
+            'id': row['id'],
+            'session': row['session_id'],
+            'title': row['session__title'],
+            'start_datetime': row['session__start_datetime'],
+            'location': row['session__location'],
+            'confirmation_status': row['confirmation_status'],
+        }
+        for row in attendances
+    ]
+
+
+@widget('unacknowledged_policies', authenticated=True)
+def unacknowledged_policies(user):
+    """Policies distributed to the user that still need an acknowledgement"""
+    pending = PolicyDistribution.objects.filter(recipient=user, acknowledged=False)
+    items = [
+        {'id': row['id'], 'policy': row['policy_id'], 'code': row['policy__code'],
+         'title': row['policy__title'], 'distributed_at': row['distributed_at']}
+        for row in pending.order_by('-distributed_at')
+        .values('id', 'policy_id', 'policy__code', 'policy__title', 'distributed_at')[:LIST_LIMIT]
+    ]
+    count = len(items) if len(items) < LIST_LIMIT else pending.count()
+    return {'count': count, 'items': items}
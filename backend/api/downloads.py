@@ -0,0 +1,150 @@
+"""
+File download helpers for protected media (library documents).
+
+serve_file() streams a FieldFile with support for:
+- ETag / If-None-Match (304 Not Modified)
+- Single byte ranges (Range / If-Range -> 206 Partial Content, 416 on bad ranges)
+- Handing the transfer off to the front proxy so Python workers are not
+  tied up pushing large files:
+    settings.LIBRARY_DOWNLOAD_ACCEL = 'nginx'    -> X-Accel-Redirect
+    settings.LIBRARY_DOWNLOAD_ACCEL = 'sendfile' -> X-Sendfile (Apache/lighttpd)
+  The proxy then takes care of ranges itself.
+"""
+import mimetypes
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+
+CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def parse_range(header, size):
+    """
+    Parse a single-range 'Range: bytes=...' header.
+    Returns (start, end) inclusive, None to ignore the header (serve the full
+    file), or raises ValueError when the range cannot be satisfied.
+    """
+    match = _RANGE_RE.match(header.strip()) if header else None
+    if not match:
+        # Missing, malformed or multi-range: a full response is allowed
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError('Empty suffix range')
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError('Range not satisfiable')
+    return start, min(end, size - 1)
+
+
+def etag_matches(header, etag):
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    # Weak comparison as required for If-None-Match
+    candidates = [tag.strip().removeprefix('W/') for tag in header.split(',')]
+    return etag.removeprefix('W/') in candidates
+
+
+def _iter_range(file, start, length):
+    file.seek(start)
+    remaining = length
+    try:
+        while remaining > 0:
+            chunk = file.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def _accel_response(field_file, content_type):
+    mode = getattr(settings, 'LIBRARY_DOWNLOAD_ACCEL', '')
+    if mode == 'nginx':
+        prefix = getattr(settings, 'LIBRARY_DOWNLOAD_ACCEL_PREFIX', '/protected-media/')
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(field_file.name)
+        return response
+    if mode == 'sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = field_file.path
+        return response
+    return None
+
+
+def serve_file(request, field_file, etag, filename=None, on_download=None, size=None):
+    """
+    Build the download response for a FieldFile.
+
+    Args:
+        request: the incoming request (reads Range / If-Range / If-None-Match)
+        field_file: FieldFile to send
+        etag: quoted entity tag identifying the current file content
+        filename: download name, defaults to the stored file's basename
+        on_download: callable run once when the body is actually sent from
+            the first byte (full download or a range starting at 0)
+        size: file size in bytes when already known, skips a storage stat()
+    """
+    filename = filename or field_file.name.split('/')[-1]
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    if etag_matches(request.META.get('HTTP_IF_NONE_MATCH'), etag):
+        response = HttpResponse(status=304)
+        response['ETag'] = etag
+        return response
+
+    if size is None:
+        size = field_file.size
+    byte_range = None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range or if_range.strip() == etag:
+        try:
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+    # Resumed and segmented downloads only count for their first byte,
+    # also when the proxy serves the ranges
+    first_byte = byte_range is None or byte_range[0] == 0
+
+    response = _accel_response(field_file, content_type)
+    if response is not None:
+        if on_download and first_byte:
+            on_download()
+    else:
+        field_file.open('rb')
+        if byte_range is None:
+            response = FileResponse(field_file.file, content_type=content_type)
+            response['Content-Length'] = str(size)
+        else:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(
+                _iter_range(field_file.file, start, length),
+                status=206, content_type=content_type
+            )
+            response['Content-Length'] = str(length)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        if on_download and first_byte:
+            on_download()
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    return response
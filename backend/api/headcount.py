@@ -0,0 +1,129 @@
+"""
+Headcount history.
+
+record() stores, for one day, the number of active users and the active
+members of every group in HeadcountSnapshot. The snapshot_headcount command
+runs it, once a day from cron or a systemd timer. Re-running it for the same
+day overwrites that day.
+
+From the snapshots:
+
+- summary() answers the active employees metric with two indexed lookups
+  (the latest snapshot and the last one of the previous month) instead of
+  counting users. Without a recent snapshot (the command is not scheduled or
+  stopped running) it counts users live, as before. The previous month falls
+  back to the join-date approximation until a month of history exists.
+- series() returns a group's daily counts for trend charts (?range=).
+"""
+import re
+from datetime import timedelta
+
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from . import caching
+from .models import HeadcountSnapshot
+
+# Members of this AD group are the organisation's employees
+EMPLOYEES_GROUP = 'GG_IMCPNET_TODOS_USUARIOS'
+
+# Snapshots older than this are not used for the current headcount
+MAX_SNAPSHOT_AGE = timedelta(days=2)
+
+# ?range=<n><unit>: days, weeks, months (30 days) or years (365 days)
+RANGE_UNITS = {'d': 1, 'w': 7, 'm': 30, 'y': 365}
+RANGE_PATTERN = re.compile(r'^(\d+)([dwmy])$')
+MAX_RANGE_DAYS = 5 * 365
+
+
+def record(day=None):
+    """Snapshot the active member count of every group (and '' for all users); returns the rows written"""
+    day = day or timezone.localdate()
+    counts = list(
+        Group.objects.order_by()
+        .annotate(active=Count('user', filter=Q(user__is_active=True)))
+        .values_list('name', 'active')
+    )
+    counts.append(('', User.objects.filter(is_active=True).count()))
+    rows = [HeadcountSnapshot(date=day, group_name=name, active_count=active) for name, active in counts]
+    with transaction.atomic():
+        HeadcountSnapshot.objects.bulk_create(
+            rows, batch_size=1000,
+            update_conflicts=True, unique_fields=['group_name', 'date'], update_fields=['active_count'],
+        )
+        # Groups deleted since an earlier run of the same day
+        HeadcountSnapshot.objects.filter(date=day).exclude(group_name__in=[name for name, _ in counts]).delete()
+    # bulk_create sends no post_save
+    caching.invalidate(['api.HeadcountSnapshot'])
+    return rows
+
+
+def live_counts(last_month_end):
+    """
+    Current and last month's active employees counted from the user table.
+    Last month is approximated by the join date of the currently active
+    members: deactivations are not tracked.
+    """
+    return User.objects.filter(is_active=True, groups__name=EMPLOYEES_GROUP).aggregate(
+        current=Count('pk'),
+        previous=Count('pk', filter=Q(date_joined__date__lte=last_month_end)),
+    )
+
+
+def summary(today=None):
+    today = today or timezone.localdate()
+    last_month_end = today.replace(day=1) - timedelta(days=1)
+    snapshots = HeadcountSnapshot.objects.filter(group_name=EMPLOYEES_GROUP).order_by('-date')
+
+    latest = snapshots.filter(date__lte=today).values_list('date', 'active_count').first()
+    if latest is None or today - latest[0] > MAX_SNAPSHOT_AGE:
+        counts = live_counts(last_month_end)
+        as_of, current_count, previous_count = None, counts['current'], counts['previous']
+    else:
+        as_of, current_count = latest
+        previous_count = snapshots.filter(date__lte=last_month_end).values_list('active_count', flat=True).first()
+        if previous_count is None:
+            previous_count = live_counts(last_month_end)['previous']
+
+    if previous_count == 0:
+        # From 0 to some number is treated as a 100% increase
+        percent_change = 100.0 if current_count else 0.0
+        is_positive = current_count > 0
+    else:
+        diff = current_count - previous_count
+        percent_change = round((diff / previous_count) * 100.0, 2)
+        is_positive = diff > 0
+    return {
+        'count': current_count,
+        'previous_count': previous_count,
+        'percent_change': percent_change,
+        'is_positive': is_positive,
+        'group': EMPLOYEES_GROUP,
+        # Date of the snapshot the figures come from, null when counted live
+        'as_of': as_of,
+    }
+
+
+def parse_range(value):
+    """Days covered by a ?range= value such as 30d, 12w, 6m or 1y; ValueError when invalid"""
+    match = RANGE_PATTERN.match(value.strip().lower())
+    if not match:
+        raise ValueError(value)
+    days = int(match.group(1)) * RANGE_UNITS[match.group(2)]
+    if not 0 < days <= MAX_RANGE_DAYS:
+        raise ValueError(value)
+    return days
+
+
+def series(days, group_name=EMPLOYEES_GROUP, today=None):
+    """Daily snapshots of a group over the last `days` days, oldest first"""
+    today = today or timezone.localdate()
+    rows = (
+        HeadcountSnapshot.objects
+        .filter(group_name=group_name, date__gt=today - timedelta(days=days), date__lte=today)
+        .order_by('date')
+        .values_list('date', 'active_count')
+    )
+    return [{'date': date, 'count': count} for date, count in rows]
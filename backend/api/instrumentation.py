@@ -0,0 +1,322 @@
+"""
+Request-level metrics exposed in Prometheus text format at /api/metrics/internal/.
+
+MetricsMiddleware times every request and counts the database queries it ran
+(through a connection.execute_wrapper), then records, labelled by route:
+
+- http_requests_total and http_request_duration_seconds
+- http_request_db_queries and http_request_db_seconds
+- http_response_size_bytes
+
+Routes are the resolved view names, i.e. the router basename plus the action
+(``library-document-list``, ``library-document-published``) or the URL name
+of function views (``ldap_login``). Requests that resolve to no view share the
+``unmatched`` label, so random URLs cannot grow the registry.
+
+Other modules feed the same registry: token and role cache lookups
+(cache_requests_total) and LDAP login phases and outcomes
+(ldap_login_phase_seconds, ldap_login_total).
+
+The registry is process-local; recording takes one lock and a few dict
+updates. With several worker processes set METRICS_MULTIPROC_DIR to a
+directory shared by the workers of one host: each process then writes its
+registry to ``metrics_<pid>.json`` there (at most every
+METRICS_FLUSH_INTERVAL seconds, and at exit) and the endpoint sums the files
+of all processes. Files of exited workers are kept so counters do not go
+backwards; empty the directory when the service (re)starts.
+"""
+import atexit
+import bisect
+import glob
+import json
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Name -> (type, help, label names, buckets)
+METRICS = {
+    'http_requests_total': (
+        'counter', 'Requests handled, by route, method and status code', ('route', 'method', 'status'), None),
+    'http_request_duration_seconds': (
+        'histogram', 'Time spent handling the request', ('route', 'method'), LATENCY_BUCKETS),
+    'http_request_db_queries': (
+        'histogram', 'Database queries run per request', ('route',), QUERY_BUCKETS),
+    'http_request_db_seconds': (
+        'histogram', 'Time spent in database queries per request', ('route',), LATENCY_BUCKETS),
+    'http_response_size_bytes': (
+        'histogram', 'Response body size', ('route',), SIZE_BUCKETS),
+    'cache_requests_total': (
+        'counter', 'Process-local cache lookups, by cache and result (hit/miss)', ('cache', 'result'), None),
+    'ldap_login_phase_seconds': (
+        'histogram', 'LDAP login phase latency (connect, search, bind, db, groups)', ('phase',), LATENCY_BUCKETS),
+    'ldap_login_total': (
+        'counter', 'LDAP login attempts by outcome', ('outcome',), None),
+}
+
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+UNMATCHED_ROUTE = 'unmatched'
+
+
+class Registry:
+    """Thread-safe counters and histograms keyed by (metric name, label values)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._last_dump = time.monotonic()
+
+    def inc(self, name, labels, amount=1):
+        with self._lock:
+            self._inc(name, labels, amount)
+
+    def observe(self, name, labels, value):
+        with self._lock:
+            self._observe(name, labels, value)
+
+    def record_request(self, route, method, status_code, seconds, queries, db_seconds, size):
+        with self._lock:
+            self._inc('http_requests_total', (route, method, str(status_code)), 1)
+            self._observe('http_request_duration_seconds', (route, method), seconds)
+            self._observe('http_request_db_queries', (route,), queries)
+            self._observe('http_request_db_seconds', (route,), db_seconds)
+            if size is not None:
+                self._observe('http_response_size_bytes', (route,), size)
+
+    def _inc(self, name, labels, amount):
+        key = (name, labels)
+        self._counters[key] = self._counters.get(key, 0) + amount
+
+    def _observe(self, name, labels, value):
+        key = (name, labels)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            buckets = METRICS[name][3]
+            # Per-bucket counts (last one is +Inf) and the sum
+            histogram = self._histograms[key] = [[0] * (len(buckets) + 1), 0.0]
+        histogram[0][bisect.bisect_left(METRICS[name][3], value)] += 1
+        histogram[1] += value
+
+    def snapshot(self):
+        """JSON-serializable copy of the registry"""
+        with self._lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                'histograms': [
+                    [name, list(labels), list(counts), total]
+                    for (name, labels), (counts, total) in self._histograms.items()
+                ],
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters = {}
+            self._histograms = {}
+
+    def _reset_after_fork(self):
+        # Counts recorded before fork() belong to the parent's file
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._last_dump = time.monotonic()
+
+    def dump_due(self, interval):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_dump < interval:
+                return False
+            self._last_dump = now
+            return True
+
+
+registry = Registry()
+
+
+def cache_lookup(cache, hit):
+    registry.inc('cache_requests_total', (cache, 'hit' if hit else 'miss'))
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None or not match.view_name:
+        return UNMATCHED_ROUTE
+    return match.view_name
+
+
+def response_size(response):
+    if not response.streaming:
+        return len(response.content)
+    length = response.get('Content-Length')
+    return int(length) if length and length.isdigit() else None
+
+
+class QueryTimer:
+    """connection.execute_wrapper that counts and times queries"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    """Records latency, query count/time and response size of every request"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = QueryTimer()
+        started = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        method = request.method if request.method in METHODS else 'other'
+        registry.record_request(
+            route_name(request), method, response.status_code, elapsed,
+            queries.count, queries.seconds, response_size(response),
+        )
+        if multiproc_dir() and registry.dump_due(getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)):
+            dump()
+        return response
+
+
+# -----------------------------
+# Multi-process files
+# -----------------------------
+
+def multiproc_dir():
+    return getattr(settings, 'METRICS_MULTIPROC_DIR', '')
+
+
+def _process_file(directory, pid=None):
+    return os.path.join(directory, f'metrics_{pid or os.getpid()}.json')
+
+
+def dump():
+    """Write this process's registry to METRICS_MULTIPROC_DIR (no-op without it)"""
+    directory = multiproc_dir()
+    if not directory:
+        return
+    path = _process_file(directory)
+    tmp_path = f'{path}.tmp'
+    try:
+        with open(tmp_path, 'w') as fh:
+            json.dump(registry.snapshot(), fh)
+        os.replace(tmp_path, path)
+    except OSError:
+        logger.error(f'Could not write metrics file {path}')
+
+
+def collect():
+    """Snapshots of this process and, with METRICS_MULTIPROC_DIR, every other process"""
+    snapshots = [registry.snapshot()]
+    directory = multiproc_dir()
+    if directory:
+        own_file = _process_file(directory)
+        for path in sorted(glob.glob(os.path.join(directory, 'metrics_*.json'))):
+            if path == own_file:
+                continue
+            try:
+                with open(path) as fh:
+                    snapshots.append(json.load(fh))
+            except (OSError, ValueError):
+                # Unreadable or half-written by an older version: skip this scrape
+                logger.warning(f'Skipping unreadable metrics file {path}')
+    return snapshots
+
+
+def merge(snapshots):
+    """Sum snapshots into ({(name, labels): value}, {(name, labels): [counts, sum]})"""
+    counters = {}
+    histograms = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot.get('counters', ()):
+            if name not in METRICS:
+                continue
+            key = (name, tuple(labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, counts, total in snapshot.get('histograms', ()):
+            if name not in METRICS or len(counts) != len(METRICS[name][3]) + 1:
+                continue
+            key = (name, tuple(labels))
+            merged = histograms.setdefault(key, [[0] * len(counts), 0.0])
+            merged[0] = [a + b for a, b in zip(merged[0], counts)]
+            merged[1] += total
+    return counters, histograms
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(value) if value != int(value) or abs(value) >= 1e15 else str(int(value))
+    return str(value)
+
+
+def render(snapshots=None):
+    """Prometheus text exposition of the merged registries"""
+    counters, histograms = merge(collect() if snapshots is None else snapshots)
+    lines = []
+    for name, (kind, help_text, label_names, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_labels(label_names, labels)} {_number(value)}')
+            continue
+        for (metric, labels), (counts, total) in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets, counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(label_names, labels, [("le", _number(float(bound)))])} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{name}_bucket{_labels(label_names, labels, [("le", "+Inf")])} {cumulative}')
+            lines.append(f'{name}_sum{_labels(label_names, labels)} {_number(total)}')
+            lines.append(f'{name}_count{_labels(label_names, labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+def _dump_at_exit():
+    try:
+        dump()
+    except Exception:
+        logger.exception('Metrics dump at exit failed')
+
+
+atexit.register(_dump_at_exit)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=registry._reset_after_fork)
@@ -0,0 +1,513 @@
+"""
+Active Directory login backend with pooled connections and a circuit breaker.
+
+PooledLDAPBackend replaces django-auth-ldap's LDAPBackend for interactive
+login (ldap_login). Instead of a new connection (and TLS handshake) plus a
+service bind per login, it borrows a service-bound ldap3 connection from a
+small per-process pool and:
+
+1. searches the user (AUTH_LDAP_USER_SEARCH_FILTER) and reads the mapped
+   attributes and memberOf in the same round trip
+2. verifies the password by rebinding that connection as the user, then
+   rebinds it as the service account before returning it to the pool
+3. updates the Django user and mirrors its AD groups under their CN, as
+   django-auth-ldap's AUTH_LDAP_MIRROR_GROUPS did (AUTH_LDAP_GROUP_MAPPING
+   is not applied), unless
+   the attributes match the fingerprint stored at the previous login
+   (LDAPUserState, refreshed at least every AUTH_LDAP_FINGERPRINT_MAX_AGE
+   seconds); metrics.outcomes['writes_skipped'] counts those logins
+
+When the directory is unreachable (socket errors, timeouts, service bind
+failures) the circuit breaker opens after AUTH_LDAP_BREAKER_FAILURES
+consecutive failures, and logins fail fast for
+AUTH_LDAP_BREAKER_RESET_SECONDS instead of blocking every worker for the
+network timeout. The backend then marks the request with
+``ldap_unavailable`` so the view can answer 503.
+
+AD closes connections idle for longer than its MaxConnIdleTime. Pooled
+connections idle for more than AUTH_LDAP_POOL_MAX_IDLE_SECONDS are closed
+instead of reused, and a login whose reused connection fails is retried once
+on a new connection before it counts as a breaker failure.
+
+Phase latencies (connect, search, bind, db, groups) are recorded in
+``metrics`` (and the Prometheus registry, api/instrumentation.py) and left on
+the request as ``ldap_timings``.
+"""
+import hashlib
+import json
+import logging
+import ssl
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from ldap3 import ALL, Connection, SUBTREE, Server, Tls
+from ldap3.core.exceptions import (
+    LDAPBindError, LDAPCommunicationError, LDAPMaximumRetriesError, LDAPResponseTimeoutError,
+    LDAPStartTLSError,
+)
+from ldap3.utils.conv import escape_filter_chars
+
+from . import instrumentation
+from .ldap_sync import sync_user_relations
+from .models import LDAPUserState
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean "the directory is not usable", as opposed to bad credentials
+UNAVAILABLE_ERRORS = (
+    LDAPBindError, LDAPCommunicationError, LDAPMaximumRetriesError, LDAPResponseTimeoutError,
+    LDAPStartTLSError, OSError,
+)
+
+# Django user field -> AD attribute when settings.AUTH_LDAP_USER_ATTR_MAP is not set
+USER_ATTR_MAP = {
+    'first_name': 'givenName',
+    'last_name': 'sn',
+    'email': 'mail',
+}
+
+PHASES = ('connect', 'search', 'bind', 'db', 'groups')
+
+
+class DirectoryUnavailable(Exception):
+    """The directory cannot be reached, or the breaker is open"""
+
+
+class StaleConnection(DirectoryUnavailable):
+    """A connection reused from the pool failed; a new connection may still work"""
+
+
+class CircuitBreaker:
+    """
+    Closed: calls pass. After `failure_threshold` consecutive failures it
+    opens and allow() is False for `reset_timeout` seconds. Then one trial
+    call is let through (half-open): success closes the breaker, failure
+    opens it again.
+    """
+
+    def __init__(self, failure_threshold=3, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def retry_after(self):
+        """Seconds until the breaker lets a trial call through"""
+        with self._lock:
+            if self._opened_at is None:
+                return 0
+            return max(0, int(self.reset_timeout - (time.monotonic() - self._opened_at)) + 1)
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning('LDAP circuit breaker opened')
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+    def reset(self):
+        self.record_success()
+
+
+class PhaseMetrics:
+    """Process-local count/total/max latency per login phase, plus outcome counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.phases = {phase: {'count': 0, 'total': 0.0, 'max': 0.0} for phase in PHASES}
+            self.outcomes = {'success': 0, 'invalid': 0, 'unavailable': 0, 'writes_skipped': 0}
+
+    def observe(self, phase, seconds):
+        with self._lock:
+            entry = self.phases.setdefault(phase, {'count': 0, 'total': 0.0, 'max': 0.0})
+            entry['count'] += 1
+            entry['total'] += seconds
+            entry['max'] = max(entry['max'], seconds)
+        instrumentation.registry.observe('ldap_login_phase_seconds', (phase,), seconds)
+
+    def count(self, outcome):
+        with self._lock:
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+        instrumentation.registry.inc('ldap_login_total', (outcome,))
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'phases': {phase: dict(entry) for phase, entry in self.phases.items()},
+                'outcomes': dict(self.outcomes),
+            }
+
+
+class LDAPConnectionPool:
+    """
+    Up to `size` service-bound connections, reused LIFO. Callers wait up to
+    `timeout` seconds for a free connection. A connection that raised inside
+    connection() is discarded instead of returned.
+
+    Connections idle for more than `max_idle` seconds are closed at checkout
+    rather than reused. When a reused connection fails with a directory error,
+    connection() raises StaleConnection so the caller can retry with
+    connection(fresh=True), which closes every idle connection and opens a
+    new one.
+    """
+
+    def __init__(self, connect, size=4, timeout=5, max_idle=300):
+        self.connect = connect
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.max_idle = max_idle
+        # (connection, monotonic time it was returned)
+        self._idle = []
+        self._open = 0
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def connection(self, fresh=False):
+        conn, reused = self._checkout(fresh)
+        try:
+            yield conn
+        except (DirectoryUnavailable, *UNAVAILABLE_ERRORS) as e:
+            self._discard(conn)
+            if reused:
+                raise StaleConnection(f'Pooled LDAP connection failed: {e}') from e
+            raise
+        except BaseException:
+            self._discard(conn)
+            raise
+        else:
+            self._checkin(conn)
+
+    def _checkout(self, fresh=False):
+        """(connection, reused)"""
+        deadline = time.monotonic() + self.timeout
+        with self._condition:
+            expired = self._expire(fresh)
+            while not self._idle and self._open >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._close(expired)
+                    raise DirectoryUnavailable('LDAP connection pool exhausted')
+                self._condition.wait(remaining)
+            conn = self._idle.pop()[0] if self._idle else None
+            if conn is None:
+                self._open += 1
+        self._close(expired)
+        if conn is not None:
+            return conn, True
+        try:
+            return self.connect(), False
+        except BaseException:
+            with self._condition:
+                self._open -= 1
+                self._condition.notify()
+            raise
+
+    def _expire(self, everything=False):
+        """Take closed and overaged (or all) connections off the idle list; caller holds the lock"""
+        now = time.monotonic()
+        expired = [
+            conn for conn, returned_at in self._idle
+            if everything or conn.closed or now - returned_at > self.max_idle
+        ]
+        if expired:
+            self._idle = [(conn, returned_at) for conn, returned_at in self._idle if conn not in expired]
+            self._open -= len(expired)
+            self._condition.notify_all()
+        return expired
+
+    def _checkin(self, conn):
+        with self._condition:
+            if conn.closed:
+                self._open -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._condition.notify()
+
+    def _discard(self, conn):
+        self._close([conn])
+        with self._condition:
+            self._open -= 1
+            self._condition.notify()
+
+    @staticmethod
+    def _close(connections):
+        for conn in connections:
+            try:
+                conn.unbind()
+            except Exception:
+                pass
+
+    def clear(self):
+        with self._condition:
+            idle = [conn for conn, _ in self._idle]
+            self._idle = []
+            self._open -= len(idle)
+            self._condition.notify_all()
+        self._close(idle)
+
+
+def connect_from_settings():
+    """Service-bound connection to settings.AUTH_LDAP_SERVER_URI"""
+    timeout = settings.AUTH_LDAP_NETWORK_TIMEOUT
+    # Self-signed certificates are accepted, as with the django-auth-ldap configuration
+    server = Server(
+        settings.AUTH_LDAP_SERVER_URI, get_info=ALL, connect_timeout=timeout,
+        tls=Tls(validate=ssl.CERT_NONE),
+    )
+    return Connection(
+        server, user=settings.AUTH_LDAP_BIND_DN, password=settings.AUTH_LDAP_BIND_PASSWORD,
+        auto_bind=True, receive_timeout=timeout, raise_exceptions=False,
+    )
+
+
+breaker = CircuitBreaker(
+    failure_threshold=getattr(settings, 'AUTH_LDAP_BREAKER_FAILURES', 3),
+    reset_timeout=getattr(settings, 'AUTH_LDAP_BREAKER_RESET_SECONDS', 30),
+)
+metrics = PhaseMetrics()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = LDAPConnectionPool(
+                connect_from_settings,
+                size=getattr(settings, 'AUTH_LDAP_POOL_SIZE', 4),
+                timeout=settings.AUTH_LDAP_NETWORK_TIMEOUT,
+                max_idle=getattr(settings, 'AUTH_LDAP_POOL_MAX_IDLE_SECONDS', 300),
+            )
+        return _pool
+
+
+def set_pool(pool):
+    """Replace the process pool (tests, alternative connection factories)"""
+    global _pool
+    with _pool_lock:
+        old, _pool = _pool, pool
+    if old is not None and old is not pool:
+        old.clear()
+
+
+def user_attr_map():
+    return getattr(settings, 'AUTH_LDAP_USER_ATTR_MAP', USER_ATTR_MAP)
+
+
+def _first(value):
+    if isinstance(value, (list, tuple)):
+        value = value[0] if value else ''
+    return '' if value is None else str(value)
+
+
+class PooledLDAPBackend(ModelBackend):
+    """Authenticates against Active Directory through the connection pool"""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        # AD accepts an empty password as an anonymous bind
+        if not username or not password:
+            return None
+        timings = OrderedDict()
+        if request is not None:
+            request.ldap_timings = timings
+
+        if not breaker.allow():
+            return self._unavailable(request, 'circuit breaker open')
+        try:
+            entry = self._verify(username, password, timings)
+        except (DirectoryUnavailable, *UNAVAILABLE_ERRORS) as e:
+            breaker.record_failure()
+            return self._unavailable(request, e)
+        except BaseException:
+            # Anything else (other LDAP errors, a broken search filter) must still
+            # release a half-open trial, or the breaker would never let a call through again
+            breaker.record_failure()
+            raise
+        breaker.record_success()
+        if entry is None:
+            metrics.count('invalid')
+            return None
+
+        attributes = entry['attributes']
+        mirror_groups = getattr(settings, 'AUTH_LDAP_MIRROR_GROUPS', True)
+        fingerprint = attributes_fingerprint(attributes, mirror_groups)
+        with self._phase('db', timings):
+            user = (
+                User.objects.select_related('ldap_state')
+                .filter(username=_first(attributes.get('sAMAccountName')) or username).first()
+            )
+            unchanged = user is not None and self._fingerprint_is_current(user, fingerprint)
+            if not unchanged:
+                user = self._update_user(user, _first(attributes.get('sAMAccountName')) or username, attributes)
+        if unchanged:
+            # Same directory attributes as last time: no user UPDATE, no group diff
+            metrics.count('writes_skipped')
+        else:
+            if mirror_groups:
+                with self._phase('groups', timings):
+                    # Raw CNs: existing ACLs and permissions reference those group names
+                    sync_user_relations(user, {'memberOf': attributes.get('memberOf') or []}, mapping={})
+            LDAPUserState.objects.update_or_create(
+                user=user, defaults={'fingerprint': fingerprint, 'synced_at': timezone.now()}
+            )
+        logger.debug('LDAP login phases for %s: %s', user.username,
+                     ', '.join(f'{phase}={seconds * 1000:.1f}ms' for phase, seconds in timings.items()))
+        if not self.user_can_authenticate(user):
+            metrics.count('invalid')
+            return None
+        metrics.count('success')
+        return user
+
+    def _verify(self, username, password, timings):
+        """The user's directory entry if the password is right, None otherwise"""
+        pool = get_pool()
+        try:
+            return self._verify_on(pool.connection(), username, password, timings)
+        except StaleConnection as e:
+            # Most likely closed by the server while idle: one more try on a new connection
+            logger.info(f'{e}; retrying on a new connection')
+            return self._verify_on(pool.connection(fresh=True), username, password, timings)
+
+    def _verify_on(self, connection, username, password, timings):
+        search_filter = settings.AUTH_LDAP_USER_SEARCH_FILTER % {'user': escape_filter_chars(username)}
+        started = time.perf_counter()
+        with connection as conn:
+            self._record('connect', started, timings)
+            with self._phase('search', timings):
+                conn.search(
+                    settings.AUTH_LDAP_USER_SEARCH_BASE, search_filter, SUBTREE,
+                    attributes=['sAMAccountName', 'memberOf', *user_attr_map().values()], size_limit=2,
+                )
+                self._raise_if_unusable(conn)
+                entries = [item for item in conn.response or [] if item.get('type') == 'searchResEntry']
+            if len(entries) != 1:
+                return None
+            with self._phase('bind', timings):
+                verified = conn.rebind(user=entries[0]['dn'], password=password)
+                # Back to the service account before the connection is reused
+                if not conn.rebind(user=settings.AUTH_LDAP_BIND_DN, password=settings.AUTH_LDAP_BIND_PASSWORD):
+                    raise LDAPBindError('service account rebind failed')
+        return entries[0] if verified else None
+
+    @staticmethod
+    def _raise_if_unusable(conn):
+        # raise_exceptions=False: transport problems only show up in the result
+        if conn.closed or (conn.result or {}).get('description') in ('unavailable', 'busy', 'operationsError'):
+            raise DirectoryUnavailable(f"LDAP search failed: {(conn.result or {}).get('description')}")
+
+    @staticmethod
+    def _fingerprint_is_current(user, fingerprint):
+        max_age = getattr(settings, 'AUTH_LDAP_FINGERPRINT_MAX_AGE', 86400)
+        try:
+            state = user.ldap_state
+        except LDAPUserState.DoesNotExist:
+            return False
+        return (
+            max_age > 0 and state.fingerprint == fingerprint
+            and timezone.now() - state.synced_at < timedelta(seconds=max_age)
+        )
+
+    @staticmethod
+    def _update_user(user, username, attributes):
+        values = {field: _first(attributes.get(attribute)) for field, attribute in user_attr_map().items()}
+        if user is None:
+            with transaction.atomic():
+                user, created = User.objects.get_or_create(username=username, defaults=values)
+            if created:
+                user.set_unusable_password()
+                user.save(update_fields=['password'])
+                return user
+        changed = [field for field, value in values.items() if getattr(user, field) != value]
+        if changed:
+            for field in changed:
+                setattr(user, field, values[field])
+            user.save(update_fields=changed)
+        return user
+
+    @staticmethod
+    def _record(name, started, timings):
+        elapsed = time.perf_counter() - started
+        timings[name] = elapsed
+        metrics.observe(name, elapsed)
+
+    @classmethod
+    @contextmanager
+    def _phase(cls, name, timings):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            cls._record(name, started, timings)
+
+    @staticmethod
+    def _unavailable(request, reason):
+        logger.warning(f'LDAP login unavailable: {reason}')
+        metrics.count('unavailable')
+        if request is not None:
+            request.ldap_unavailable = True
+        return None
+
+
+def attributes_fingerprint(attributes, mirror_groups=True):
+    """
+    SHA-256 over everything login writes from the directory: the mapped user
+    attributes and, when groups are mirrored, memberOf.
+    """
+    payload = {field: _first(attributes.get(attribute)) for field, attribute in user_attr_map().items()}
+    if mirror_groups:
+        member_of = attributes.get('memberOf') or []
+        if not isinstance(member_of, (list, tuple)):
+            member_of = [member_of]
+        payload['memberOf'] = sorted(str(dn).lower() for dn in member_of)
+    raw = json.dumps(payload, sort_keys=True, separators=(',', ':')).encode()
+    return hashlib.sha256(raw).hexdigest()
+
+
+def server_timing_header(timings):
+    """Server-Timing header value for the phases of one login"""
+    return ', '.join(f'ldap-{phase};dur={seconds * 1000:.1f}' for phase, seconds in timings.items())
@@ -0,0 +1,105 @@
+"""
+In-process fake Active Directory for tests and benchmarks of the LDAP sync.
+
+Uses ldap3's MOCK_SYNC strategy with the offline AD 2012 R2 schema, which
+supports the Simple Paged Results control like a real domain controller.
+
+    directory = FakeDirectory(base='DC=example,DC=com')
+    directory.add_users(100000)
+    conn = directory.connect()          # bound ldap3 Connection
+
+FakeDirectory.connect accepts the Connection() signature, so it can replace
+ldap3.Connection with unittest.mock.patch. Like a domain controller, every
+add or change bumps the entry's uSNChanged and the root DSE
+highestCommittedUSN. drop_connections() closes the open connections the way
+AD does after MaxConnIdleTime: they still look open, but the next operation
+fails.
+"""
+from ldap3 import Connection, MOCK_SYNC, OFFLINE_AD_2012_R2, Server
+from ldap3.core.exceptions import LDAPSessionTerminatedByServerError
+
+BIND_DN = 'CN=sync,CN=Users,{base}'
+BIND_PASSWORD = 'fake-password'
+
+
+class FakeDirectory:
+    """Holds the directory entries; every connect() gets a populated mock connection"""
+
+    def __init__(self, base='DC=example,DC=com'):
+        self.base = base
+        self.entries = {}
+        self.usn = 1000
+        self.connections = []
+
+    def add_user(self, username, email='', first_name='', last_name='', disabled=False, ou='Users', groups=(),
+                 password=None):
+        attributes = {
+            'objectClass': ['top', 'person', 'organizationalPerson', 'user'],
+            'sAMAccountName': username,
+            'userAccountControl': 514 if disabled else 512,
+            'uSNChanged': self._next_usn(),
+        }
+        if email:
+            attributes['mail'] = email
+        if first_name:
+            attributes['givenName'] = first_name
+        if last_name:
+            attributes['sn'] = last_name
+        if groups:
+            attributes['memberOf'] = self.group_dns(groups)
+        if password:
+            attributes['userPassword'] = password
+        self.entries[username] = (f'CN={username},OU={ou},{self.base}', attributes)
+
+    def group_dns(self, groups):
+        return [f'CN={name},OU=Groups,{self.base}' for name in groups]
+
+    def update_user(self, username, disabled=None, **attributes):
+        """Change LDAP attributes of a user (e.g. mail='...', memberOf=directory.group_dns([...]))"""
+        _, entry = self.entries[username]
+        entry.update(attributes)
+        if disabled is not None:
+            entry['userAccountControl'] = 514 if disabled else 512
+        entry['uSNChanged'] = self._next_usn()
+
+    def remove_user(self, username):
+        self._next_usn()
+        del self.entries[username]
+
+    def _next_usn(self):
+        self.usn += 1
+        return self.usn
+
+    def add_users(self, count, prefix='user', disabled_every=0):
+        """Add `count` synthetic users; every `disabled_every`-th one is disabled"""
+        for i in range(count):
+            self.add_user(
+                f'{prefix}{i:06d}', email=f'{prefix}{i:06d}@example.com',
+                first_name=f'Nombre{i}', last_name=f'Apellido{i}',
+                disabled=bool(disabled_every) and i % disabled_every == 0,
+            )
+
+    @property
+    def bind_dn(self):
+        return BIND_DN.format(base=self.base)
+
+    def connect(self, *args, **kwargs):
+        server = Server('fake-ad', get_info=OFFLINE_AD_2012_R2)
+        server.info.other['highestCommittedUSN'] = [str(self.usn)]
+        bind_dn = self.bind_dn
+        conn = Connection(server, user=bind_dn, password=BIND_PASSWORD, client_strategy=MOCK_SYNC)
+        conn.strategy.add_entry(bind_dn, {'objectClass': ['top', 'person', 'user'], 'userPassword': BIND_PASSWORD})
+        for dn, attributes in self.entries.values():
+            conn.strategy.add_entry(dn, attributes)
+        conn.bind()
+        self.connections.append(conn)
+        return conn
+
+    def drop_connections(self):
+        """Server-side close of every connection handed out so far"""
+        def dropped(*args, **kwargs):
+            raise LDAPSessionTerminatedByServerError('session terminated by server')
+
+        for conn in self.connections:
+            conn.search = conn.rebind = dropped
+        self.connections = []
@@ -3,99 +3,202 @@ LDAP sync functions for synchronizing Active Directory groups to Django groups.
 These functions are kept for backward compatibility and testing purposes.
 With django-auth-ldap, most of this functionality is handled automatically,
 but these functions can still be useful for custom group mappings.
+
+Directory -> auth.User synchronization for the sync_ldap_users command:
+
+- iter_pages() runs an ldap3 paged search (Simple Paged Results control) and
+  yields one page of entries at a time, so memory stays flat whatever the
+  directory size.
+- UserSyncer diffs each page against the matching Django users (loaded with
+  one query per page) and writes the changes with bulk_create/bulk_update in
+  one transaction per page.
+- Incremental runs only fetch entries whose uSNChanged is above the
+  watermark stored in LDAPSyncState (see delta_filter/highest_committed_usn).
+  Deleted or moved-out users never show up in a delta, so deactivation only
+  happens on full syncs.
+- ParallelDirectoryReader searches several bases/servers (SyncSource)
+  concurrently and feeds their pages to the single thread that writes to
+  the database.
 """
-from django.contrib.auth.models import Group
 import logging
+import queue
+import threading
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from ldap3 import SUBTREE
+
+from . import authentication, caching, roles
 
 logger = logging.getLogger(__name__)
 
+SYNC_ATTRIBUTES = ['sAMAccountName', 'mail', 'givenName', 'sn', 'userAccountControl', 'uSNChanged']
+PAGED_RESULTS_OID = '1.2.840.113556.1.4.319'
+# userAccountControl flag for disabled accounts
+ACCOUNTDISABLE = 0x2
+# Django fields owned by the directory
+USER_FIELDS = ['email', 'first_name', 'last_name', 'is_active']
+# Keep UPDATE ... WHERE id IN (...) below SQLite's parameter limit
+WRITE_CHUNK_SIZE = 500
+
+LdapUser = namedtuple('LdapUser', ['username', 'email', 'first_name', 'last_name', 'is_active', 'member_of'])
+
+
+_group_mapping = None
+
+
+def get_group_mapping():
+    """AD group name -> Django group name, read once from settings.AUTH_LDAP_GROUP_MAPPING"""
+    global _group_mapping
+    if _group_mapping is None:
+        _group_mapping = dict(getattr(settings, 'AUTH_LDAP_GROUP_MAPPING', {}))
+    return _group_mapping
+
+
+@receiver(setting_changed)
+def _reset_group_mapping(setting, **kwargs):
+    global _group_mapping
+    if setting == 'AUTH_LDAP_GROUP_MAPPING':
+        _group_mapping = None
+
+
+def ad_group_names(member_of):
+    """
+    Group CNs from a memberOf value.
+    Example: CN=HR_Managers,OU=Groups,DC=example,DC=com -> HR_Managers
+    """
+    if not isinstance(member_of, (list, tuple)):
+        member_of = [member_of] if member_of else []
+    names = []
+    for group_dn in member_of:
+        if isinstance(group_dn, bytes):
+            group_dn = group_dn.decode('utf-8')
+        if group_dn.startswith('CN='):
+            names.append(group_dn.split(',')[0].replace('CN=', ''))
+    return names
+
+
+def target_group_names(member_of, mapping=None):
+    """Django group names for a memberOf value; unmapped AD groups keep their name"""
+    mapping = get_group_mapping() if mapping is None else mapping
+    return {mapping.get(name, name) for name in ad_group_names(member_of)}
+
+
+def resolve_groups(names):
+    """
+    Return {name: group id} for the given group names, creating missing groups.
+    One SELECT, plus one INSERT and one SELECT when some groups are new.
+    """
+    names = set(names)
+    if not names:
+        return {}
+    group_ids = dict(Group.objects.filter(name__in=names).values_list('name', 'id'))
+    missing = names - group_ids.keys()
+    if missing:
+        # ignore_conflicts: another sync may create the same group concurrently
+        Group.objects.bulk_create([Group(name=name) for name in sorted(missing)], ignore_conflicts=True)
+        group_ids.update(Group.objects.filter(name__in=missing).values_list('name', 'id'))
+        logger.info(f"Created Django groups: {sorted(missing)}")
+    return group_ids
+
 
-def sync_user_relations(user, ldap_attributes):
+def sync_user_relations(user, ldap_attributes, mapping=None):
     """
     Sync Active Directory groups to Django groups.
     This function can be used for custom group synchronization logic.
-    
+
     Note: With django-auth-ldap, group synchronization is handled automatically
     through AUTH_LDAP_MIRROR_GROUPS setting. This function is kept for
     backward compatibility and custom group name mappings.
-    
+
+    The user ends up in exactly the groups mapped from ``memberOf`` (see
+    settings.AUTH_LDAP_GROUP_MAPPING). Only memberships that changed are
+    inserted or deleted.
+
     Args:
         user: Django User object
         ldap_attributes: Dictionary of LDAP attributes from Active Directory
+        mapping: AD group -> Django group names to use instead of
+            AUTH_LDAP_GROUP_MAPPING; ``{}`` mirrors the AD group CNs as they are
     """
-    # Get memberOf attribute (AD groups the user belongs to)
-    member_of = ldap_attributes.get('memberOf', [])
-    
-    if not isinstance(member_of, list):
-        member_of = [member_of] if member_of else []
-    
-    # Extract group names from DN format
-    # Example: CN=HR_Managers,OU=Groups,DC=example,DC=com -> HR_Managers
-    ad_groups = []
-    for group_dn in member_of:
-        if isinstance(group_dn, bytes):
-            group_dn = group_dn.decode('utf-8')
-        
-        # Extract CN (Common Name) from DN
-        if group_dn.startswith('CN='):
-            group_name = group_dn.split(',')[0].replace('CN=', '')
-            ad_groups.append(group_name)
-    
-    logger.info(f"User {user.username} AD groups: {ad_groups}")
-    
-    # Map of AD groups to Django groups (can be customized)
-    # This allows mapping AD group names to different Django group names if needed
-    group_mapping = {
-        # HR and Management
-        'HR_Managers': 'HR_Managers',
-        'Gerentes_RH': 'HR_Managers',
-        'Department_Managers': 'Department_Managers',
-        'Gerentes_Departamento': 'Department_Managers',
-        
-        # Communications
-        'Communications': 'Communications',
-        'Comunicaciones': 'Communications',
-        
-        # Document Management
-        'Document_Managers': 'Document_Managers',
-        'Administradores_Documentos': 'Document_Managers',
-        
-        # Resource Management
-        'Resource_Managers': 'Resource_Managers',
-        'Administradores_Recursos': 'Resource_Managers',
-        'Facilities': 'Facilities',
-        'Instalaciones': 'Facilities',
-        
-        # Training
-        'Training_Managers': 'Training_Managers',
-        'Administradores_Capacitacion': 'Training_Managers',
-        
-        # Project Management
-        'Project_Managers': 'Project_Managers',
-        'Gerentes_Proyecto': 'Project_Managers',
+    target = resolve_groups(target_group_names(ldap_attributes.get('memberOf', []), mapping))
+    target_ids = set(target.values())
+    current_ids = set(user.groups.values_list('id', flat=True))
+
+    # Through the related manager so m2m_changed keeps the role cache in sync
+    if current_ids - target_ids:
+        user.groups.remove(*(current_ids - target_ids))
+    if target_ids - current_ids:
+        user.groups.add(*(target_ids - current_ids))
+
+    logger.info(
+        f"Synced {len(target_ids)} groups for user {user.username} "
+        f"(+{len(target_ids - current_ids)} -{len(current_ids - target_ids)})"
+    )
+
+
+def sync_group_memberships(member_of_by_user, dry_run=False, mapping=None):
+    """
+    Batch variant of sync_user_relations for many users at once.
+
+    ``member_of_by_user`` maps user id -> memberOf value. Group names for all
+    users are resolved together and the through table is diffed with one
+    SELECT per chunk of users; changes are applied with bulk INSERT/DELETE.
+    ``mapping`` is as in sync_user_relations. Returns a Counter with groups_added, groups_removed and users_changed.
+    """
+    stats = Counter()
+    if not member_of_by_user:
+        return stats
+    targets = {
+        user_id: target_group_names(member_of, mapping) for user_id, member_of in member_of_by_user.items()
     }
-    
-    # Get Django groups to assign
-    django_groups = set()
-    for ad_group in ad_groups:
-        if ad_group in group_mapping:
-            django_groups.add(group_mapping[ad_group])
-        else:
-            # If not in mapping, use the AD group name directly
-            django_groups.add(ad_group)
-    
-    # Clear existing groups and add new ones
-    user.groups.clear()
-    
-    for group_name in django_groups:
-        # Get or create the Django group
-        group, created = Group.objects.get_or_create(name=group_name)
-        if created:
-            logger.info(f"Created new Django group: {group_name}")
-        user.groups.add(group)
-        logger.info(f"Added user {user.username} to group {group_name}")
-    
-    logger.info(f"Synced {len(django_groups)} groups for user {user.username}")
+    names = set().union(*targets.values())
+    if dry_run:
+        group_ids = dict(Group.objects.filter(name__in=names).values_list('name', 'id'))
+        # Placeholder keys for groups that would be created
+        group_ids.update((name, ('new', name)) for name in names - group_ids.keys())
+    else:
+        group_ids = resolve_groups(names)
+
+    through = User.groups.through
+    user_ids = list(targets)
+    current = {}
+    for start in range(0, len(user_ids), WRITE_CHUNK_SIZE):
+        rows = through.objects.filter(user_id__in=user_ids[start:start + WRITE_CHUNK_SIZE])
+        for row_id, user_id, group_id in rows.values_list('id', 'user_id', 'group_id'):
+            current.setdefault(user_id, {})[group_id] = row_id
+
+    to_add, to_remove, changed_users = [], [], []
+    for user_id, user_groups in targets.items():
+        target_ids = {group_ids[name] for name in user_groups}
+        current_rows = current.get(user_id, {})
+        added = target_ids - current_rows.keys()
+        removed = [row_id for group_id, row_id in current_rows.items() if group_id not in target_ids]
+        to_add.extend(through(user_id=user_id, group_id=group_id) for group_id in added)
+        to_remove.extend(removed)
+        if added or removed:
+            changed_users.append(user_id)
+
+    stats['groups_added'] = len(to_add)
+    stats['groups_removed'] = len(to_remove)
+    stats['users_changed'] = len(changed_users)
+    if dry_run or not changed_users:
+        return stats
+    with transaction.atomic():
+        through.objects.bulk_create(to_add, batch_size=WRITE_CHUNK_SIZE)
+        for start in range(0, len(to_remove), WRITE_CHUNK_SIZE):
+            through.objects.filter(id__in=to_remove[start:start + WRITE_CHUNK_SIZE]).delete()
+    # Bulk writes send no m2m_changed
+    roles.invalidate(changed_users)
+    caching.invalidate(['auth.User', 'auth.Group'])
+    return stats
 
 
 def clean_user_data(user_data):
@@ -142,3 +245,311 @@ def clean_user_data(user_data):
     logger.info(f"Cleaned user data for: {user_data.get('username')}")
     
     return user_data
+
+
+
+def iter_pages(conn, search_base, ldap_filter, attributes=SYNC_ATTRIBUTES, page_size=1000):
+    """Yield the raw search responses of a paged search, one page per item"""
+    cookie = None
+    while True:
+        conn.search(
+            search_base, ldap_filter, SUBTREE,
+            attributes=attributes, paged_size=page_size, paged_cookie=cookie
+        )
+        yield [item for item in conn.response or [] if item.get('type') == 'searchResEntry']
+        try:
+            cookie = conn.result['controls'][PAGED_RESULTS_OID]['value']['cookie']
+        except (KeyError, TypeError):
+            cookie = None
+        if not isinstance(cookie, bytes) or not cookie:
+            return
+
+
+def delta_filter(ldap_filter, highest_usn):
+    """Restrict a sync filter to entries changed after the given uSN"""
+    return f'(&{ldap_filter}(uSNChanged>={int(highest_usn) + 1}))'
+
+
+def highest_committed_usn(conn):
+    """
+    highestCommittedUSN from the server's root DSE (read at bind time, so
+    before the search), or None when the server info is not available.
+    Storing this value rather than the highest uSNChanged seen means
+    changes committed while the search runs are picked up by the next run.
+    """
+    info = conn.server.info
+    if info is None or not info.other:
+        return None
+    try:
+        return int(_single(info.other.get('highestCommittedUSN')))
+    except ValueError:
+        return None
+
+
+def _single(value):
+    # Attributes come back as lists when the server schema is unknown
+    if isinstance(value, (list, tuple)):
+        value = value[0] if value else None
+    if value is None:
+        return ''
+    return str(value)
+
+
+def parse_entry(item):
+    """LdapUser for a search response item, or None when it has no sAMAccountName"""
+    attributes = item.get('attributes') or {}
+    username = _single(attributes.get('sAMAccountName')).strip()
+    if not username:
+        return None
+    try:
+        uac = int(_single(attributes.get('userAccountControl')) or 0)
+    except ValueError:
+        uac = 0
+    return LdapUser(
+        username=username,
+        email=_single(attributes.get('mail')),
+        first_name=_single(attributes.get('givenName')),
+        last_name=_single(attributes.get('sn')),
+        is_active=not uac & ACCOUNTDISABLE,
+        member_of=attributes.get('memberOf') or [],
+    )
+
+
+def _usn(item):
+    try:
+        return int(_single((item.get('attributes') or {}).get('uSNChanged')))
+    except ValueError:
+        return None
+
+
+SyncSource = namedtuple('SyncSource', ['server_uri', 'search_base'])
+
+
+def parse_sources(bases, default_server_uri):
+    """
+    SyncSources for search base specs. A spec is a base DN, searched on
+    default_server_uri, or "<server uri>|<base DN>" for another server.
+    Several specs may be given in one string separated by ";".
+    """
+    sources = []
+    for spec in bases:
+        for part in spec.split(';'):
+            part = part.strip()
+            if not part:
+                continue
+            server_uri, _, base = part.rpartition('|')
+            source = SyncSource(server_uri.strip() or default_server_uri, base.strip())
+            if source not in sources:
+                sources.append(source)
+    return sources
+
+
+class SourceResult:
+    """Outcome and timings of reading one SyncSource"""
+
+    def __init__(self, source, search_filter):
+        self.source = source
+        self.search_filter = search_filter
+        self.entries = 0
+        self.pages = 0
+        self.wait_seconds = 0.0
+        self.connect_seconds = 0.0
+        self.read_seconds = 0.0
+        self.watermark = None
+        self.max_usn = None
+        self.error = None
+
+
+class _Cancelled(Exception):
+    pass
+
+
+class ParallelDirectoryReader:
+    """
+    Reads several SyncSources concurrently and hands their pages to a single
+    consumer.
+
+    Each source is searched by a worker thread (at most ``workers`` at once,
+    and at most ``connections_per_server`` open connections per server URI).
+    Pages go through a bounded queue, so fast directories cannot outrun the
+    database writer and memory stays at a few pages per worker. The consumer
+    (the thread iterating pages(), which owns the Django DB connection)
+    applies them one at a time.
+
+    ``connect(source)`` must return a bound ldap3 Connection; a failing
+    source is recorded in its SourceResult.error and does not stop the others.
+    """
+
+    def __init__(self, connect, filters, attributes=SYNC_ATTRIBUTES, page_size=1000,
+                 workers=4, connections_per_server=2):
+        self.connect = connect
+        self.results = {source: SourceResult(source, search_filter) for source, search_filter in filters.items()}
+        self.attributes = attributes
+        self.page_size = page_size
+        self.workers = max(1, min(workers, len(self.results) or 1))
+        self._semaphores = {
+            server_uri: threading.BoundedSemaphore(max(1, connections_per_server))
+            for server_uri in {source.server_uri for source in self.results}
+        }
+        self._queue = queue.Queue(maxsize=self.workers * 2)
+        self._cancelled = threading.Event()
+
+    def pages(self):
+        """Yield (SourceResult, page) as pages arrive from any source"""
+        pending = len(self.results)
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='ldap-sync')
+        try:
+            for result in self.results.values():
+                executor.submit(self._read, result)
+            while pending:
+                result, page = self._queue.get()
+                if page is None:
+                    pending -= 1
+                    continue
+                yield result, page
+        finally:
+            self._cancelled.set()
+            executor.shutdown(wait=True)
+
+    def _put(self, item):
+        while not self._cancelled.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+        raise _Cancelled()
+
+    def _read(self, result):
+        source = result.source
+        queued_at = time.perf_counter()
+        try:
+            with self._semaphores[source.server_uri]:
+                started = time.perf_counter()
+                result.wait_seconds = started - queued_at
+                conn = self.connect(source)
+                result.connect_seconds = time.perf_counter() - started
+                try:
+                    result.watermark = highest_committed_usn(conn)
+                    started = time.perf_counter()
+                    for page in iter_pages(conn, source.search_base, result.search_filter,
+                                           self.attributes, self.page_size):
+                        result.pages += 1
+                        result.entries += len(page)
+                        for item in page:
+                            usn = _usn(item)
+                            if usn is not None and (result.max_usn is None or usn > result.max_usn):
+                                result.max_usn = usn
+                        self._put((result, page))
+                    result.read_seconds = time.perf_counter() - started
+                finally:
+                    conn.unbind()
+        except _Cancelled:
+            return
+        except Exception as e:
+            logger.error(f"LDAP sync of {source.search_base} on {source.server_uri} failed: {e}")
+            result.error = e
+        try:
+            self._put((result, None))
+        except _Cancelled:
+            pass
+
+
+class UserSyncer:
+    """
+    Applies directory pages to auth.User, and to group memberships with
+    sync_groups (the search must then request memberOf).
+    stats counts: found, created, updated, unchanged, skipped (no username),
+    duplicates, deactivated, groups_added, groups_removed
+    """
+
+    def __init__(self, dry_run=False, sync_groups=False):
+        self.dry_run = dry_run
+        self.sync_groups = sync_groups
+        self.stats = Counter()
+        self.seen = set()
+
+    def apply_page(self, items):
+        records = {}
+        for item in items:
+            self.stats['found'] += 1
+            record = parse_entry(item)
+            if record is None:
+                self.stats['skipped'] += 1
+                continue
+            if record.username in records or record.username in self.seen:
+                # Listed by another search base or server, the first one wins
+                self.stats['duplicates'] += 1
+                continue
+            records[record.username] = record
+        if not records:
+            return
+        self.seen.update(records)
+
+        existing = {
+            user.username: user
+            for user in User.objects.filter(username__in=list(records)).only('id', 'username', *USER_FIELDS)
+        }
+        to_create, to_update = [], []
+        for username, record in records.items():
+            user = existing.get(username)
+            if user is None:
+                # Directory users authenticate against LDAP, never with a local password
+                to_create.append(User(
+                    username=username, email=record.email, first_name=record.first_name,
+                    last_name=record.last_name, is_active=record.is_active, password=make_password(None),
+                ))
+                continue
+            changed = False
+            for field in USER_FIELDS:
+                value = getattr(record, field)
+                if getattr(user, field) != value:
+                    setattr(user, field, value)
+                    changed = True
+            if changed:
+                to_update.append(user)
+            else:
+                self.stats['unchanged'] += 1
+
+        self.stats['created'] += len(to_create)
+        self.stats['updated'] += len(to_update)
+        if not self.dry_run and (to_create or to_update):
+            with transaction.atomic():
+                User.objects.bulk_create(to_create, batch_size=WRITE_CHUNK_SIZE)
+                User.objects.bulk_update(to_update, USER_FIELDS, batch_size=WRITE_CHUNK_SIZE)
+            if to_update:
+                # bulk_update sends no post_save, drop stale authentication cache entries
+                authentication.invalidate_users([user.pk for user in to_update])
+            caching.invalidate(['auth.User'])
+        if self.sync_groups:
+            self._sync_groups(records, existing, to_create)
+
+    def _sync_groups(self, records, existing, created):
+        user_ids = {username: user.pk for username, user in existing.items()}
+        user_ids.update((user.username, user.pk) for user in created if user.pk is not None)
+        missing = [user.username for user in created if user.pk is None]
+        if missing and not self.dry_run:
+            # Backends without RETURNING do not set pks on bulk_create
+            user_ids.update(User.objects.filter(username__in=missing).values_list('username', 'id'))
+        group_stats = sync_group_memberships(
+            {user_id: records[username].member_of for username, user_id in user_ids.items()},
+            # AD group CNs as they are, like interactive logins (api/ldap_auth.py)
+            dry_run=self.dry_run, mapping={},
+        )
+        self.stats.update(group_stats)
+
+    def deactivate_missing(self):
+        """Deactivate active Django users that were not seen in the directory"""
+        missing = [
+            pk for pk, username in User.objects.filter(is_active=True).values_list('pk', 'username').iterator()
+            if username not in self.seen
+        ]
+        self.stats['deactivated'] = len(missing)
+        if self.dry_run or not missing:
+            return len(missing)
+        with transaction.atomic():
+            for start in range(0, len(missing), WRITE_CHUNK_SIZE):
+                User.objects.filter(pk__in=missing[start:start + WRITE_CHUNK_SIZE]).update(is_active=False)
+        authentication.invalidate_users(missing)
+        caching.invalidate(['auth.User'])
+        return len(missing)
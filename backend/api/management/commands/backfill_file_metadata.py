@@ -0,0 +1,63 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from api.models import LibraryDocument
+from api.uploads import guess_mime_type, scan_file
+
+METADATA_FIELDS = ['file_size', 'file_mime_type', 'file_sha256', 'file_page_count']
+
+
+def _scan(document):
+    """Read a stored file once; runs in a worker thread"""
+    try:
+        with document.file.open('rb') as fileobj:
+            digest = scan_file(fileobj, document.file.name)
+    except (FileNotFoundError, OSError) as exc:
+        return document, None, str(exc)
+    return document, digest, None
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill file size, MIME type, SHA-256 and page count for library documents '
+        'uploaded before those columns existed'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Files scanned in parallel')
+        parser.add_argument('--batch-size', type=int, default=200, help='Rows written per bulk update')
+        parser.add_argument('--force', action='store_true', help='Rescan documents that already have metadata')
+
+    def handle(self, *args, **options):
+        queryset = LibraryDocument.objects.exclude(file='').exclude(file__isnull=True)
+        if not options['force']:
+            queryset = queryset.filter(file_sha256='')
+        queryset = queryset.only('id', 'file', *METADATA_FIELDS).order_by('id')
+
+        total = queryset.count()
+        self.stdout.write(f'Scanning {total} documents with {options["workers"]} workers...')
+
+        updated = missing = 0
+        batch = []
+        # Storage reads are I/O bound, the database writes stay in this thread
+        with ThreadPoolExecutor(max_workers=max(options['workers'], 1)) as pool:
+            for document, digest, error in pool.map(_scan, queryset.iterator(chunk_size=options['batch_size'])):
+                if digest is None:
+                    missing += 1
+                    self.stderr.write(f'Document {document.pk}: {error}')
+                    continue
+                document.file_size = digest.size
+                document.file_mime_type = guess_mime_type(document.file.name)
+                document.file_sha256 = digest.sha256.hexdigest()
+                document.file_page_count = digest.page_count
+                batch.append(document)
+                if len(batch) >= options['batch_size']:
+                    LibraryDocument.objects.bulk_update(batch, METADATA_FIELDS)
+                    updated += len(batch)
+                    batch = []
+        if batch:
+            LibraryDocument.objects.bulk_update(batch, METADATA_FIELDS)
+            updated += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Updated {updated} documents ({missing} files missing)'))
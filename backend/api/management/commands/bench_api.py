@@ -0,0 +1,179 @@
+import json
+import queue
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api import counters
+from api.urls import router
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive every router endpoint (list, detail and GET extra actions) through the Django test '
+        'client with several concurrent clients, authenticated as the seed_benchmark_data admin. '
+        'Reports p50/p95/p99 latency, queries per request and bytes per response; --output writes '
+        'JSON that --compare can diff against a later run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', default='bench_admin', help='User the requests are made as')
+        parser.add_argument('--requests', type=int, default=50, help='Timed requests per endpoint')
+        parser.add_argument('--concurrency', type=int, default=4, help='Concurrent clients (threads)')
+        parser.add_argument('--page-size', type=int, default=20, help='page_size of list requests')
+        parser.add_argument('--endpoint', action='append', default=[],
+                            help='Only run endpoints whose name contains this (repeatable)')
+        parser.add_argument('--label', default='', help='Free-form label stored in the JSON (e.g. a commit)')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--compare', help='JSON of a previous run to print deltas against')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['username']}' not found, run seed_benchmark_data first")
+        token = Token.objects.get_or_create(user=user)[0].key
+
+        endpoints = [
+            (name, url) for name, url in self.endpoints(options['page_size'])
+            if not options['endpoint'] or any(part in name for part in options['endpoint'])
+        ]
+        if not endpoints:
+            raise CommandError('No endpoint matches --endpoint')
+
+        results = {}
+        # The test client talks to the app in-process as 'testserver'
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for name, url in endpoints:
+                results[name] = self.run_endpoint(url, token, options['requests'], options['concurrency'])
+                self.report(name, results[name])
+        # Views and downloads were buffered; nothing the benchmark should leave pending
+        counters.flush()
+
+        report = {
+            'label': options['label'],
+            'created_at': datetime.now(dt_timezone.utc).isoformat(timespec='seconds'),
+            'database': connection.vendor,
+            'options': {key: options[key] for key in ('username', 'requests', 'concurrency', 'page_size')},
+            'endpoints': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2, sort_keys=True)
+            self.stdout.write(f'Results written to {options["output"]}')
+        if options['compare']:
+            with open(options['compare']) as fh:
+                self.compare(json.load(fh), report)
+
+    def endpoints(self, page_size):
+        """(route name, url) of every GET route of the router, named like api/instrumentation.py labels"""
+        for prefix, viewset, basename in router.registry:
+            actions = [action for action in viewset.get_extra_actions() if 'get' in action.mapping]
+            yield f'{basename}-list', f'/api/{prefix}/?page_size={page_size}'
+            for action in actions:
+                if not action.detail:
+                    yield f'{basename}-{action.url_name}', f'/api/{prefix}/{action.url_path}/?page_size={page_size}'
+
+            instance = viewset.queryset.model.objects.order_by('pk').only('pk').first()
+            if instance is None:
+                continue
+            yield f'{basename}-detail', f'/api/{prefix}/{instance.pk}/'
+            for action in actions:
+                if action.detail:
+                    yield f'{basename}-{action.url_name}', f'/api/{prefix}/{instance.pk}/{action.url_path}/'
+
+    def run_endpoint(self, url, token, requests, concurrency):
+        pending = queue.Queue()
+        for _ in range(requests):
+            pending.put(None)
+        samples = []
+        lock = threading.Lock()
+
+        def worker():
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+            try:
+                # Warm-up request per client (connection setup, process caches), not measured
+                client.get(url)
+                while True:
+                    try:
+                        pending.get_nowait()
+                    except queue.Empty:
+                        return
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        response = client.get(url)
+                        elapsed = time.perf_counter() - started
+                    size = len(b''.join(response.streaming_content) if response.streaming else response.content)
+                    with lock:
+                        samples.append((elapsed * 1000, len(queries), size, response.status_code))
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(max(1, concurrency))]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+
+        latencies = sorted(sample[0] for sample in samples)
+        statuses = {}
+        for sample in samples:
+            statuses[str(sample[3])] = statuses.get(str(sample[3]), 0) + 1
+        count = len(samples) or 1
+        return {
+            'url': url,
+            'requests': len(samples),
+            'status_codes': statuses,
+            'errors': sum(1 for sample in samples if sample[3] >= 400),
+            'p50_ms': round(percentile(latencies, 0.50), 2),
+            'p95_ms': round(percentile(latencies, 0.95), 2),
+            'p99_ms': round(percentile(latencies, 0.99), 2),
+            'mean_ms': round(sum(latencies) / count, 2),
+            'requests_per_second': round(len(samples) / wall, 1) if wall else 0.0,
+            'queries_per_request': round(sum(sample[1] for sample in samples) / count, 2),
+            'bytes_per_response': round(sum(sample[2] for sample in samples) / count),
+        }
+
+    def report(self, name, result):
+        line = (
+            f'{name:<45} p50={result["p50_ms"]:>8.1f}ms p95={result["p95_ms"]:>8.1f}ms '
+            f'p99={result["p99_ms"]:>8.1f}ms queries={result["queries_per_request"]:>6.1f} '
+            f'bytes={result["bytes_per_response"]:>8} rps={result["requests_per_second"]:>7.1f}'
+        )
+        if result['errors']:
+            line += self.style.WARNING(f' status={result["status_codes"]}')
+        self.stdout.write(line)
+
+    def compare(self, before, after):
+        self.stdout.write(f'\nChanges against {before.get("label") or before.get("created_at")}:')
+        for name, result in after['endpoints'].items():
+            previous = before.get('endpoints', {}).get(name)
+            if previous is None:
+                self.stdout.write(f'{name:<45} (new)')
+                continue
+            p95 = result['p95_ms'] - previous['p95_ms']
+            change = p95 / previous['p95_ms'] * 100 if previous['p95_ms'] else 0.0
+            self.stdout.write(
+                f'{name:<45} p95 {previous["p95_ms"]:.1f} -> {result["p95_ms"]:.1f}ms ({change:+.0f}%), '
+                f'queries {previous["queries_per_request"]:.1f} -> {result["queries_per_request"]:.1f}, '
+                f'bytes {previous["bytes_per_response"]} -> {result["bytes_per_response"]}'
+            )
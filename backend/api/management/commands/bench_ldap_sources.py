@@ -0,0 +1,94 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api import authentication
+from api.ldap_fake import FakeDirectory
+from api.ldap_sync import ParallelDirectoryReader, SyncSource, UserSyncer
+from api.management.commands.sync_ldap_users import peak_memory_mb
+
+SYNC_FILTER = '(&(objectClass=user)(sAMAccountName=*))'
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the multi-source LDAP sync against in-process fake directories with simulated '
+        'network latency, for several worker counts. Each source is one OU on its own fake server; '
+        'a share of users is listed by two sources. After an initial import, unchanged resyncs are '
+        'timed per worker count. Data is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sources', type=int, default=4, help='Search bases (one fake server each)')
+        parser.add_argument('--entries', type=int, default=5000, help='Users per source')
+        parser.add_argument('--page-size', type=int, default=500, help='Paged search size')
+        parser.add_argument('--latency-ms', type=float, default=50, help='Simulated round trip per search request')
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8], help='Worker counts to compare')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        connections = {}
+        for i in range(options['sources']):
+            directory = FakeDirectory(base=f'DC=site{i},DC=example,DC=com')
+            directory.add_users(options['entries'], prefix=f's{i}u')
+            # Every source also lists the first 5% of the next source's users
+            directory.add_users(options['entries'] // 20, prefix=f's{(i + 1) % options["sources"]}u')
+            source = SyncSource(f'ldap://dc{i}.example.com', directory.base)
+            connections[source] = self.with_latency(directory.connect(), options['latency_ms'] / 1000)
+        self.stdout.write(
+            f'{options["sources"]} fake directories with {options["entries"]} users each built '
+            f'in {time.perf_counter() - started:.1f}s, latency {options["latency_ms"]:.0f}ms per page'
+        )
+
+        def connect(source):
+            conn = connections[source]
+            if conn.closed:
+                conn.open()
+                conn.bind()
+            return conn
+
+        sources = list(connections)
+        try:
+            with transaction.atomic():
+                self.run('initial import', connect, sources, max(options['workers']), options['page_size'])
+                # Resyncs are read-bound, which is what the workers parallelize
+                for workers in options['workers']:
+                    self.run('resync', connect, sources, workers, options['page_size'])
+                raise _Rollback()
+        except _Rollback:
+            pass
+        authentication.cache.clear()
+
+    @staticmethod
+    def with_latency(conn, latency):
+        search = conn.search
+
+        def slow_search(*args, **kwargs):
+            time.sleep(latency)
+            return search(*args, **kwargs)
+        conn.search = slow_search
+        return conn
+
+    def run(self, label, connect, sources, workers, page_size):
+        syncer = UserSyncer()
+        reader = ParallelDirectoryReader(
+            connect, {source: SYNC_FILTER for source in sources},
+            page_size=page_size, workers=workers, connections_per_server=1,
+        )
+        started = time.perf_counter()
+        for result, page in reader.pages():
+            syncer.apply_page(page)
+        elapsed = time.perf_counter() - started
+        stats = syncer.stats
+        slowest = max(reader.results.values(), key=lambda result: result.read_seconds)
+        self.stdout.write(
+            f'{label:<14} workers={workers:<2} {stats["found"]} entries in {elapsed:.2f}s '
+            f'({stats["found"] / elapsed:.0f} entries/sec), created={stats["created"]} '
+            f'duplicates={stats["duplicates"]}, slowest source read {slowest.read_seconds:.2f}s, '
+            f'peak memory {peak_memory_mb():.0f} MB'
+        )
@@ -0,0 +1,69 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from api.ldap_fake import FakeDirectory
+from api.ldap_sync import SYNC_ATTRIBUTES, UserSyncer, delta_filter, highest_committed_usn, iter_pages
+from api.management.commands.sync_ldap_users import peak_memory_mb
+
+SYNC_FILTER = '(&(objectClass=user)(sAMAccountName=*))'
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the paged LDAP sync against an in-process fake directory: an initial import, '
+        'full resyncs and an incremental (uSNChanged) resync. Reports entries/sec, queries and peak memory. '
+        'Data is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entries', type=int, default=100000, help='Users in the fake directory')
+        parser.add_argument('--page-size', type=int, default=1000, help='Paged search size')
+
+    def handle(self, *args, **options):
+        directory = FakeDirectory()
+        started = time.perf_counter()
+        directory.add_users(options['entries'], prefix='bench', disabled_every=50)
+        conn = directory.connect()
+        self.stdout.write(f'Fake directory with {options["entries"]} users built in {time.perf_counter() - started:.1f}s')
+
+        try:
+            with transaction.atomic():
+                page_size = options['page_size']
+                self.run_pass('initial import', conn, directory.base, SYNC_FILTER, page_size)
+                self.run_pass('full, no changes', conn, directory.base, SYNC_FILTER, page_size)
+                watermark = highest_committed_usn(conn)
+                for username in list(directory.entries)[::10]:
+                    directory.update_user(username, mail='changed@example.com')
+                conn.unbind()
+                conn = directory.connect()
+                self.run_pass('delta, 10% changed', conn, directory.base,
+                              delta_filter(SYNC_FILTER, watermark), page_size, full=False)
+                self.run_pass('full, no changes', conn, directory.base, SYNC_FILTER, page_size)
+                raise _Rollback()
+        except _Rollback:
+            pass
+        conn.unbind()
+
+    def run_pass(self, label, conn, base, ldap_filter, page_size, full=True):
+        syncer = UserSyncer()
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for page in iter_pages(conn, base, ldap_filter, SYNC_ATTRIBUTES, page_size):
+                syncer.apply_page(page)
+            if full:
+                syncer.deactivate_missing()
+            elapsed = time.perf_counter() - started
+        stats = syncer.stats
+        self.stdout.write(
+            f'{label:<20} {stats["found"]} entries in {elapsed:.2f}s '
+            f'({stats["found"] / elapsed:.0f} entries/sec), created={stats["created"]} '
+            f'updated={stats["updated"]} unchanged={stats["unchanged"]}, '
+            f'{len(queries)} queries, peak memory {peak_memory_mb():.0f} MB'
+        )
@@ -0,0 +1,105 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User, Group
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+
+from api.models import LibraryDocument
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark library document visibility (ACL) queries on synthetic data. '
+        'Compares the legacy COUNT(groups)+DISTINCT query with the is_public/semi-join query. '
+        'All data is created inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documents', type=int, default=50000, help='Number of documents to generate')
+        parser.add_argument('--groups', type=int, default=200, help='Number of groups to generate')
+        parser.add_argument('--user-groups', type=int, default=5, help='Groups the benchmark user belongs to')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per query')
+        parser.add_argument('--page-size', type=int, default=10, help='Rows fetched per list page')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+    def run(self, options):
+        rng = random.Random(options['seed'])
+        self.stdout.write(f"Generating {options['documents']} documents x {options['groups']} groups...")
+
+        author = User.objects.create_user(username='bench_visibility_author')
+        user = User.objects.create_user(username='bench_visibility_reader')
+        groups = Group.objects.bulk_create([
+            Group(name=f'bench_visibility_{i}') for i in range(options['groups'])
+        ])
+        user.groups.add(*rng.sample(groups, min(options['user_groups'], len(groups))))
+
+        documents = LibraryDocument.objects.bulk_create([
+            LibraryDocument(
+                title=f'Documento {i}', code=f'BENCH-VIS-{i}', author=author,
+                status='published', content='x' * 200,
+            )
+            for i in range(options['documents'])
+        ], batch_size=2000)
+
+        # ~30% public, the rest shared with 1-3 groups
+        Access = LibraryDocument.groups.through
+        access_rows = []
+        restricted_ids = []
+        for document in documents:
+            if rng.random() < 0.3:
+                continue
+            restricted_ids.append(document.pk)
+            for group in rng.sample(groups, rng.randint(1, 3)):
+                access_rows.append(Access(librarydocument_id=document.pk, group_id=group.pk))
+        Access.objects.bulk_create(access_rows, batch_size=5000)
+        LibraryDocument.objects.filter(pk__in=restricted_ids).update(is_public=False)
+
+        def legacy():
+            queryset = LibraryDocument.objects.annotate(
+                groups_count=Count('groups')
+            ).filter(
+                Q(groups_count=0) | Q(groups__in=user.groups.all())
+            ).distinct()
+            return queryset
+
+        def current():
+            return LibraryDocument.objects.visible_to(user)
+
+        page_size = options['page_size']
+        results = {}
+        for label, build in (('legacy', legacy), ('visible_to', current)):
+            timings = []
+            count = None
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                queryset = build().order_by('-created_at')
+                count = queryset.count()
+                list(queryset[:page_size])
+                timings.append((time.perf_counter() - start) * 1000)
+            results[label] = (count, timings)
+
+        legacy_count = results['legacy'][0]
+        for label, (count, timings) in results.items():
+            timings.sort()
+            p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0]
+            self.stdout.write(
+                f'{label:>12}: count={count} median={statistics.median(timings):.1f}ms '
+                f'p95={p95:.1f}ms (COUNT + first page of {page_size})'
+            )
+        if results['visible_to'][0] != legacy_count:
+            self.stdout.write(self.style.ERROR('Visible document counts differ between queries!'))
@@ -0,0 +1,99 @@
+import time
+
+from django.contrib.auth.models import User, Group
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+from rest_framework.request import Request
+
+from api import roles
+from api.permissions import IsDepartmentManager, IsHRManager, IsOwnerOrManager
+
+
+class _Rollback(Exception):
+    pass
+
+
+class _Obj:
+    author = None
+
+
+def _legacy_has_role(user, names):
+    # What every permission class did before api/roles.py
+    return user.groups.filter(name__in=names).exists()
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark role checks for a write request guarded by (IsDepartmentManager | IsHRManager) '
+        'plus an IsOwnerOrManager object check. Compares the legacy query-per-check with the '
+        'role resolver (per-request memo and process cache). Data is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Simulated requests per variant')
+        parser.add_argument('--groups', type=int, default=10, help='Groups the benchmark user belongs to')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise _Rollback()
+        except _Rollback:
+            pass
+        roles.invalidate()
+
+    def run(self, options):
+        user = User.objects.create_user(username='bench_role_user')
+        groups = [Group.objects.create(name=f'bench_group_{i}') for i in range(options['groups'])]
+        groups.append(Group.objects.get_or_create(name='Gerentes_RH')[0])
+        user.groups.add(*groups)
+
+        factory = APIRequestFactory()
+        managers = ['Department_Managers', 'HR_Managers', 'Project_Managers',
+                    'Gerentes_Departamento', 'Gerentes_RH', 'Gerentes_Proyecto']
+
+        def legacy_request(request):
+            # (IsDepartmentManager | IsHRManager) then IsOwnerOrManager, one query each
+            allowed = (_legacy_has_role(request.user, ['Department_Managers', 'Gerentes_Departamento'])
+                       or _legacy_has_role(request.user, ['HR_Managers', 'Gerentes_RH']))
+            return allowed and _legacy_has_role(request.user, managers)
+
+        def resolver_request(request):
+            permission = (IsDepartmentManager | IsHRManager)()
+            return (permission.has_permission(request, None)
+                    and IsOwnerOrManager().has_object_permission(request, None, _Obj()))
+
+        results = []
+        for label, check, warm in (
+            ('legacy (query per check)', legacy_request, False),
+            ('resolver, cold cache', resolver_request, False),
+            ('resolver, warm cache', resolver_request, True),
+        ):
+            queries = 0
+            started = time.perf_counter()
+            for _ in range(options['requests']):
+                if not warm:
+                    roles.invalidate()
+                # A fresh user object per request, as authentication would return
+                request = Request(factory.post('/'))
+                request.user = _fresh(user)
+                with CaptureQueriesContext(connection) as captured:
+                    if not check(request):
+                        raise RuntimeError('Benchmark user should be allowed')
+                queries += len(captured)
+            elapsed = time.perf_counter() - started
+            results.append((label, queries / options['requests'], elapsed * 1000 / options['requests']))
+
+        self.stdout.write(f'{options["requests"]} requests, user in {len(groups)} groups')
+        for label, per_request, ms in results:
+            self.stdout.write(f'  {label:<26} {per_request:5.2f} queries/request  {ms:7.3f} ms/request')
+
+
+def _fresh(user):
+    """Unsaved-looking copy of the user without any memoized state"""
+    clone = User(pk=user.pk, username=user.username)
+    clone._state.adding = False
+    clone._state.db = user._state.db
+    return clone
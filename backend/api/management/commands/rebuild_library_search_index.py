@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.models import LibraryDocument
+from api.search import get_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of the document library'
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        self.stdout.write(f'Rebuilding library search index ({backend.name} backend)...')
+        with transaction.atomic():
+            backend.uninstall(transaction.get_connection())
+            backend.install(transaction.get_connection())
+            count = backend.rebuild(LibraryDocument.objects.all().iterator())
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} documents'))
@@ -0,0 +1,335 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from api import authentication, caching, roles
+from api.models import (
+    Department, LibraryDocument, Policy, PolicyDistribution, TrainingPlan, TrainingProvider,
+    TrainingQuotation, TrainingSession, TrainingAttendance,
+    InternalVacancy, VacancyApplication, VacancyTransition,
+    ForumCategory, ForumPost,
+)
+from api.search import get_backend
+from api.signals import refresh_reply_stats
+
+WORDS = (
+    'auditoría control interno riesgo contable financiero informe procedimiento manual política '
+    'norma cumplimiento revisión aprobación gerencia departamento capacitación personal vacante '
+    'presupuesto balance activo pasivo patrimonio impuesto tributario nómina contrato proveedor '
+    'sistema seguridad información respaldo acceso usuario red servidor documento versión anexo '
+    'objetivo alcance responsabilidad indicador gestión calidad mejora proceso evaluación'
+).split()
+
+# Groups the benchmark admin belongs to, so manager-only endpoints return data
+ADMIN_GROUPS = ['HR_Managers', 'Department_Managers']
+
+
+def choices(model, field='STATUS_CHOICES'):
+    return [value for value, _ in getattr(model, field)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a deterministic synthetic data set at production-like volumes (users, groups, '
+        'departments, library documents with group ACLs, policies, trainings, vacancies and forum '
+        'threads) with bulk_create. Rows are named with --prefix; --clear removes a previous run. '
+        'The <prefix>_admin user (staff, HR and department manager) is the one bench_api uses.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='bench', help='Prefix of generated usernames, codes and names')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk_create')
+        parser.add_argument('--clear', action='store_true', help='Delete data of a previous run with this prefix first')
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--groups-per-user', type=int, default=3)
+        parser.add_argument('--departments', type=int, default=20)
+        parser.add_argument('--documents', type=int, default=10000)
+        parser.add_argument('--content-kb', type=int, default=8, help='Approximate content size per document')
+        parser.add_argument('--public-ratio', type=float, default=0.3, help='Share of documents without group ACL')
+        parser.add_argument('--policies', type=int, default=300)
+        parser.add_argument('--distributions-per-policy', type=int, default=20)
+        parser.add_argument('--training-plans', type=int, default=200)
+        parser.add_argument('--sessions-per-plan', type=int, default=3)
+        parser.add_argument('--attendees-per-session', type=int, default=15)
+        parser.add_argument('--providers', type=int, default=30)
+        parser.add_argument('--vacancies', type=int, default=100)
+        parser.add_argument('--applications-per-vacancy', type=int, default=10)
+        parser.add_argument('--forum-categories', type=int, default=8)
+        parser.add_argument('--threads', type=int, default=2000)
+        parser.add_argument('--replies-per-thread', type=int, default=5)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.prefix = options['prefix']
+        self.batch_size = options['batch_size']
+        self.options = options
+
+        if options['clear']:
+            self.clear()
+        elif User.objects.filter(username__startswith=f'{self.prefix}_').exists():
+            raise CommandError(f"Benchmark data with prefix '{self.prefix}' exists, use --clear to replace it")
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            self.seed_people()
+            self.seed_library()
+            self.seed_policies()
+            self.seed_trainings()
+            self.seed_vacancies()
+            self.seed_forum()
+        # Bulk writes bypass the signals that keep these caches in sync
+        authentication.cache.clear()
+        roles.invalidate()
+        caching.invalidate()
+        self.stdout.write(self.style.SUCCESS(
+            f'Benchmark data generated in {time.perf_counter() - started:.1f}s '
+            f'(log in as {self.prefix}_admin, token {self.token})'
+        ))
+
+    # Helpers
+
+    def bulk(self, model, objects):
+        """bulk_create in batches; returns the objects with their primary keys"""
+        created = model.objects.bulk_create(objects, batch_size=self.batch_size)
+        self.stdout.write(f'  {model._meta.verbose_name_plural}: {len(created)}')
+        return created
+
+    def text(self, words):
+        return ' '.join(self.rng.choices(WORDS, k=words))
+
+    def sample(self, population, count):
+        return self.rng.sample(population, min(count, len(population)))
+
+    def clear(self):
+        prefix = f'{self.prefix}_'
+        with transaction.atomic():
+            # Deleting the users cascades to everything they authored, requested or attended
+            deleted, _ = User.objects.filter(username__startswith=prefix).delete()
+            deleted += Group.objects.filter(name__startswith=prefix).delete()[0]
+            deleted += Department.objects.filter(name__startswith=prefix).delete()[0]
+            deleted += TrainingProvider.objects.filter(name__startswith=prefix).delete()[0]
+            deleted += ForumCategory.objects.filter(name__startswith=prefix).delete()[0]
+        self.stdout.write(f'Deleted {deleted} rows of a previous run')
+
+    # Generators
+
+    def seed_people(self):
+        options = self.options
+        self.stdout.write('Users, groups and departments...')
+        password = make_password(None)
+        self.groups = self.bulk(Group, [Group(name=f'{self.prefix}_group_{i:03d}') for i in range(options['groups'])])
+        self.departments = self.bulk(Department, [
+            Department(name=f'{self.prefix}_department_{i:03d}', description=self.text(20))
+            for i in range(options['departments'])
+        ])
+        self.users = self.bulk(User, [
+            User(
+                username=f'{self.prefix}_user_{i:06d}', email=f'{self.prefix}.user{i}@example.com',
+                first_name=f'Nombre{i}', last_name=f'Apellido{i}', password=password,
+            )
+            for i in range(options['users'])
+        ])
+        Membership = User.groups.through
+        self.bulk(Membership, [
+            Membership(user_id=user.pk, group_id=group.pk)
+            for user in self.users
+            for group in self.sample(self.groups, options['groups_per_user'])
+        ])
+
+        admin = User.objects.create_user(
+            username=f'{self.prefix}_admin', email=f'{self.prefix}.admin@example.com',
+            first_name='Admin', last_name='Benchmark', is_staff=True,
+        )
+        admin.groups.add(*[Group.objects.get_or_create(name=name)[0] for name in ADMIN_GROUPS])
+        admin.groups.add(*self.groups[:options['groups_per_user']])
+        self.admin = admin
+        self.token = Token.objects.create(user=admin).key
+
+    def seed_library(self):
+        options = self.options
+        self.stdout.write('Library documents...')
+        words = max(1, options['content_kb'] * 1024 // 8)
+        types = choices(LibraryDocument, 'DOCUMENT_TYPE_CHOICES')
+        statuses = choices(LibraryDocument)
+        documents = self.bulk(LibraryDocument, [
+            LibraryDocument(
+                title=self.text(6).capitalize(), code=f'{self.prefix.upper()}-DOC-{i:06d}',
+                description=self.text(40), content=self.text(words),
+                document_type=self.rng.choice(types), status=self.rng.choice(statuses),
+                tags=','.join(self.sample(WORDS, 3)), department=self.rng.choice(self.departments),
+                author=self.rng.choice(self.users), approver=self.rng.choice(self.users),
+                view_count=self.rng.randint(0, 500), download_count=self.rng.randint(0, 100),
+            )
+            for i in range(options['documents'])
+        ])
+
+        Access = LibraryDocument.groups.through
+        access, restricted = [], []
+        for document in documents:
+            if self.rng.random() < options['public_ratio']:
+                continue
+            restricted.append(document.pk)
+            for group in self.sample(self.groups, self.rng.randint(1, 3)):
+                access.append(Access(librarydocument_id=document.pk, group_id=group.pk))
+        self.bulk(Access, access)
+        for start in range(0, len(restricted), self.batch_size):
+            LibraryDocument.objects.filter(pk__in=restricted[start:start + self.batch_size]).update(is_public=False)
+
+        started = time.perf_counter()
+        indexed = get_backend().rebuild(LibraryDocument.objects.filter(pk__in=[d.pk for d in documents]).iterator())
+        self.stdout.write(f'  search index: {indexed} documents in {time.perf_counter() - started:.1f}s')
+
+    def seed_policies(self):
+        options = self.options
+        self.stdout.write('Policies...')
+        statuses = choices(Policy)
+        origins = choices(Policy, 'ORIGIN_CHOICES')
+        policies = self.bulk(Policy, [
+            Policy(
+                title=self.text(5).capitalize(), code=f'{self.prefix.upper()}-POL-{i:05d}',
+                description=self.text(40), content=self.text(400), department=self.rng.choice(self.departments),
+                status=self.rng.choice(statuses), origin=self.rng.choice(origins),
+                origin_justification=self.text(20), created_by=self.rng.choice(self.users),
+                auditor_reviewer=self.rng.choice(self.users), peer_reviewer=self.rng.choice(self.users),
+            )
+            for i in range(options['policies'])
+        ])
+        self.bulk(PolicyDistribution, [
+            PolicyDistribution(
+                policy=policy, recipient=recipient, distributed_by=policy.created_by,
+                acknowledged=self.rng.random() < 0.6,
+            )
+            for policy in policies
+            for recipient in self.sample(self.users, options['distributions_per_policy'])
+        ])
+
+    def seed_trainings(self):
+        options = self.options
+        self.stdout.write('Trainings...')
+        providers = self.bulk(TrainingProvider, [
+            TrainingProvider(name=f'{self.prefix}_provider_{i:03d}', specialties=self.text(5))
+            for i in range(options['providers'])
+        ])
+        plans = self.bulk(TrainingPlan, [
+            TrainingPlan(
+                title=self.text(5).capitalize(), description=self.text(40), topics=self.text(20),
+                origin=self.rng.choice(choices(TrainingPlan, 'ORIGIN_CHOICES')),
+                scope=self.rng.choice(choices(TrainingPlan, 'SCOPE_CHOICES')),
+                modality=self.rng.choice(choices(TrainingPlan, 'MODALITY_CHOICES')),
+                status=self.rng.choice(choices(TrainingPlan)), duration_hours=self.rng.randint(4, 40),
+                department=self.rng.choice(self.departments), created_by=self.rng.choice(self.users),
+                assigned_manager=self.rng.choice(self.users),
+            )
+            for _ in range(options['training_plans'])
+        ])
+        self.bulk(TrainingQuotation, [
+            TrainingQuotation(
+                training_plan=plan, provider=provider, temario=self.text(30),
+                duration_hours=plan.duration_hours, cost=self.rng.randint(500, 20000),
+            )
+            for plan in plans
+            for provider in self.sample(providers, 2)
+        ])
+        now = timezone.now()
+        session_statuses = choices(TrainingSession)
+        sessions = []
+        for plan in plans:
+            for index in range(options['sessions_per_plan']):
+                start = now + timedelta(days=self.rng.randint(-90, 90))
+                sessions.append(TrainingSession(
+                    training_plan=plan, title=f'{plan.title} ({index + 1})', instructor_name='Instructor',
+                    provider=self.rng.choice(providers), location='Sala de capacitación',
+                    status=self.rng.choice(session_statuses), start_datetime=start,
+                    end_datetime=start + timedelta(hours=4),
+                ))
+        sessions = self.bulk(TrainingSession, sessions)
+        confirmations = choices(TrainingAttendance, 'CONFIRMATION_STATUS_CHOICES')
+        self.bulk(TrainingAttendance, [
+            TrainingAttendance(
+                session=session, analyst=analyst, invited_by=session.training_plan.assigned_manager,
+                confirmation_status=self.rng.choice(confirmations),
+            )
+            for session in sessions
+            for analyst in self.sample(self.users, options['attendees_per_session'])
+        ])
+
+    def seed_vacancies(self):
+        options = self.options
+        self.stdout.write('Vacancies...')
+        vacancies = self.bulk(InternalVacancy, [
+            InternalVacancy(
+                title=self.text(3).capitalize(), department=self.rng.choice(self.departments),
+                description=self.text(60), responsibilities=self.text(40), technical_requirements=self.text(30),
+                competencies=self.text(20), experience_required='3 años', status=self.rng.choice(choices(InternalVacancy)),
+                requested_by=self.rng.choice(self.users), hr_manager=self.admin,
+                authorization_justification=self.text(20),
+            )
+            for _ in range(options['vacancies'])
+        ])
+        applications = self.bulk(VacancyApplication, [
+            VacancyApplication(
+                vacancy=vacancy, applicant=applicant, current_manager=self.rng.choice(self.users),
+                status=self.rng.choice(choices(VacancyApplication)), cover_letter=self.text(80),
+            )
+            for vacancy in vacancies
+            for applicant in self.sample(self.users, options['applications_per_vacancy'])
+        ])
+        # One selected candidate for every fifth vacancy
+        self.bulk(VacancyTransition, [
+            VacancyTransition(
+                application=application, previous_department=self.rng.choice(self.departments),
+                new_department=application.vacancy.department, previous_position='Analista',
+                new_position=application.vacancy.title, hr_coordinator=self.admin,
+            )
+            for application in applications[::options['applications_per_vacancy'] * 5 or 1]
+        ])
+
+    def seed_forum(self):
+        options = self.options
+        self.stdout.write('Forum...')
+        categories = self.bulk(ForumCategory, [
+            ForumCategory(name=f'{self.prefix}_category_{i:02d}', description=self.text(10), order=i)
+            for i in range(options['forum_categories'])
+        ])
+        threads = self.bulk(ForumPost, [
+            ForumPost(
+                category=self.rng.choice(categories), title=self.text(6).capitalize(), content=self.text(120),
+                author=self.rng.choice(self.users), is_pinned=self.rng.random() < 0.02,
+                views_count=self.rng.randint(0, 1000),
+            )
+            for _ in range(options['threads'])
+        ])
+        self.bulk(ForumPost, [
+            ForumPost(
+                category=thread.category, title=f'Re: {thread.title}', content=self.text(60),
+                author=self.rng.choice(self.users), parent_post=thread,
+            )
+            for thread in threads
+            for _ in range(self.rng.randint(0, options['replies_per_thread']))
+        ])
+        thread_ids = [thread.pk for thread in threads]
+        for start in range(0, len(thread_ids), self.batch_size):
+            refresh_reply_stats(thread_ids[start:start + self.batch_size])
+
+        Like = ForumPost.liked_by.through
+        likes = [
+            Like(forumpost_id=thread.pk, user_id=user.pk)
+            for thread in threads
+            for user in self.sample(self.users, self.rng.randint(0, 10))
+        ]
+        self.bulk(Like, likes)
+        liked = {}
+        for like in likes:
+            liked[like.forumpost_id] = liked.get(like.forumpost_id, 0) + 1
+        for thread in threads:
+            thread.likes_count = liked.get(thread.pk, 0)
+        ForumPost.objects.bulk_update(threads, ['likes_count'], batch_size=self.batch_size)
@@ -0,0 +1,29 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import headcount
+
+
+class Command(BaseCommand):
+    help = (
+        'Record the number of active users and the active members of every group for one day '
+        '(api.HeadcountSnapshot). Schedule it daily (cron, systemd timer); running it again for '
+        'the same day replaces that day.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Day to record as YYYY-MM-DD (default: today)')
+
+    def handle(self, *args, **options):
+        day = None
+        if options['date']:
+            try:
+                day = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError(f"Invalid --date '{options['date']}', expected YYYY-MM-DD")
+        rows = headcount.record(day)
+        total = next(row.active_count for row in rows if row.group_name == '')
+        self.stdout.write(self.style.SUCCESS(
+            f'Recorded {len(rows) - 1} groups for {rows[0].date} ({total} active users)'
+        ))
@@ -1,8 +1,22 @@
 import os
+import sys
+import time
+from datetime import timedelta
+
+from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
-from django.contrib.auth.models import User
-from django.db import transaction
-from ldap3 import Server, Connection, ALL, NTLM, SUBTREE
+from django.utils import timezone
+from ldap3 import Server, Connection, ALL
+
+from api.ldap_sync import (
+    SYNC_ATTRIBUTES, ParallelDirectoryReader, SyncSource, UserSyncer, delta_filter, parse_sources,
+)
+from api.models import LDAPSyncState
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
 
 
 class Command(BaseCommand):
@@ -12,13 +26,29 @@ class Command(BaseCommand):
         parser.add_argument('--dry-run', action='store_true', help='Run without saving changes')
         parser.add_argument('--mark-inactive', action='store_true', help='Mark Django users not found in AD as inactive')
         parser.add_argument('--filter', dest='filter', default=None, help='LDAP filter override (e.g., "(&(objectClass=user)(sAMAccountName=*))")')
-        parser.add_argument('--base', dest='base', default=None, help='LDAP search base override')
+        parser.add_argument('--base', dest='base', action='append', default=None,
+                            help='LDAP search base override; repeat for several OUs, use "<server uri>|<base>" '
+                                 'for a base on another domain controller (AUTH_LDAP_SYNC_BASES accepts '
+                                 'the same specs separated by ";")')
+        parser.add_argument('--workers', type=int, default=4, help='Search bases read concurrently')
+        parser.add_argument('--connections-per-server', type=int, default=2,
+                            help='Maximum concurrent connections to one LDAP server')
+        parser.add_argument('--page-size', type=int, default=1000,
+                            help='Entries per paged search request and per database batch (AD MaxPageSize is 1000)')
+        parser.add_argument('--incremental', action='store_true',
+                            help='Only fetch entries changed since the last sync (uSNChanged watermark); '
+                                 'runs a full sync when none is stored or AUTH_LDAP_FULL_SYNC_INTERVAL_HOURS elapsed')
+        parser.add_argument('--full', action='store_true', help='Force a full sync even with --incremental')
+        parser.add_argument('--sync-groups', action='store_true',
+                            help='Also mirror memberOf into Django groups named after the AD group CNs, as logins do. '
+                                 'memberOf changes do not bump a user\'s uSNChanged, incremental runs only '
+                                 'refresh the groups of users that changed otherwise')
 
     def handle(self, *args, **options):
         dry_run = options['dry_run']
         mark_inactive = options['mark_inactive']
         ldap_filter = options['filter']
-        search_base = options['base']
+        bases = options['base']
 
         server_uri = os.environ.get('AUTH_LDAP_SERVER_URI')
         bind_dn = os.environ.get('AUTH_LDAP_BIND_DN')
@@ -32,114 +62,119 @@ class Command(BaseCommand):
             # Use a dedicated sync filter or default to all users
             # Don't use AUTH_LDAP_USER_SEARCH_FILTER as it may contain %(user)s placeholder
             ldap_filter = os.environ.get('AUTH_LDAP_SYNC_FILTER', '(&(objectClass=user)(sAMAccountName=*)(!(objectClass=computer)))')
-        if not search_base:
-            search_base = os.environ.get('AUTH_LDAP_USER_SEARCH_BASE')
+        if not bases:
+            search_base = os.environ.get('AUTH_LDAP_SYNC_BASES') or os.environ.get('AUTH_LDAP_USER_SEARCH_BASE')
             if not search_base:
                 raise CommandError('AUTH_LDAP_USER_SEARCH_BASE environment variable is required or use --base')
-
-        self.stdout.write(f'Connecting to LDAP server {server_uri} ...')
-
-        try:
-            server = Server(server_uri, get_info=ALL)
-            conn = Connection(server, user=bind_dn, password=bind_pw, auto_bind=True)
-        except Exception as e:
-            raise CommandError(f'Failed to connect/bind to LDAP server: {e}')
-
-        self.stdout.write('Connection established. Searching for users...')
-
-        attributes = ['sAMAccountName', 'mail', 'givenName', 'sn', 'userAccountControl']
-
-        try:
-            conn.search(search_base, ldap_filter, SUBTREE, attributes=attributes)
-        except Exception as e:
-            raise CommandError(f'LDAP search failed: {e}')
-
-        entries = conn.entries
-        total = len(entries)
-        created = 0
-        updated = 0
-        skipped = 0
-
-        found_usernames = set()
-
-        for entry in entries:
-            # ldap3 entries provide attributes as properties
-            try:
-                username = str(entry.sAMAccountName) if hasattr(entry, 'sAMAccountName') else None
-            except Exception:
-                username = None
-
-            if not username:
-                self.stdout.write(self.style.WARNING('Skipping entry without sAMAccountName'))
-                skipped += 1
-                continue
-
-            found_usernames.add(username)
-
-            email = str(entry.mail) if hasattr(entry, 'mail') and entry.mail else ''
-            first_name = str(entry.givenName) if hasattr(entry, 'givenName') and entry.givenName else ''
-            last_name = str(entry.sn) if hasattr(entry, 'sn') and entry.sn else ''
-
-            # Determine if account is disabled in AD (userAccountControl bit 2)
-            disabled = False
-            try:
-                uac = int(entry.userAccountControl) if hasattr(entry, 'userAccountControl') and entry.userAccountControl else 0
-                disabled = bool(uac & 2)
-            except Exception:
-                disabled = False
-
-            # Create or update Django user
-            try:
-                user, created_flag = User.objects.get_or_create(username=username)
-                changed = False
-                if user.email != email:
-                    user.email = email
-                    changed = True
-                if user.first_name != first_name:
-                    user.first_name = first_name
-                    changed = True
-                if user.last_name != last_name:
-                    user.last_name = last_name
-                    changed = True
-                # sync is_active from AD if available
-                target_active = not disabled
-                if user.is_active != target_active:
-                    user.is_active = target_active
-                    changed = True
-
-                if dry_run:
-                    if created_flag:
-                        created += 1
-                    elif changed:
-                        updated += 1
-                    else:
-                        skipped += 1
-                else:
-                    if created_flag:
-                        # For created users, set unusable password (they'll authenticate via LDAP)
-                        user.set_unusable_password()
-                        user.save()
-                        created += 1
-                    else:
-                        if changed:
-                            user.save()
-                            updated += 1
-                        else:
-                            skipped += 1
-
-                    # Note: UserProfile model no longer exists in this project.
-                    # Keeping user creation/update only.
-
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f'Error processing user {username}: {e}'))
+            bases = [search_base]
+        sources = parse_sources(bases, server_uri)
+
+        states = {
+            SyncSource(state.server_uri, state.search_base): state
+            for state in LDAPSyncState.objects.filter(server_uri__in={source.server_uri for source in sources})
+        }
+        full_interval = timedelta(hours=settings.AUTH_LDAP_FULL_SYNC_INTERVAL_HOURS)
+        # All sources run in the same mode: deactivation needs a full listing of every source
+        incremental = options['incremental'] and not options['full'] and all(
+            source in states and not states[source].full_sync_due(full_interval) for source in sources
+        )
+        if incremental:
+            filters = {source: delta_filter(ldap_filter, states[source].highest_usn) for source in sources}
+            self.stdout.write('Incremental sync')
+            for source in sources:
+                self.stdout.write(f'  {source.server_uri} {source.search_base}: uSNChanged > {states[source].highest_usn}')
+        else:
+            filters = {source: ldap_filter for source in sources}
+            self.stdout.write('Full sync')
+
+        def connect(source):
+            server = Server(source.server_uri, get_info=ALL)
+            return Connection(server, user=bind_dn, password=bind_pw, auto_bind=True)
+
+        self.stdout.write(f'Searching {len(sources)} source(s) for users...')
+
+        syncer = UserSyncer(dry_run=dry_run, sync_groups=options['sync_groups'])
+        reader = ParallelDirectoryReader(
+            connect, filters,
+            attributes=SYNC_ATTRIBUTES + ['memberOf'] if options['sync_groups'] else SYNC_ATTRIBUTES,
+            page_size=options['page_size'], workers=options['workers'],
+            connections_per_server=options['connections_per_server'],
+        )
+        started = time.perf_counter()
+        for result, page in reader.pages():
+            syncer.apply_page(page)
+            if options['verbosity'] > 1:
+                self.stdout.write(f'  {syncer.stats["found"]} entries processed')
+
+        results = list(reader.results.values())
+        failed = [result for result in results if result.error is not None]
+        if len(failed) == len(results):
+            raise CommandError(f'Failed to connect/bind to LDAP server: {failed[0].error}')
 
         # Optionally mark Django users not found in AD as inactive
         if mark_inactive and not dry_run:
-            qs = User.objects.exclude(username__in=list(found_usernames)).filter(is_active=True)
-            count_marked = qs.update(is_active=False)
-            self.stdout.write(self.style.SUCCESS(f'Marked {count_marked} users inactive (not found in AD)'))
+            if incremental:
+                # A delta only lists changed entries, absence means nothing
+                self.stdout.write('Skipping --mark-inactive on an incremental sync')
+            elif failed:
+                self.stdout.write(self.style.WARNING('Skipping --mark-inactive: not every source was read'))
+            else:
+                count_marked = syncer.deactivate_missing()
+                self.stdout.write(self.style.SUCCESS(f'Marked {count_marked} users inactive (not found in AD)'))
+        elapsed = time.perf_counter() - started
+
+        if not dry_run:
+            for result in results:
+                if result.error is None:
+                    self.save_state(states.get(result.source), result, incremental)
 
         # Summary
+        stats = syncer.stats
         self.stdout.write(self.style.SUCCESS('LDAP sync complete'))
-        self.stdout.write(f'Total found in LDAP: {total}')
-        self.stdout.write(f'Created: {created}, Updated: {updated}, Skipped: {skipped}')
+        self.stdout.write(f'Total found in LDAP: {stats["found"]}')
+        self.stdout.write(
+            f'Created: {stats["created"]}, Updated: {stats["updated"]}, '
+            f'Skipped: {stats["unchanged"] + stats["skipped"]}'
+        )
+        if stats['duplicates']:
+            self.stdout.write(f'Duplicates across sources: {stats["duplicates"]}')
+        if options['sync_groups']:
+            self.stdout.write(
+                f'Group memberships: {stats["groups_added"]} added, {stats["groups_removed"]} removed '
+                f'({stats["users_changed"]} users changed)'
+            )
+        for result in results:
+            source = result.source
+            status = f'FAILED ({result.error})' if result.error is not None else (
+                f'{result.entries} entries in {result.pages} pages'
+            )
+            self.stdout.write(
+                f'  {source.server_uri} {source.search_base}: {status}; waited {result.wait_seconds:.2f}s, '
+                f'connect {result.connect_seconds:.2f}s, read {result.read_seconds:.2f}s'
+            )
+        rate = stats['found'] / elapsed if elapsed > 0 else 0
+        self.stdout.write(f'Elapsed: {elapsed:.2f}s ({rate:.0f} entries/sec), peak memory: {peak_memory_mb():.1f} MB')
+
+        if failed:
+            raise CommandError(f'LDAP sync failed for {len(failed)} of {len(results)} sources')
+
+    def save_state(self, state, result, incremental):
+        if state is None:
+            state = LDAPSyncState(server_uri=result.source.server_uri, search_base=result.source.search_base)
+        highest_usn = result.watermark if result.watermark is not None else result.max_usn
+        if highest_usn is not None:
+            state.highest_usn = max(highest_usn, state.highest_usn or 0) if incremental else highest_usn
+        now = timezone.now()
+        state.last_sync_at = now
+        if not incremental:
+            state.last_full_sync_at = now
+        state.save()
+
+
+def peak_memory_mb():
+    """Peak resident set size of this process (0 where unavailable)"""
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
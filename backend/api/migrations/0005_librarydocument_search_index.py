@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from api.search import get_backend
+
+    backend = get_backend(schema_editor.connection)
+    backend.install(schema_editor.connection)
+
+    LibraryDocument = apps.get_model('api', 'LibraryDocument')
+    backend.rebuild(LibraryDocument.objects.all().iterator())
+
+
+def drop_search_index(apps, schema_editor):
+    from api.search import get_backend
+
+    get_backend(schema_editor.connection).uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_librarydocument_groups'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
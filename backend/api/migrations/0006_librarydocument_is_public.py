@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:25
+
+from django.db import migrations, models
+
+
+def populate_is_public(apps, schema_editor):
+    LibraryDocument = apps.get_model('api', 'LibraryDocument')
+    Access = LibraryDocument.groups.through
+    restricted = Access.objects.values('librarydocument_id')
+    LibraryDocument.objects.filter(pk__in=restricted).update(is_public=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_librarydocument_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='librarydocument',
+            name='is_public',
+            field=models.BooleanField(db_index=True, default=True, editable=False, verbose_name='Acceso Público'),
+        ),
+        migrations.RunPython(populate_is_public, migrations.RunPython.noop),
+    ]
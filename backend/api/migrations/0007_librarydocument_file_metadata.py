@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_librarydocument_is_public'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='librarydocument',
+            name='file_mime_type',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='Tipo MIME'),
+        ),
+        migrations.AddField(
+            model_name='librarydocument',
+            name='file_page_count',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Número de Páginas'),
+        ),
+        migrations.AddField(
+            model_name='librarydocument',
+            name='file_sha256',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='SHA-256 del Archivo'),
+        ),
+        migrations.AddField(
+            model_name='librarydocument',
+            name='file_size',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name='Tamaño del Archivo (bytes)'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:40
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_reply_stats(apps, schema_editor):
+    ForumPost = apps.get_model('api', 'ForumPost')
+    replies = ForumPost.objects.filter(parent_post=OuterRef('pk')).order_by().values('parent_post')
+    parents = ForumPost.objects.filter(parent_post__isnull=False).values('parent_post')
+    ForumPost.objects.filter(pk__in=parents).update(
+        replies_count=Coalesce(Subquery(replies.annotate(n=Count('pk')).values('n'), output_field=IntegerField()), 0),
+        last_reply_at=Subquery(replies.annotate(last=Max('created_at')).values('last')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_librarydocument_file_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forumpost',
+            name='last_reply_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Última Respuesta'),
+        ),
+        migrations.AddField(
+            model_name='forumpost',
+            name='replies_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Número de Respuestas'),
+        ),
+        migrations.RunPython(populate_reply_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_forumpost_reply_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LDAPSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('server_uri', models.CharField(max_length=255, verbose_name='Servidor LDAP')),
+                ('search_base', models.CharField(max_length=255, verbose_name='Base de búsqueda')),
+                ('highest_usn', models.BigIntegerField(blank=True, null=True, verbose_name='uSNChanged más alto sincronizado')),
+                ('last_sync_at', models.DateTimeField(blank=True, null=True, verbose_name='Última sincronización')),
+                ('last_full_sync_at', models.DateTimeField(blank=True, null=True, verbose_name='Última sincronización completa')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Estado de Sincronización LDAP',
+                'verbose_name_plural': 'Estados de Sincronización LDAP',
+                'unique_together': {('server_uri', 'search_base')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-17 02:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_ldapsyncstate'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LDAPUserState',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ldap_state', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('fingerprint', models.CharField(max_length=64, verbose_name='Huella de atributos LDAP')),
+                ('synced_at', models.DateTimeField(verbose_name='Sincronizado')),
+            ],
+            options={
+                'verbose_name': 'Estado LDAP de Usuario',
+                'verbose_name_plural': 'Estados LDAP de Usuario',
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-17 02:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_ldapuserstate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HeadcountSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Fecha')),
+                ('group_name', models.CharField(blank=True, max_length=150, verbose_name='Grupo')),
+                ('active_count', models.PositiveIntegerField(verbose_name='Usuarios Activos')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Instantánea de Plantilla',
+                'verbose_name_plural': 'Instantáneas de Plantilla',
+                'ordering': ['group_name', 'date'],
+                'unique_together': {('group_name', 'date')},
+            },
+        ),
+    ]
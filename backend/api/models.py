@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q
 from django.contrib.auth.models import User, Group
 from django.core.validators import FileExtensionValidator
 from django.utils import timezone
@@ -24,6 +25,28 @@ class Department(models.Model):
 # BUSINESS PROCESS MODELS - IMCP USE CASES
 # ========================================
 
+class LibraryDocumentQuerySet(models.QuerySet):
+    """QuerySet with group-based visibility for library documents"""
+
+    def visible_to(self, user):
+        """
+        Documents a user can see:
+        - Public documents (no groups assigned), OR
+        - Documents shared with at least one of the user's groups
+
+        Uses the maintained is_public flag plus a semi-join on the
+        document/group access table, so no GROUP BY or DISTINCT is needed.
+        """
+        public = Q(is_public=True)
+        if user is None or not user.is_authenticated:
+            return self.filter(public)
+        user_group_ids = User.groups.through.objects.filter(user_id=user.pk).values('group_id')
+        shared = self.model.groups.through.objects.filter(
+            group_id__in=user_group_ids
+        ).values('librarydocument_id')
+        return self.filter(public | Q(pk__in=shared))
+
+
 class LibraryDocument(models.Model):
     """
     Modelo unificado para Biblioteca de Documentos del IMCP
@@ -67,11 +90,18 @@ class LibraryDocument(models.Model):
         validators=[FileExtensionValidator(allowed_extensions=['pdf', 'doc', 'docx', 'xls', 'xlsx', 'txt', 'ppt', 'pptx'])],
         verbose_name="Archivo del Documento"
     )
+    # File metadata captured at upload time (see api/uploads.py)
+    file_size = models.BigIntegerField(null=True, blank=True, editable=False, verbose_name="Tamaño del Archivo (bytes)")
+    file_mime_type = models.CharField(max_length=100, blank=True, editable=False, verbose_name="Tipo MIME")
+    file_sha256 = models.CharField(max_length=64, blank=True, editable=False, verbose_name="SHA-256 del Archivo")
+    file_page_count = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Número de Páginas")
     
     # Organization
     department = models.ForeignKey(Department, on_delete=models.SET_NULL, null=True, blank=True, related_name='library_documents')
     tags = models.CharField(max_length=500, blank=True, verbose_name="Etiquetas (separadas por coma)")
     groups = models.ManyToManyField(Group, blank=True, related_name='library_documents', verbose_name="Grupos con Acceso")
+    # Denormalized from groups (no groups = accessible to all), maintained by signals
+    is_public = models.BooleanField(default=True, db_index=True, editable=False, verbose_name="Acceso Público")
     
     # Authorship
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='authored_library_documents', verbose_name="Autor")
@@ -102,6 +132,8 @@ class LibraryDocument(models.Model):
     download_count = models.IntegerField(default=0, verbose_name="Número de Descargas")
     view_count = models.IntegerField(default=0, verbose_name="Número de Vistas")
     
+    objects = LibraryDocumentQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Documento de Biblioteca'
@@ -617,6 +649,9 @@ class ForumPost(models.Model):
     is_locked = models.BooleanField(default=False, verbose_name="Bloqueado")
     views_count = models.IntegerField(default=0, verbose_name="Número de Vistas")
     likes_count = models.IntegerField(default=0, verbose_name="Número de Likes")
+    # Denormalized reply stats, maintained by api/signals.py
+    replies_count = models.IntegerField(default=0, editable=False, verbose_name="Número de Respuestas")
+    last_reply_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="Última Respuesta")
     liked_by = models.ManyToManyField(
         User,
         related_name='liked_forum_posts',
@@ -634,7 +669,83 @@ class ForumPost(models.Model):
     def __str__(self):
         return self.title
     
-    @property
-    def replies_count(self):
-        """Returns the number of replies to this post"""
-        return self.replies.count()
+    def save(self, *args, **kwargs):
+        # The parent's reply counters (post_save signal) commit together with the reply
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+# ========================================
+# ACTIVE DIRECTORY SYNC STATE
+# ========================================
+
+class LDAPSyncState(models.Model):
+    """
+    Watermark of sync_ldap_users for one server and search base.
+    uSN values are local to each domain controller, so the state is keyed by
+    server URI: pointing the sync at another DC starts with a full sync.
+    """
+    server_uri = models.CharField(max_length=255, verbose_name="Servidor LDAP")
+    search_base = models.CharField(max_length=255, verbose_name="Base de búsqueda")
+    highest_usn = models.BigIntegerField(null=True, blank=True, verbose_name="uSNChanged más alto sincronizado")
+    last_sync_at = models.DateTimeField(null=True, blank=True, verbose_name="Última sincronización")
+    last_full_sync_at = models.DateTimeField(null=True, blank=True, verbose_name="Última sincronización completa")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['server_uri', 'search_base']
+        verbose_name = 'Estado de Sincronización LDAP'
+        verbose_name_plural = 'Estados de Sincronización LDAP'
+
+    def __str__(self):
+        return f"{self.server_uri} ({self.search_base})"
+
+    def full_sync_due(self, interval):
+        """True when there is no usable watermark or the last full sync is older than `interval`"""
+        if self.highest_usn is None or self.last_full_sync_at is None:
+            return True
+        return timezone.now() - self.last_full_sync_at >= interval
+
+
+class LDAPUserState(models.Model):
+    """
+    Fingerprint of the directory attributes last applied to a user at login
+    (api/ldap_auth.py). While it matches and is younger than
+    AUTH_LDAP_FINGERPRINT_MAX_AGE, login skips updating the user and its groups.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='ldap_state')
+    fingerprint = models.CharField(max_length=64, verbose_name="Huella de atributos LDAP")
+    synced_at = models.DateTimeField(verbose_name="Sincronizado")
+
+    class Meta:
+        verbose_name = 'Estado LDAP de Usuario'
+        verbose_name_plural = 'Estados LDAP de Usuario'
+
+    def __str__(self):
+        return f"{self.user_id}: {self.fingerprint[:12]}"
+
+
+# ========================================
+# HEADCOUNT HISTORY
+# ========================================
+
+class HeadcountSnapshot(models.Model):
+    """
+    Active members of a group on one day, recorded by the snapshot_headcount
+    command (api/headcount.py). group_name '' holds all active users. Groups
+    are stored by name so the history of renamed or deleted groups is kept.
+    """
+    date = models.DateField(verbose_name="Fecha")
+    group_name = models.CharField(max_length=150, blank=True, verbose_name="Grupo")
+    active_count = models.PositiveIntegerField(verbose_name="Usuarios Activos")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # (group_name, date) also indexes the per-group time series
+        unique_together = ['group_name', 'date']
+        ordering = ['group_name', 'date']
+        verbose_name = 'Instantánea de Plantilla'
+        verbose_name_plural = 'Instantáneas de Plantilla'
+
+    def __str__(self):
+        return f"{self.date} {self.group_name or '(todos)'}: {self.active_count}"
@@ -0,0 +1,275 @@
+"""
+Pagination classes for the API.
+
+StandardResultsPagination (the project default) is DRF's page-number
+pagination plus:
+- ?page_size=N (up to MAX_PAGE_SIZE)
+- ?count=false skips the COUNT(*) query; "count" is then null and "next"
+  is derived from fetching one extra row
+
+KeysetPagination adds cursor (keyset) pagination on top, selected per
+request with ?cursor= (empty for the first page, then the opaque value of the
+"next"/"previous" links). Pages are fetched with
+``WHERE (ordering columns) > (last row's values) ORDER BY ... LIMIT n+1``
+so deep pages cost the same as page 1. The key is the queryset ordering (the
+viewset's ``ordering`` or ?ordering=) with ``id`` as tiebreaker. Orderings
+that cannot be used as a key (expressions such as the ranked ?q= search, or
+nullable columns) fall back to page-number pagination.
+
+Views that already counted the filtered queryset (ConditionalGetMixin) set
+``queryset_count`` on themselves; both paginators use it instead of running
+COUNT(*) again.
+"""
+import base64
+import datetime
+import json
+from collections import OrderedDict
+
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+MAX_PAGE_SIZE = 100
+
+
+class _CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder truncates to milliseconds, cursors need exact equality
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def count_requested(request):
+    return request.query_params.get('count', '').lower() not in ('false', '0', 'no')
+
+
+class _CountedPaginator(Paginator):
+    """Django paginator that can be given the object count up front"""
+
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        if count is not None:
+            # Seeds the cached_property
+            self.count = count
+
+
+class StandardResultsPagination(PageNumberPagination):
+    """Page-number pagination with ?page_size= and an optional COUNT(*)"""
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        self.known_count = getattr(view, 'queryset_count', None)
+        if count_requested(request):
+            return super().paginate_queryset(queryset, request, view)
+        return self._paginate_without_count(queryset, request)
+
+    def django_paginator_class(self, object_list, per_page):
+        return _CountedPaginator(object_list, per_page, count=self.known_count)
+
+    def _paginate_without_count(self, queryset, request):
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        try:
+            number = int(request.query_params.get(self.page_query_param, 1))
+        except (TypeError, ValueError):
+            number = 0
+        if number < 1:
+            raise NotFound('Invalid page.')
+
+        self.request = request
+        self.page = None
+        offset = (number - 1) * page_size
+        rows = list(queryset[offset:offset + page_size + 1])
+        if not rows and number > 1:
+            raise NotFound('Invalid page.')
+        self._page_number = number
+        self._has_next = len(rows) > page_size
+        return rows[:page_size]
+
+    def get_next_link(self):
+        if self.page is not None:
+            return super().get_next_link()
+        if not self._has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.page_query_param, self._page_number + 1)
+
+    def get_previous_link(self):
+        if self.page is not None:
+            return super().get_previous_link()
+        if self._page_number <= 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self._page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self._page_number - 1)
+
+    def get_paginated_response(self, data):
+        count = self.page.paginator.count if self.page is not None else None
+        return Response(OrderedDict([
+            ('count', count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+
+class KeysetPagination(StandardResultsPagination):
+    """Page-number pagination by default, keyset pagination with ?cursor="""
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = False
+        if self.cursor_query_param not in request.query_params:
+            return super().paginate_queryset(queryset, request, view)
+        ordering = self.get_keyset_ordering(queryset)
+        if ordering is None:
+            return super().paginate_queryset(queryset, request, view)
+        return self._paginate_keyset(queryset, request, ordering, view)
+
+    def get_keyset_ordering(self, queryset):
+        """
+        Ordering as [(field path, descending), ...] ending with the primary
+        key, or None when the queryset ordering cannot be used as a key.
+        """
+        order_by = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        ordering = []
+        for item in order_by:
+            if not isinstance(item, str) or '?' in item:
+                return None
+            descending = item.startswith('-')
+            path = item.lstrip('-')
+            if path == 'pk':
+                path = 'id'
+            if not self._is_non_nullable_column(queryset.model, path):
+                return None
+            ordering.append((path, descending))
+            if path == 'id':
+                # Unique, anything after it never decides the order
+                return ordering
+        ordering.append(('id', ordering[-1][1] if ordering else False))
+        return ordering
+
+    @staticmethod
+    def _is_non_nullable_column(model, path):
+        parts = path.split('__')
+        for index, part in enumerate(parts):
+            try:
+                field = model._meta.get_field(part)
+            except Exception:
+                return False
+            if getattr(field, 'null', True) or field.many_to_many or field.one_to_many:
+                return False
+            if index < len(parts) - 1:
+                if not field.is_relation:
+                    return False
+                model = field.related_model
+        return not field.is_relation
+
+    def _paginate_keyset(self, queryset, request, ordering, view=None):
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        position, reverse = self.decode_cursor(request.query_params.get(self.cursor_query_param), ordering)
+
+        self.keyset = True
+        self.request = request
+        self.keyset_ordering = ordering
+        if not count_requested(request):
+            self.count = None
+        else:
+            known = getattr(view, 'queryset_count', None)
+            self.count = known if known is not None else queryset.count()
+
+        if position is not None:
+            queryset = queryset.filter(self._position_filter(ordering, position, reverse))
+        queryset = queryset.order_by(*[
+            ('-' if descending != reverse else '') + path for path, descending in ordering
+        ])
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.rows = rows
+        return rows
+
+    @staticmethod
+    def _position_filter(ordering, position, reverse):
+        """(a, b, id) after (va, vb, vid) in the given direction, as OR-ed prefixes"""
+        condition = Q()
+        equal = Q()
+        for (path, descending), value in zip(ordering, position):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= equal & Q(**{f'{path}__{lookup}': value})
+            equal &= Q(**{path: value})
+        return condition
+
+    @staticmethod
+    def _row_position(row, ordering):
+        values = []
+        for path, _ in ordering:
+            value = row
+            for part in path.split('__'):
+                value = getattr(value, part)
+            values.append(value)
+        return values
+
+    def encode_cursor(self, row, reverse):
+        payload = {'v': self._row_position(row, self.keyset_ordering)}
+        if reverse:
+            payload['r'] = 1
+        raw = json.dumps(payload, cls=_CursorEncoder, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor, ordering):
+        if not cursor:
+            return None, False
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            payload = json.loads(raw)
+            position = payload['v']
+            if not isinstance(position, list) or len(position) != len(ordering):
+                raise ValueError('Cursor does not match the ordering')
+        except (ValueError, TypeError, KeyError):
+            raise NotFound('Invalid cursor.')
+        return position, bool(payload.get('r'))
+
+    def _cursor_link(self, row, reverse):
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(row, reverse))
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next or not self.rows:
+            return None
+        return self._cursor_link(self.rows[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        if not self.has_previous or not self.rows:
+            return None
+        return self._cursor_link(self.rows[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
@@ -1,10 +1,14 @@
 """
 Custom permissions for role-based authorization.
 Roles are extracted from Active Directory groups and mapped to Django groups.
+Group membership is resolved through api.roles.has_role (one lookup per
+request, shared by composed permissions and cached per process).
 """
 from rest_framework import permissions
 from django.contrib.auth.models import Group
 
+from .roles import has_role
+
 
 class IsAdminOrReadOnly(permissions.BasePermission):
     """
@@ -38,10 +42,10 @@ class IsDepartmentManager(permissions.BasePermission):
         if request.user.is_staff or request.user.is_superuser:
             return True
         
-        return request.user.groups.filter(name__in=[
+        return has_role(request.user, [
             'Department_Managers',
             'Gerentes_Departamento'
-        ]).exists()
+        ])
 
 
 class IsHRManager(permissions.BasePermission):
@@ -61,10 +65,10 @@ class IsHRManager(permissions.BasePermission):
         if request.user.is_staff or request.user.is_superuser:
             return True
         
-        return request.user.groups.filter(name__in=[
+        return has_role(request.user, [
             'HR_Managers',
             'Gerentes_RH'
-        ]).exists()
+        ])
 
 
 class CanManageAnnouncements(permissions.BasePermission):
@@ -82,12 +86,12 @@ class CanManageAnnouncements(permissions.BasePermission):
         if request.user.is_staff or request.user.is_superuser:
             return True
         
-        return request.user.groups.filter(name__in=[
+        return has_role(request.user, [
             'Communications',
             'Department_Managers',
             'Comunicaciones',
             'Gerentes_Departamento'
-        ]).exists()
+        ])
 
 
 class CanManageDocuments(permissions.BasePermission):
@@ -105,12 +109,12 @@ class CanManageDocuments(permissions.BasePermission):
         if request.user.is_staff or request.user.is_superuser:
             return True
         
-        return request.user.groups.filter(name__in=[
+        return has_role(request.user, [
             'Document_Managers',
             'Department_Managers',
             'Administradores_Documentos',
             'Gerentes_Departamento'
-        ]).exists()
+        ])
 
 
 class CanApproveLeaveRequests(permissions.BasePermission):
@@ -127,12 +131,12 @@ class CanApproveLeaveRequests(permissions.BasePermission):
         
         # Only check for specific approval actions
         if view.action in ['approve', 'reject']:
-            return request.user.groups.filter(name__in=[
+            return has_role(request.user, [
                 'HR_Managers',
                 'Department_Managers',
                 'Gerentes_RH',
                 'Gerentes_Departamento'
-            ]).exists()
+            ])
         
         return True
 
@@ -152,12 +156,12 @@ class CanManageResources(permissions.BasePermission):
         if request.user.is_staff or request.user.is_superuser:
             return True
         
-        return request.user.groups.filter(name__in=[
+        return has_role(request.user, [
             'Resource_Managers',
             'Facilities',
             'Administradores_Recursos',
             'Instalaciones'
-        ]).exists()
+        ])
 
 
 class CanManageCourses(permissions.BasePermission):
@@ -175,12 +179,12 @@ class CanManageCourses(permissions.BasePermission):
         if request.user.is_staff or request.user.is_superuser:
             return True
         
-        return request.user.groups.filter(name__in=[
+        return has_role(request.user, [
             'Training_Managers',
             'HR_Managers',
             'Administradores_Capacitacion',
             'Gerentes_RH'
-        ]).exists()
+        ])
 
 
 class CanManageProjects(permissions.BasePermission):
@@ -198,12 +202,12 @@ class CanManageProjects(permissions.BasePermission):
         if request.user.is_staff or request.user.is_superuser:
             return True
         
-        return request.user.groups.filter(name__in=[
+        return has_role(request.user, [
             'Project_Managers',
             'Department_Managers',
             'Gerentes_Proyecto',
             'Gerentes_Departamento'
-        ]).exists()
+        ])
 
 
 class IsOwnerOrReadOnly(permissions.BasePermission):
@@ -257,13 +261,13 @@ class IsOwnerOrManager(permissions.BasePermission):
             return True
         
         # Check if user is a manager
-        is_manager = request.user.groups.filter(name__in=[
+        is_manager = has_role(request.user, [
             'Department_Managers',
             'HR_Managers',
             'Project_Managers',
             'Gerentes_Departamento',
             'Gerentes_RH',
             'Gerentes_Proyecto'
-        ]).exists()
+        ])
         
         return is_manager
@@ -0,0 +1,97 @@
+"""
+Role resolution for permission checks.
+
+Roles are the Django groups mirrored from Active Directory. Permission
+classes ask ``has_role(user, [...group names])`` instead of running their own
+``user.groups.filter(...).exists()``. The user's group names are loaded with
+one query and then reused:
+
+- per request: memoized on the user object DRF keeps for the request, so
+  composed permissions (``IsDepartmentManager | IsHRManager``) and object
+  checks share a single lookup
+- across requests: a process-local cache keyed by user id, expiring after
+  settings.ROLE_CACHE_TTL seconds (0 disables it)
+
+Membership changes made through the ORM (user.groups.add/remove/clear,
+group.user_set..., deleting or renaming a group, LDAP sync) invalidate the
+cache in this process via signals (api/signals.py). Other worker processes
+see the change when their entry expires, hence the short TTL.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+from . import instrumentation
+
+# Attribute used to memoize group names on a user instance for one request
+_MEMO_ATTR = '_role_group_names'
+
+
+class RoleCache:
+    """Thread-safe user id -> (expires_at, frozenset of group names) cache"""
+
+    def __init__(self, max_entries=10000):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.max_entries = max_entries
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def set(self, user_id, names, ttl):
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                # Simple bound: start over rather than track recency
+                self._entries.clear()
+            self._entries[user_id] = (time.monotonic() + ttl, names)
+
+    def invalidate(self, user_ids=None):
+        with self._lock:
+            if user_ids is None:
+                self._entries.clear()
+            else:
+                for user_id in user_ids:
+                    self._entries.pop(user_id, None)
+
+
+cache = RoleCache()
+
+
+def get_group_names(user):
+    """Frozenset with the names of the user's groups (empty for anonymous users)"""
+    if user is None or not user.is_authenticated:
+        return frozenset()
+    names = getattr(user, _MEMO_ATTR, None)
+    if names is not None:
+        return names
+
+    ttl = getattr(settings, 'ROLE_CACHE_TTL', 60)
+    names = cache.get(user.pk) if ttl > 0 else None
+    if ttl > 0:
+        instrumentation.cache_lookup('role', names is not None)
+    if names is None:
+        names = frozenset(user.groups.values_list('name', flat=True))
+        if ttl > 0:
+            cache.set(user.pk, names, ttl)
+    setattr(user, _MEMO_ATTR, names)
+    return names
+
+
+def has_role(user, group_names):
+    """True if the user belongs to any of the given groups"""
+    return not get_group_names(user).isdisjoint(group_names)
+
+
+def invalidate(user_ids=None, users=()):
+    """
+    Forget cached group names for the given user ids (all users when None).
+    User instances passed in ``users`` also drop their per-request memo.
+    """
+    cache.invalidate(user_ids)
+    for user in users:
+        user.__dict__.pop(_MEMO_ATTR, None)
@@ -0,0 +1,372 @@
+"""
+Full-text search for the document library.
+
+The library page searches on every keystroke, and running SearchFilter over
+``content`` turns each request into a chain of ``LIKE '%term%'`` scans.
+Instead we keep an inverted index per document, maintained from signals:
+
+- ``sqlite``: an FTS5 virtual table ranked with bm25()
+- ``postgresql``: a tsvector table with a GIN index ranked with ts_rank_cd()
+- ``database``: plain icontains lookups, for engines without a native index
+
+Text is normalized in Python before it reaches either engine (accent folding,
+lowercasing and a light Spanish stemmer), so both backends index and query the
+exact same terms.
+
+Select the backend with settings.LIBRARY_SEARCH_BACKEND ('auto' by default).
+"""
+import logging
+import re
+import unicodedata
+from functools import reduce
+from operator import and_, or_
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from rest_framework.filters import BaseFilterBackend
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TABLE = 'api_librarydocument_search'
+
+# Indexed columns and their relative weight (higher ranks first)
+SEARCH_COLUMNS = [
+    ('title', 10.0),
+    ('code', 8.0),
+    ('tags', 4.0),
+    ('description', 2.0),
+    ('content', 1.0),
+]
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Ordered longest first so the most specific suffix wins
+_SPANISH_SUFFIXES = (
+    'amientos', 'imientos', 'amiento', 'imiento', 'aciones', 'uciones',
+    'adoras', 'adores', 'ancias', 'encias', 'logias', 'idades', 'mente',
+    'acion', 'ucion', 'adora', 'ador', 'ancia', 'encia', 'logia', 'idad',
+    'ibles', 'ables', 'ible', 'able', 'istas', 'ista', 'ismos', 'ismo',
+    'osos', 'osas', 'ivos', 'ivas', 'oso', 'osa', 'ivo', 'iva',
+)
+_MIN_STEM = 3
+# Everything stem() can cut off a word: a suffix, or a plural and/or gender vowel
+_STEM_ENDINGS = _SPANISH_SUFFIXES + ('a', 'e', 'o', 's', 'as', 'es', 'os', 'aes', 'ees', 'oes')
+
+
+def fold_text(text):
+    """Lowercase and strip diacritics: 'Políticas' -> 'politicas'"""
+    if not text:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', str(text))
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def stem(token):
+    """
+    Light Spanish stemmer.
+    Strips derivational suffixes, plurals and the final gender vowel so that
+    'procedimientos' and 'procedimiento' share a stem ('proced'). Verb
+    endings are left alone: 'proceder' stays 'proceder'.
+    """
+    if len(token) <= _MIN_STEM or token.isdigit():
+        return token
+    for suffix in _SPANISH_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= _MIN_STEM:
+            return token[:-len(suffix)]
+    if token.endswith('es') and len(token) - 2 >= _MIN_STEM:
+        token = token[:-2]
+    elif token.endswith('s') and len(token) - 1 >= _MIN_STEM:
+        token = token[:-1]
+    if token[-1] in 'aeo' and len(token) - 1 >= _MIN_STEM:
+        token = token[:-1]
+    return token
+
+
+def tokenize(text):
+    """Return the normalized (folded + stemmed) terms of a text"""
+    return [stem(token) for token in _TOKEN_RE.findall(fold_text(text))]
+
+
+def normalize(text):
+    return ' '.join(tokenize(text))
+
+
+def prefix_stems(prefix):
+    """
+    Stems shorter than ``prefix`` that a word starting with it can have.
+    The index holds stems, so a partially typed word cannot be stemmed itself:
+    'segurida' must find 'seguridad', indexed as 'segur'. A shorter stem is
+    possible when the rest of the prefix can begin a stripped ending
+    ('segur' + 'ida...' from 'idad'). Stems at least as long as the prefix are
+    found with a prefix match on it.
+    """
+    return [
+        prefix[:length] for length in range(_MIN_STEM, len(prefix))
+        if any(ending.startswith(prefix[length:]) for ending in _STEM_ENDINGS)
+    ]
+
+
+def parse_query(text):
+    """
+    Split a search-as-you-type query into (stemmed complete terms, folded
+    last token, stems of the last token from prefix_stems()).
+    """
+    tokens = _TOKEN_RE.findall(fold_text(text))
+    if not tokens:
+        return [], None, []
+    return [stem(token) for token in tokens[:-1]], tokens[-1], prefix_stems(tokens[-1])
+
+
+def document_columns(document):
+    """Normalized text for each indexed column of a LibraryDocument"""
+    return [normalize(getattr(document, name, '')) for name, _ in SEARCH_COLUMNS]
+
+
+class BaseSearchBackend:
+    """Interface shared by all library search backends"""
+    name = None
+
+    @classmethod
+    def is_available(cls, conn):
+        return True
+
+    def install(self, conn):
+        """Create the index structures (called from migrations)"""
+
+    def uninstall(self, conn):
+        """Drop the index structures (called from migrations)"""
+
+    def index(self, document):
+        """Add or refresh a document in the index"""
+
+    def remove(self, pk):
+        """Drop a document from the index"""
+
+    def search(self, query, limit, queryset=None):
+        """
+        Return a list of document ids, best match first. With a ``queryset``
+        only its documents are considered, before ``limit`` applies.
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def restriction(queryset):
+        """SQL and params of a subquery selecting the ids of ``queryset``"""
+        return queryset.order_by().values('pk').query.sql_with_params()
+
+    def rebuild(self, documents):
+        """Re-index every document of an iterable, returns the number indexed"""
+        count = 0
+        for document in documents:
+            self.index(document)
+            count += 1
+        return count
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """SQLite FTS5 virtual table keyed by the document id (rowid)"""
+    name = 'sqlite'
+
+    @classmethod
+    def is_available(cls, conn):
+        if conn.vendor != 'sqlite':
+            return False
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            return bool(cursor.fetchone()[0])
+
+    def install(self, conn):
+        columns = ', '.join(name for name, _ in SEARCH_COLUMNS)
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} "
+                f"USING fts5({columns}, tokenize = 'unicode61 remove_diacritics 2')"
+            )
+
+    def uninstall(self, conn):
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+    def index(self, document):
+        columns = ', '.join(name for name, _ in SEARCH_COLUMNS)
+        placeholders = ', '.join(['%s'] * len(SEARCH_COLUMNS))
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [document.pk])
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE} (rowid, {columns}) VALUES (%s, {placeholders})",
+                [document.pk] + document_columns(document)
+            )
+
+    def remove(self, pk):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [pk])
+
+    def search(self, query, limit, queryset=None):
+        terms, prefix, stems = parse_query(query)
+        if prefix is None:
+            return []
+        restrict, params = '', []
+        if queryset is not None:
+            subquery, params = self.restriction(queryset)
+            restrict = f" AND rowid IN ({subquery})"
+        # Every term must match; the last one, possibly half typed, by prefix or by its candidate stems
+        last = ' OR '.join([f'"{prefix}"*'] + [f'"{candidate}"' for candidate in stems])
+        match = ' AND '.join([f'"{term}"' for term in terms] + [f'({last})'])
+        weights = ', '.join(str(weight) for _, weight in SEARCH_COLUMNS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s{restrict} "
+                f"ORDER BY bm25({SEARCH_TABLE}, {weights}) LIMIT %s",
+                [match, *params, limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresFTSBackend(BaseSearchBackend):
+    """PostgreSQL tsvector table with a GIN index"""
+    name = 'postgresql'
+    # Terms are already folded and stemmed in Python
+    config = 'simple'
+    _labels = ['A', 'A', 'B', 'C', 'D']
+
+    @classmethod
+    def is_available(cls, conn):
+        return conn.vendor == 'postgresql'
+
+    def install(self, conn):
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ("
+                f"document_id bigint PRIMARY KEY REFERENCES api_librarydocument(id) ON DELETE CASCADE, "
+                f"vector tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_vector_idx ON {SEARCH_TABLE} USING GIN (vector)"
+            )
+
+    def uninstall(self, conn):
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+    def index(self, document):
+        vector = ' || '.join(
+            f"setweight(to_tsvector('{self.config}', %s), '{label}')" for label in self._labels
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE} (document_id, vector) VALUES (%s, {vector}) "
+                f"ON CONFLICT (document_id) DO UPDATE SET vector = EXCLUDED.vector",
+                [document.pk] + document_columns(document)
+            )
+
+    def remove(self, pk):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE document_id = %s", [pk])
+
+    def search(self, query, limit, queryset=None):
+        terms, prefix, stems = parse_query(query)
+        if prefix is None:
+            return []
+        restrict, params = '', []
+        if queryset is not None:
+            subquery, params = self.restriction(queryset)
+            restrict = f" AND document_id IN ({subquery})"
+        last = ' | '.join([f'{prefix}:*'] + stems)
+        tsquery = ' & '.join(terms + [f'({last})'])
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT document_id FROM {SEARCH_TABLE}, to_tsquery('{self.config}', %s) query "
+                f"WHERE vector @@ query{restrict} ORDER BY ts_rank_cd(vector, query) DESC LIMIT %s",
+                [tsquery, *params, limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    """
+    Fallback without an index: icontains on every column.
+    Used for engines that have no supported full-text feature.
+    """
+    name = 'database'
+
+    def search(self, query, limit, queryset=None):
+        from .models import LibraryDocument
+
+        words = query.split()
+        if not words:
+            return []
+        conditions = [
+            reduce(or_, [Q(**{f'{name}__icontains': word}) for name, _ in SEARCH_COLUMNS])
+            for word in words
+        ]
+        if queryset is None:
+            queryset = LibraryDocument.objects.all()
+        queryset = queryset.filter(reduce(and_, conditions)).order_by('-created_at')
+        return list(queryset.values_list('pk', flat=True)[:limit])
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (SQLiteFTSBackend, PostgresFTSBackend, DatabaseSearchBackend)
+}
+
+
+def get_backend(conn=None):
+    """Return the configured search backend for a database connection"""
+    conn = conn or connection
+    name = getattr(settings, 'LIBRARY_SEARCH_BACKEND', 'auto')
+    if name == 'auto':
+        for backend_class in (SQLiteFTSBackend, PostgresFTSBackend):
+            if backend_class.is_available(conn):
+                return backend_class()
+        return DatabaseSearchBackend()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LIBRARY_SEARCH_BACKEND '{name}'")
+    return BACKENDS[name]()
+
+
+def index_document(document):
+    try:
+        get_backend().index(document)
+    except Exception:
+        # Search must never block saving a document; a rebuild fixes the index
+        logger.exception(f"Failed to index library document {document.pk}")
+
+
+def remove_document(pk):
+    try:
+        get_backend().remove(pk)
+    except Exception:
+        logger.exception(f"Failed to remove library document {pk} from search index")
+
+
+class LibraryFullTextFilter(BaseFilterBackend):
+    """
+    ``?q=`` full-text search for LibraryDocumentViewSet.
+    Keeps the ACL/filters already applied to the queryset and orders the
+    matches by relevance unless an explicit ``?ordering=`` is given. The
+    backend applies that queryset before LIBRARY_SEARCH_MAX_RESULTS, so the
+    limit counts only documents the user can see.
+    Must be placed after OrderingFilter in filter_backends.
+    """
+    search_param = 'q'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+
+        limit = getattr(settings, 'LIBRARY_SEARCH_MAX_RESULTS', 500)
+        ids = get_backend().search(query, limit, queryset)
+        if not ids:
+            return queryset.none()
+
+        queryset = queryset.filter(pk__in=ids)
+        if request.query_params.get('ordering'):
+            return queryset
+        rank = Case(
+            *[When(pk=pk, then=Value(position)) for position, pk in enumerate(ids)],
+            output_field=IntegerField()
+        )
+        return queryset.annotate(search_rank=rank).order_by('search_rank')
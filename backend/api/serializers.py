@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from django.contrib.auth.models import User
 from .models import (
     Department,
@@ -12,13 +13,78 @@ from .models import (
 )
 
 
+def _query_param_list(request, name):
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    return {item.strip() for item in value.split(',') if item.strip()}
+
+
+def sparse_fieldset(request, available):
+    """
+    Field names selected by ?fields= / ?omit= on a read request.
+    Returns None when the request does not ask for a sparse fieldset.
+    'id' is always kept so clients can key the rows.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    fields = _query_param_list(request, 'fields')
+    omit = _query_param_list(request, 'omit')
+    if fields is None and omit is None:
+        return None
+    selected = set(available) if fields is None else set(available) & (fields | {'id'})
+    if omit:
+        selected -= omit - {'id'}
+    return selected
+
+
+class DynamicFieldsMixin:
+    """
+    Sparse fieldsets for ModelSerializers: ?fields=id,title,status keeps only
+    the listed fields, ?omit=content,description drops fields.
+    Unselected fields are removed before serialization, so their
+    SerializerMethodFields are never computed.
+
+    Meta.field_dependencies maps computed fields to the model columns they
+    read, so SparseFieldsetMixin (views) can defer every other column.
+    Method fields not listed there are assumed to read no own columns.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = sparse_fieldset(self.context.get('request'), self.fields.keys())
+        if selected is not None:
+            for name in set(self.fields) - selected:
+                self.fields.pop(name)
+
+    def get_required_model_fields(self):
+        """Names of the model fields read by the selected serializer fields"""
+        dependencies = getattr(self.Meta, 'field_dependencies', {})
+        required = set()
+        for name, field in self.fields.items():
+            if name in dependencies:
+                required.update(dependencies[name])
+            elif field.source != '*':
+                required.add(field.source.split('.')[0])
+        return required
+
+
+def annotated_count(obj, name, related):
+    """
+    Value of a count annotation added by the viewset queryset, or a COUNT
+    query when the object was loaded without it (single objects, other callers)
+    """
+    value = getattr(obj, name, None)
+    return value if value is not None else related.count()
+
+
 class HealthCheckSerializer(serializers.Serializer):
     """Serializer for health check endpoint"""
     status = serializers.CharField()
     message = serializers.CharField()
 
 
-class DepartmentSerializer(serializers.ModelSerializer):
+class DepartmentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for Department model"""
     
     class Meta:
@@ -27,7 +93,7 @@ class DepartmentSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for User model"""
     full_name = serializers.SerializerMethodField()
     groups = serializers.SerializerMethodField()
@@ -36,6 +102,7 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'full_name', 'is_active', 'date_joined', 'groups']
         read_only_fields = ['date_joined']
+        field_dependencies = {'full_name': ['first_name', 'last_name', 'username']}
     
     def get_full_name(self, obj):
         return obj.get_full_name() or obj.username
@@ -49,7 +116,7 @@ class UserSerializer(serializers.ModelSerializer):
 # BUSINESS PROCESS SERIALIZERS - IMCP USE CASES
 # ========================================
 
-class LibraryDocumentSerializer(serializers.ModelSerializer):
+class LibraryDocumentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for LibraryDocument model - Biblioteca de Documentos Unificada
     Unifica: Documentación Técnica, Elaboración de Docs y Aprobación de Docs
@@ -64,12 +131,15 @@ class LibraryDocumentSerializer(serializers.ModelSerializer):
     class Meta:
         model = LibraryDocument
         fields = ['id', 'title', 'code', 'description', 'content', 'document_type',
-                  'version', 'file', 'file_name', 'file_size', 'department', 'department_name',
-                  'tags', 'groups', 'group_names', 'author', 'author_name', 'status', 'submitted_at',
+                  'version', 'file', 'file_name', 'file_size', 'file_mime_type', 'file_sha256',
+                  'file_page_count', 'department', 'department_name',
+                  'tags', 'groups', 'group_names', 'is_public', 'author', 'author_name', 'status', 'submitted_at',
                   'approver', 'approver_name', 'approval_decision', 'approval_observations',
                   'corrections_required', 'rejection_reason', 'approved_at',
                   'download_count', 'view_count', 'created_at', 'updated_at']
-        read_only_fields = ['created_at', 'updated_at', 'download_count', 'view_count']
+        read_only_fields = ['created_at', 'updated_at', 'download_count', 'view_count', 'is_public',
+                            'file_mime_type', 'file_sha256', 'file_page_count']
+        field_dependencies = {'file_name': ['file'], 'file_size': ['file', 'file_size']}
     
     def get_file_name(self, obj):
         if obj.file:
@@ -77,19 +147,18 @@ class LibraryDocumentSerializer(serializers.ModelSerializer):
         return None
     
     def get_file_size(self, obj):
+        # Captured at upload time, avoids a storage stat() per row
         if obj.file:
-            try:
-                return obj.file.size
-            except Exception:
-                return None
+            return obj.file_size
         return None
     
     def get_group_names(self, obj):
         """Return list of group names for this document"""
-        return list(obj.groups.values_list('name', flat=True))
+        # all() reads the groups prefetched by the viewset instead of one query per row
+        return [group.name for group in obj.groups.all()]
 
 
-class PolicySerializer(serializers.ModelSerializer):
+class PolicySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for Policy model - Establecer Políticas"""
     department_name = serializers.CharField(source='department.name', read_only=True)
     created_by_name = serializers.CharField(source='created_by.get_full_name', read_only=True)
@@ -110,10 +179,10 @@ class PolicySerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
     
     def get_distribution_count(self, obj):
-        return obj.distributions.count()
+        return annotated_count(obj, 'distribution_count', obj.distributions)
 
 
-class PolicyDistributionSerializer(serializers.ModelSerializer):
+class PolicyDistributionSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for PolicyDistribution model"""
     policy_code = serializers.CharField(source='policy.code', read_only=True)
     policy_title = serializers.CharField(source='policy.title', read_only=True)
@@ -128,7 +197,7 @@ class PolicyDistributionSerializer(serializers.ModelSerializer):
         read_only_fields = ['distributed_at']
 
 
-class TrainingPlanSerializer(serializers.ModelSerializer):
+class TrainingPlanSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for TrainingPlan model - Planificar Capacitaciones"""
     department_name = serializers.CharField(source='department.name', read_only=True)
     created_by_name = serializers.CharField(source='created_by.get_full_name', read_only=True)
@@ -146,13 +215,13 @@ class TrainingPlanSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
     
     def get_session_count(self, obj):
-        return obj.sessions.count()
+        return annotated_count(obj, 'session_count', obj.sessions)
     
     def get_quotation_count(self, obj):
-        return obj.quotations.count()
+        return annotated_count(obj, 'quotation_count', obj.quotations)
 
 
-class TrainingProviderSerializer(serializers.ModelSerializer):
+class TrainingProviderSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for TrainingProvider model"""
     quotation_count = serializers.SerializerMethodField()
     
@@ -163,10 +232,10 @@ class TrainingProviderSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
     
     def get_quotation_count(self, obj):
-        return obj.quotations.count()
+        return annotated_count(obj, 'quotation_count', obj.quotations)
 
 
-class TrainingQuotationSerializer(serializers.ModelSerializer):
+class TrainingQuotationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for TrainingQuotation model"""
     training_plan_title = serializers.CharField(source='training_plan.title', read_only=True)
     provider_name = serializers.CharField(source='provider.name', read_only=True)
@@ -179,7 +248,7 @@ class TrainingQuotationSerializer(serializers.ModelSerializer):
         read_only_fields = ['received_at']
 
 
-class TrainingSessionSerializer(serializers.ModelSerializer):
+class TrainingSessionSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for TrainingSession model - Asisten a Capacitaciones"""
     training_plan_title = serializers.CharField(source='training_plan.title', read_only=True)
     provider_name = serializers.CharField(source='provider.name', read_only=True)
@@ -196,13 +265,13 @@ class TrainingSessionSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
     
     def get_attendance_count(self, obj):
-        return obj.attendances.count()
+        return annotated_count(obj, 'attendance_count', obj.attendances)
     
     def get_confirmed_count(self, obj):
-        return obj.attendances.filter(confirmation_status='confirmed').count()
+        return annotated_count(obj, 'confirmed_count', obj.attendances.filter(confirmation_status='confirmed'))
 
 
-class TrainingAttendanceSerializer(serializers.ModelSerializer):
+class TrainingAttendanceSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for TrainingAttendance model"""
     session_title = serializers.CharField(source='session.title', read_only=True)
     session_date = serializers.DateTimeField(source='session.start_datetime', read_only=True)
@@ -219,7 +288,7 @@ class TrainingAttendanceSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
 
 
-class InternalVacancySerializer(serializers.ModelSerializer):
+class InternalVacancySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for InternalVacancy model - Disponibilidad de Vacante"""
     department_name = serializers.CharField(source='department.name', read_only=True)
     requested_by_name = serializers.CharField(source='requested_by.get_full_name', read_only=True)
@@ -238,10 +307,10 @@ class InternalVacancySerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
     
     def get_application_count(self, obj):
-        return obj.applications.count()
+        return annotated_count(obj, 'application_count', obj.applications)
 
 
-class VacancyApplicationSerializer(serializers.ModelSerializer):
+class VacancyApplicationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for VacancyApplication model"""
     vacancy_title = serializers.CharField(source='vacancy.title', read_only=True)
     applicant_name = serializers.CharField(source='applicant.get_full_name', read_only=True)
@@ -259,7 +328,7 @@ class VacancyApplicationSerializer(serializers.ModelSerializer):
         read_only_fields = ['applied_at', 'updated_at']
 
 
-class VacancyTransitionSerializer(serializers.ModelSerializer):
+class VacancyTransitionSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for VacancyTransition model"""
     applicant_name = serializers.CharField(source='application.applicant.get_full_name', read_only=True)
     previous_department_name = serializers.CharField(source='previous_department.name', read_only=True)
@@ -281,7 +350,7 @@ class VacancyTransitionSerializer(serializers.ModelSerializer):
 # FORUM SERIALIZERS
 # ========================================
 
-class ForumCategorySerializer(serializers.ModelSerializer):
+class ForumCategorySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for ForumCategory model"""
     posts_count = serializers.SerializerMethodField()
     
@@ -292,33 +361,52 @@ class ForumCategorySerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
     
     def get_posts_count(self, obj):
-        return obj.posts.filter(parent_post__isnull=True).count()
+        return annotated_count(obj, 'posts_count', obj.posts.filter(parent_post__isnull=True))
+
+
+class ForumPostListSerializer(serializers.ListSerializer):
+    """
+    Looks up which posts of the page the current user liked with a single
+    query and shares the result with the child serializer through the context.
+    """
+
+    def to_representation(self, data):
+        posts = list(data.all() if hasattr(data, 'all') else data)
+        request = self.context.get('request')
+        if 'user_has_liked' in self.child.fields and request and request.user.is_authenticated:
+            Like = ForumPost.liked_by.through
+            self.context['liked_post_ids'] = set(
+                Like.objects.filter(user_id=request.user.id, forumpost_id__in=[post.pk for post in posts])
+                .values_list('forumpost_id', flat=True)
+            )
+        return super().to_representation(posts)
 
 
-class ForumPostSerializer(serializers.ModelSerializer):
+class ForumPostSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for ForumPost model"""
     category_name = serializers.CharField(source='category.name', read_only=True)
     author_name = serializers.SerializerMethodField()
     author_username = serializers.CharField(source='author.username', read_only=True)
-    replies_count = serializers.SerializerMethodField()
     user_has_liked = serializers.SerializerMethodField()
     
     class Meta:
         model = ForumPost
+        list_serializer_class = ForumPostListSerializer
         fields = ['id', 'category', 'category_name', 'title', 'content', 'image',
                   'author', 'author_name', 'author_username', 'parent_post', 
                   'is_pinned', 'is_locked', 'views_count', 'likes_count', 
-                  'user_has_liked', 'replies_count',
+                  'user_has_liked', 'replies_count', 'last_reply_at',
                   'created_at', 'updated_at']
-        read_only_fields = ['created_at', 'updated_at', 'views_count', 'likes_count', 'author']
+        read_only_fields = ['created_at', 'updated_at', 'views_count', 'likes_count', 'author',
+                            'replies_count', 'last_reply_at']
     
     def get_author_name(self, obj):
         return obj.author.get_full_name() or obj.author.username
     
-    def get_replies_count(self, obj):
-        return obj.replies.count()
-    
     def get_user_has_liked(self, obj):
+        liked_post_ids = self.context.get('liked_post_ids')
+        if liked_post_ids is not None:
+            return obj.pk in liked_post_ids
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return obj.liked_by.filter(id=request.user.id).exists()
@@ -1,3 +1,217 @@
-# Signals for automatic model creation
+# Signals for automatic model maintenance
 # Note: UserProfile model has been removed in the unified document library refactoring.
-# This file is kept for future signal handlers if needed.
+from django.apps import apps
+from django.contrib.auth.models import Group, User
+from django.db.models import Count, Exists, F, IntegerField, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import pre_save, post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .models import LibraryDocument, ForumPost
+from . import authentication, caching, roles, search
+from .uploads import capture_file_metadata
+
+
+@receiver(pre_save, sender=LibraryDocument)
+def capture_library_document_file_metadata(sender, instance, raw=False, **kwargs):
+    """Store size, MIME type, SHA-256 and page count of newly uploaded files"""
+    if not raw:
+        capture_file_metadata(instance)
+
+
+@receiver(post_save, sender=LibraryDocument)
+def index_library_document(sender, instance, **kwargs):
+    """Keep the library full-text index in sync with saved documents"""
+    search.index_document(instance)
+
+
+@receiver(post_delete, sender=LibraryDocument)
+def unindex_library_document(sender, instance, **kwargs):
+    search.remove_document(instance.pk)
+
+
+# ----------------------------------------
+# Library document visibility (is_public)
+# ----------------------------------------
+
+def refresh_public_flags(document_ids):
+    """Recompute is_public for the given documents in a single UPDATE"""
+    if not document_ids:
+        return
+    Access = LibraryDocument.groups.through
+    has_groups = Exists(Access.objects.filter(librarydocument_id=OuterRef('pk')))
+    # update() leaves updated_at untouched: ACL changes are not content edits
+    LibraryDocument.objects.filter(pk__in=document_ids).update(is_public=~has_groups)
+
+
+@receiver(m2m_changed, sender=LibraryDocument.groups.through)
+def sync_library_document_visibility(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Maintain LibraryDocument.is_public when groups are added or removed,
+    from either side of the relation (document.groups / group.library_documents).
+    """
+    if action == 'pre_clear' and reverse:
+        # pk_set is not provided on clear, remember which documents are affected
+        instance._cleared_library_document_ids = list(
+            instance.library_documents.values_list('pk', flat=True)
+        )
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        if action == 'post_add':
+            if pk_set:
+                LibraryDocument.objects.filter(pk=instance.pk).update(is_public=False)
+                instance.is_public = False
+        else:
+            is_public = not sender.objects.filter(librarydocument_id=instance.pk).exists()
+            LibraryDocument.objects.filter(pk=instance.pk).update(is_public=is_public)
+            instance.is_public = is_public
+        return
+
+    if action == 'post_add':
+        LibraryDocument.objects.filter(pk__in=pk_set).update(is_public=False)
+    elif action == 'post_remove':
+        refresh_public_flags(pk_set)
+    else:
+        refresh_public_flags(getattr(instance, '_cleared_library_document_ids', None))
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_library_documents(sender, instance, **kwargs):
+    # Deleting a group cascades its access rows without sending m2m_changed
+    instance._deleted_library_document_ids = list(
+        instance.library_documents.values_list('pk', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Group)
+def refresh_visibility_after_group_delete(sender, instance, **kwargs):
+    refresh_public_flags(getattr(instance, '_deleted_library_document_ids', None))
+
+
+# ----------------------------------------
+# Forum reply stats (replies_count / last_reply_at)
+# ----------------------------------------
+
+def refresh_reply_stats(post_ids):
+    """Recompute replies_count and last_reply_at for the given posts in a single UPDATE"""
+    post_ids = [pk for pk in post_ids if pk is not None]
+    if not post_ids:
+        return
+    replies = ForumPost.objects.filter(parent_post=OuterRef('pk')).order_by().values('parent_post')
+    ForumPost.objects.filter(pk__in=post_ids).update(
+        replies_count=Coalesce(
+            Subquery(replies.annotate(n=Count('pk')).values('n'), output_field=IntegerField()), 0
+        ),
+        last_reply_at=Subquery(replies.annotate(last=Max('created_at')).values('last')),
+    )
+
+
+@receiver(pre_save, sender=ForumPost)
+def remember_forum_post_parent(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    instance._previous_parent_id = (
+        ForumPost.objects.filter(pk=instance.pk).values_list('parent_post_id', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=ForumPost)
+def update_reply_stats_on_save(sender, instance, created, raw=False, **kwargs):
+    """
+    Count a new reply on its parent (F() increment, no read-modify-write) and
+    recount both parents when an existing reply is moved.
+    update() leaves the parent's updated_at untouched.
+    """
+    if raw:
+        return
+    if created:
+        if instance.parent_post_id:
+            ForumPost.objects.filter(pk=instance.parent_post_id).update(
+                replies_count=F('replies_count') + 1, last_reply_at=instance.created_at
+            )
+        return
+    previous = getattr(instance, '_previous_parent_id', None)
+    if previous != instance.parent_post_id:
+        refresh_reply_stats([previous, instance.parent_post_id])
+
+
+@receiver(post_delete, sender=ForumPost)
+def update_reply_stats_on_delete(sender, instance, **kwargs):
+    if instance.parent_post_id:
+        refresh_reply_stats([instance.parent_post_id])
+
+
+# ----------------------------------------
+# Role cache invalidation (api/roles.py)
+# ----------------------------------------
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_roles_on_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        roles.invalidate([instance.pk], users=[instance])
+    elif action == 'post_clear':
+        # group.user_set.clear() does not say which users were affected
+        roles.invalidate()
+    else:
+        roles.invalidate(pk_set)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_roles_on_group_change(sender, **kwargs):
+    # Renames and deletions (cascaded memberships send no m2m_changed) affect every member
+    roles.invalidate()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_roles_on_user_change(sender, instance, created=False, **kwargs):
+    # Ids can be reused (e.g. SQLite after a rollback); only new or deleted users matter
+    if created or kwargs.get('signal') is post_delete:
+        roles.invalidate([instance.pk])
+
+
+# ----------------------------------------
+# Token authentication cache invalidation (api/authentication.py)
+# ----------------------------------------
+
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    authentication.invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user_tokens(sender, instance, **kwargs):
+    # Deactivation, renames, staff changes: the cached user snapshot is stale
+    authentication.invalidate_users([instance.pk])
+
+
+# ----------------------------------------
+# Response cache generations (api/caching.py)
+# ----------------------------------------
+
+def bump_response_cache_generation(sender, update_fields=None, **kwargs):
+    caching.model_changed(sender, update_fields)
+
+
+# Connected per watched model: delete listeners without a sender would keep
+# Django from fast-deleting (and cascading with a single DELETE) any model
+for label in caching.WATCHED_MODELS:
+    watched = apps.get_model(label)
+    post_save.connect(bump_response_cache_generation, sender=watched, dispatch_uid=f'response-cache-save-{label}')
+    post_delete.connect(bump_response_cache_generation, sender=watched, dispatch_uid=f'response-cache-delete-{label}')
+
+
+@receiver(m2m_changed)
+def bump_response_cache_generation_on_relation_change(sender, instance, action, model, **kwargs):
+    # Both sides: document.groups and group.library_documents change what either lists
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        caching.model_changed(type(instance))
+        caching.model_changed(model)
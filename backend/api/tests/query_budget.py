@@ -0,0 +1,158 @@
+"""
+Query budget assertions and an N+1 detector for API tests.
+
+Unittest-style tests mix in QueryBudgetMixin:
+
+    class MyTest(QueryBudgetMixin, TestCase):
+        def test_list(self):
+            with self.assertQueryBudget(4):              # at most 4 queries
+                self.client.get('/api/departments/')
+            with self.assertNoRepeatedQueries():         # no query shape runs per row
+                self.client.get('/api/forum-posts/')
+            # Same query count with 1 and with 50 rows, and at most 6 queries
+            self.assertConstantQueries('/api/policies/', seed=self.create_policies, budget=6)
+
+Repeated queries are compared by shape: the SQL with literals and IN lists
+replaced, so ``WHERE id = 1`` and ``WHERE id = 2`` are the same query.
+
+The same checks are available to pytest (with pytest-django) as the
+``query_budget`` fixture: ``pytest -p api.tests.query_budget``.
+"""
+import re
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# A shape may run this many times per block before it counts as N+1
+MAX_REPEATS = 2
+
+_IGNORED_PREFIXES = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN \((?:\?, )*\?\)')
+
+
+def query_shape(sql):
+    """SQL with literals and IN lists replaced, to spot the same query run per row"""
+    shape = _NUMBER.sub('?', _STRING.sub('?', sql))
+    return _IN_LIST.sub('IN (...)', shape)
+
+
+def recorded_sql(context):
+    return [
+        query['sql'] for query in context.captured_queries
+        if not query['sql'].startswith(_IGNORED_PREFIXES)
+    ]
+
+
+def repeated_shapes(queries, max_repeats=MAX_REPEATS):
+    """{shape: count} for query shapes run more than max_repeats times"""
+    counts = Counter(query_shape(sql) for sql in queries)
+    return {shape: count for shape, count in counts.items() if count > max_repeats}
+
+
+def _listing(queries):
+    return '\n'.join(f'{index}. {sql}' for index, sql in enumerate(queries, start=1))
+
+
+def _repeats(repeated):
+    return '\n'.join(f'{count}x {shape}' for shape, count in repeated.items())
+
+
+class QueryBudget:
+    """The checks, raising AssertionError; shared by the mixin and the pytest fixture"""
+
+    @contextmanager
+    def budget(self, max_queries, max_repeats=MAX_REPEATS):
+        """At most max_queries queries, none of them repeated more than max_repeats times"""
+        with CaptureQueriesContext(connection) as context:
+            yield context
+        queries = recorded_sql(context)
+        if len(queries) > max_queries:
+            raise AssertionError(
+                f'{len(queries)} queries executed, budget is {max_queries}:\n{_listing(queries)}'
+            )
+        self._check_repeats(queries, max_repeats)
+
+    @contextmanager
+    def no_repeats(self, max_repeats=MAX_REPEATS):
+        with CaptureQueriesContext(connection) as context:
+            yield context
+        self._check_repeats(recorded_sql(context), max_repeats)
+
+    def constant(self, client, url, seed, counts=(1, 50), budget=None, max_repeats=MAX_REPEATS):
+        """
+        Request url after seed() created counts[0] rows and again with counts[1]
+        rows in total; both requests must run the same number of queries.
+        seed(n) adds n more rows that the endpoint lists (rows that existed
+        before are fine). Returns the query count.
+        """
+        separator = '&' if '?' in url else '?'
+        url = f'{url}{separator}page_size=100'
+        # Warm process-level caches (content types, search backend detection)
+        self._get(client, url)
+
+        previous, listed, measured = 0, [], []
+        for count in counts:
+            seed(count - previous)
+            previous = count
+            with CaptureQueriesContext(connection) as context:
+                response = self._get(client, url)
+            rows = response.data['results'] if isinstance(response.data, dict) else response.data
+            listed.append(len(rows))
+            measured.append(recorded_sql(context))
+        if listed[-1] - listed[0] != counts[-1] - counts[0]:
+            raise AssertionError(f'{url} listed {listed} rows after seeding {list(counts)}')
+
+        first, last = measured[0], measured[-1]
+        if len(first) != len(last):
+            repeated = repeated_shapes(last, max_repeats)
+            raise AssertionError(
+                f'{url}: {len(first)} queries for {counts[0]} rows but {len(last)} for {counts[-1]} rows. '
+                f'Repeated:\n{_repeats(repeated) if repeated else "(none)"}\n'
+                f'All queries:\n{_listing(last)}'
+            )
+        if budget is not None and len(last) > budget:
+            raise AssertionError(f'{url}: {len(last)} queries, budget is {budget}:\n{_listing(last)}')
+        self._check_repeats(last, max_repeats, url)
+        return len(last)
+
+    @staticmethod
+    def _get(client, url):
+        response = client.get(url)
+        if response.status_code != 200:
+            raise AssertionError(f'GET {url} returned {response.status_code}')
+        return response
+
+    @staticmethod
+    def _check_repeats(queries, max_repeats, label='block'):
+        repeated = repeated_shapes(queries, max_repeats)
+        if repeated:
+            raise AssertionError(f'Possible N+1 in {label}, query shapes repeated:\n{_repeats(repeated)}')
+
+
+class QueryBudgetMixin:
+    """TestCase mixin exposing QueryBudget as assert* methods"""
+
+    def assertQueryBudget(self, max_queries, max_repeats=MAX_REPEATS):
+        return QueryBudget().budget(max_queries, max_repeats)
+
+    def assertNoRepeatedQueries(self, max_repeats=MAX_REPEATS):
+        return QueryBudget().no_repeats(max_repeats)
+
+    def assertConstantQueries(self, url, seed, counts=(1, 50), budget=None, max_repeats=MAX_REPEATS):
+        return QueryBudget().constant(self.client, url, seed, counts, budget, max_repeats)
+
+
+try:
+    import pytest
+except ImportError:
+    pytest = None
+
+if pytest is not None:
+    @pytest.fixture
+    def query_budget(db):
+        """QueryBudget checks for pytest-django tests (``db`` comes from pytest-django)"""
+        return QueryBudget()
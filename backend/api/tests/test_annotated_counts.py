@@ -0,0 +1,151 @@
+"""
+Query-count regression tests for the per-row counts of training, policy and
+vacancy list endpoints (annotations instead of one COUNT per row).
+"""
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from api.models import (
+    Department, Policy, PolicyDistribution, TrainingPlan, TrainingProvider,
+    TrainingQuotation, TrainingSession, TrainingAttendance,
+    InternalVacancy, VacancyApplication,
+)
+
+
+class AnnotatedCountsTest(TestCase):
+    """Test cases for count annotations on list endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="manager")
+        self.client.force_authenticate(user=self.user)
+        self.analysts = [User.objects.create_user(username=f"analyst{i}") for i in range(3)]
+        self.department = Department.objects.create(name="Sistemas")
+        self.provider_index = 0
+        self.sequence = 0
+
+    def next_id(self):
+        self.sequence += 1
+        return self.sequence
+
+    # Fixtures: every row gets related objects so per-row COUNTs would show up
+
+    def create_policy(self):
+        policy = Policy.objects.create(
+            title="Política", code=f"POL-{self.next_id()}", description="...", content="...",
+            origin="audit", origin_justification="...", created_by=self.user
+        )
+        for analyst in self.analysts[:2]:
+            PolicyDistribution.objects.create(policy=policy, recipient=analyst, distributed_by=self.user)
+        return policy
+
+    def create_plan(self):
+        plan = TrainingPlan.objects.create(
+            title=f"Plan {self.next_id()}", description="...", topics="...", origin="performance",
+            scope="interdepartamental", duration_hours=8, created_by=self.user, status="scheduled"
+        )
+        provider = self.create_provider()
+        TrainingQuotation.objects.create(
+            training_plan=plan, provider=provider, temario="...", duration_hours=8, cost=100
+        )
+        self.create_session(plan)
+        return plan
+
+    def create_provider(self):
+        provider = TrainingProvider.objects.create(name=f"Proveedor {self.next_id()}")
+        return provider
+
+    def create_session(self, plan=None):
+        if plan is None:
+            plan = TrainingPlan.objects.create(
+                title=f"Plan {self.next_id()}", description="...", topics="...", origin="performance",
+                scope="interdepartamental", duration_hours=8, created_by=self.user
+            )
+        start = timezone.now() + timedelta(days=1)
+        session = TrainingSession.objects.create(
+            training_plan=plan, title=f"Sesión {self.next_id()}", instructor_name="Instructor",
+            location="Sala 1", start_datetime=start, end_datetime=start + timedelta(hours=2),
+            status="scheduled"
+        )
+        for index, analyst in enumerate(self.analysts):
+            TrainingAttendance.objects.create(
+                session=session, analyst=analyst,
+                confirmation_status='confirmed' if index < 2 else 'pending'
+            )
+        return session
+
+    def create_vacancy(self):
+        vacancy = InternalVacancy.objects.create(
+            title=f"Vacante {self.next_id()}", department=self.department, description="...",
+            responsibilities="...", technical_requirements="...", competencies="...",
+            experience_required="2 años", requested_by=self.user, authorization_justification="...",
+            status="published"
+        )
+        for analyst in self.analysts:
+            VacancyApplication.objects.create(vacancy=vacancy, applicant=analyst)
+        return vacancy
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.data)
+        return len(queries), response
+
+    def assertConstantQueries(self, url, factory):
+        factory()
+        one, _ = self.count_queries(url)
+        for _ in range(4):
+            factory()
+        many, response = self.count_queries(url)
+        self.assertEqual(one, many, f'{url} runs queries per row')
+        return response
+
+    def rows(self, response):
+        return response.data['results'] if isinstance(response.data, dict) else response.data
+
+    def test_policies(self):
+        response = self.assertConstantQueries('/api/policies/', self.create_policy)
+        self.assertEqual({row['distribution_count'] for row in self.rows(response)}, {2})
+
+    def test_training_plans(self):
+        response = self.assertConstantQueries('/api/training-plans/', self.create_plan)
+        row = self.rows(response)[0]
+        self.assertEqual((row['session_count'], row['quotation_count']), (1, 1))
+
+    def test_training_plan_calendar(self):
+        response = self.assertConstantQueries('/api/training-plans/calendar/', self.create_plan)
+        self.assertEqual(len(self.rows(response)), 5)
+
+    def test_training_providers(self):
+        def factory():
+            provider = self.create_provider()
+            plan = self.create_plan()
+            TrainingQuotation.objects.create(
+                training_plan=plan, provider=provider, temario="...", duration_hours=4, cost=50
+            )
+        response = self.assertConstantQueries('/api/training-providers/', factory)
+        self.assertEqual(sorted({row['quotation_count'] for row in self.rows(response)}), [1])
+
+    def test_training_sessions(self):
+        response = self.assertConstantQueries('/api/training-sessions/', self.create_session)
+        row = self.rows(response)[0]
+        self.assertEqual((row['attendance_count'], row['confirmed_count']), (3, 2))
+
+    def test_training_sessions_upcoming(self):
+        response = self.assertConstantQueries('/api/training-sessions/upcoming/', self.create_session)
+        self.assertEqual({row['confirmed_count'] for row in self.rows(response)}, {2})
+
+    def test_vacancies(self):
+        response = self.assertConstantQueries('/api/internal-vacancies/', self.create_vacancy)
+        self.assertEqual({row['application_count'] for row in self.rows(response)}, {3})
+
+    def test_single_object_fallback(self):
+        from api.serializers import TrainingSessionSerializer
+        session = self.create_session()
+        data = TrainingSessionSerializer(TrainingSession.objects.get(pk=session.pk)).data
+        self.assertEqual((data['attendance_count'], data['confirmed_count']), (3, 2))
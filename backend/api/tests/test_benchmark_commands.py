@@ -0,0 +1,89 @@
+"""
+Tests for the seed_benchmark_data and bench_api management commands at tiny volumes.
+"""
+import json
+import os
+import tempfile
+import warnings
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.paginator import UnorderedObjectListWarning
+from django.test import TransactionTestCase
+
+from api.models import ForumPost, LibraryDocument, PolicyDistribution, TrainingAttendance
+from api.search import get_backend
+from api.urls import router
+
+SMALL = [
+    '--users', '40', '--groups', '6', '--departments', '3', '--documents', '30', '--content-kb', '1',
+    '--policies', '5', '--distributions-per-policy', '4', '--training-plans', '4', '--sessions-per-plan', '2',
+    '--attendees-per-session', '3', '--providers', '3', '--vacancies', '3', '--applications-per-vacancy', '4',
+    '--forum-categories', '2', '--threads', '10', '--replies-per-thread', '3', '--batch-size', '7',
+]
+
+
+class BenchmarkCommandsTest(TransactionTestCase):
+    """Test cases for the synthetic data generator and API benchmark"""
+
+    def seed(self, *args):
+        call_command('seed_benchmark_data', *SMALL, *args, stdout=StringIO())
+
+    def test_seed_generates_consistent_data(self):
+        self.seed()
+
+        self.assertEqual(User.objects.filter(username__startswith='bench_user_').count(), 40)
+        self.assertEqual(LibraryDocument.objects.count(), 30)
+        self.assertEqual(PolicyDistribution.objects.count(), 20)
+        self.assertEqual(TrainingAttendance.objects.count(), 24)
+        # Denormalized flags and counters the signals would have maintained
+        restricted = LibraryDocument.objects.filter(groups__isnull=False).distinct()
+        self.assertFalse(restricted.filter(is_public=True).exists())
+        self.assertFalse(LibraryDocument.objects.exclude(pk__in=restricted).filter(is_public=False).exists())
+        for thread in ForumPost.objects.filter(parent_post__isnull=True):
+            self.assertEqual(thread.replies_count, thread.replies.count())
+            self.assertEqual(thread.likes_count, thread.liked_by.count())
+        matching = set(LibraryDocument.objects.filter(content__contains='auditoría').values_list('pk', flat=True))
+        self.assertTrue(matching)
+        self.assertLessEqual(matching, set(get_backend().search('auditoría', 1000)))
+
+    def test_seed_is_deterministic_and_refuses_to_duplicate(self):
+        self.seed()
+        first = list(LibraryDocument.objects.order_by('code').values_list('code', 'title', 'is_public'))
+
+        with self.assertRaises(CommandError):
+            self.seed()
+        self.seed('--clear')
+
+        self.assertEqual(list(LibraryDocument.objects.order_by('code').values_list('code', 'title', 'is_public')),
+                         first)
+
+    def test_bench_api_covers_every_router_endpoint(self):
+        self.seed()
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'bench.json')
+            out = StringIO()
+            with warnings.catch_warnings():
+                # Some extra actions paginate unordered querysets; not what this test is about
+                warnings.simplefilter('ignore', UnorderedObjectListWarning)
+                call_command('bench_api', '--requests', '2', '--concurrency', '2', '--output', output, stdout=out)
+            call_command('bench_api', '--requests', '1', '--endpoint', 'department', '--compare', output,
+                         stdout=out)
+            with open(output) as fh:
+                report = json.load(fh)
+
+        for prefix, viewset, basename in router.registry:
+            self.assertIn(f'{basename}-list', report['endpoints'])
+            self.assertIn(f'{basename}-detail', report['endpoints'])
+        self.assertIn('library-document-published', report['endpoints'])
+        for name, result in report['endpoints'].items():
+            self.assertEqual(result['requests'], 2, name)
+            self.assertFalse([code for code in result['status_codes'] if code.startswith('5')], name)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        list_result = report['endpoints']['department-list']
+        self.assertEqual(list_result['status_codes'], {'200': 2})
+        self.assertGreater(list_result['queries_per_request'], 0)
+        self.assertGreater(list_result['bytes_per_response'], 0)
+        self.assertIn('department-list', out.getvalue().split('Changes against')[1])
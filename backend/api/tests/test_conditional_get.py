@@ -0,0 +1,133 @@
+"""
+Tests for ETag / 304 Not Modified on list and detail endpoints (api/conditional.py).
+"""
+from django.contrib.auth.models import Group, User
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.models import (
+    ForumCategory, ForumPost, LibraryDocument, Policy, PolicyDistribution, TrainingPlan,
+)
+
+
+class ConditionalGetTest(TestCase):
+    """Test cases for conditional GET validators"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='reader', is_staff=True)
+        self.client.force_authenticate(user=self.user)
+        self.category = ForumCategory.objects.create(name='General')
+        self.post = ForumPost.objects.create(category=self.category, title='Hola', content='...', author=self.user)
+
+    def get(self, url, etag=None, **extra):
+        if etag is not None:
+            extra['HTTP_IF_NONE_MATCH'] = etag
+        return self.client.get(url, **extra)
+
+    def assertNotModified(self, url, etag):
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+    def assertModified(self, url, etag):
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        return response['ETag']
+
+    def test_detail_validators(self):
+        url = f'/api/forum-categories/{self.category.pk}/'
+        response = self.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        self.assertIn('Last-Modified', response)
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertIn('private', response['Cache-Control'])
+
+        etag = response['ETag']
+        self.assertNotModified(url, etag)
+        self.category.description = 'Temas generales'
+        self.category.save()
+        self.assertModified(url, etag)
+
+    def test_detail_tracks_counters_and_annotated_counts(self):
+        url = f'/api/forum-posts/{self.post.pk}/'
+        etag = self.get(url)['ETag']
+        self.client.post(url + 'like/')
+        etag = self.assertModified(url, etag)
+        ForumPost.objects.create(category=self.category, title='Re', content='...', author=self.user,
+                                 parent_post=self.post)
+        self.assertModified(url, etag)
+
+        url = f'/api/forum-categories/{self.category.pk}/'
+        etag = self.get(url)['ETag']
+        ForumPost.objects.create(category=self.category, title='Otro', content='...', author=self.user)
+        self.assertModified(url, etag)
+
+    def test_detail_tracks_document_groups(self):
+        document = LibraryDocument.objects.create(title='Manual', code='DOC-1', author=self.user)
+        url = f'/api/library-documents/{document.pk}/'
+        etag = self.get(url)['ETag']
+        self.assertNotModified(url, etag)
+        group = Group.objects.create(name='HR_Managers')
+        self.user.groups.add(group)
+        document.groups.add(group)
+        self.assertModified(url, etag)
+
+    def test_list_not_modified_runs_only_the_fingerprint_query(self):
+        url = '/api/forum-categories/'
+        etag = self.get(url)['ETag']
+        with self.assertNumQueries(1):
+            self.assertNotModified(url, etag)
+
+    def test_list_tracks_inserts_deletes_and_related_counts(self):
+        url = '/api/forum-categories/'
+        etag = self.get(url)['ETag']
+        other = ForumCategory.objects.create(name='Anuncios')
+        etag = self.assertModified(url, etag)
+        other.delete()
+        etag = self.assertModified(url, etag)
+        ForumPost.objects.create(category=self.category, title='Otro', content='...', author=self.user)
+        etag = self.assertModified(url, etag)
+        self.assertNotModified(url, etag)
+
+    def test_list_count_comes_from_the_fingerprint(self):
+        plan = TrainingPlan.objects.create(
+            title='Plan', description='...', topics='...', origin='performance', scope='interdepartamental',
+            duration_hours=8, created_by=self.user,
+        )
+        response = self.get('/api/training-plans/')
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['id'], plan.pk)
+
+    def test_etag_depends_on_query_string_and_user(self):
+        url = '/api/forum-categories/'
+        etag = self.get(url)['ETag']
+        self.assertEqual(self.get(url + '?page_size=5', etag).status_code, 200)
+        self.client.force_authenticate(user=User.objects.create_user(username='other'))
+        self.assertEqual(self.get(url, etag).status_code, 200)
+
+    def test_if_modified_since_alone_is_not_honoured(self):
+        url = f'/api/forum-categories/{self.category.pk}/'
+        last_modified = self.get(url)['Last-Modified']
+        self.assertEqual(self.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 200)
+
+    def test_unconditional_responses(self):
+        # ?count=false skips the scan the fingerprint needs
+        self.assertNotIn('ETag', self.get('/api/forum-posts/?count=false'))
+        # No updated_at on the model
+        policy = Policy.objects.create(
+            title='Política', code='POL-1', description='...', content='...', origin='audit',
+            origin_justification='...', created_by=self.user,
+        )
+        distribution = PolicyDistribution.objects.create(policy=policy, recipient=self.user,
+                                                         distributed_by=self.user)
+        self.assertNotIn('ETag', self.get('/api/policy-distributions/'))
+        self.assertNotIn('ETag', self.get(f'/api/policy-distributions/{distribution.pk}/'))
+
+    def test_writes_are_unaffected(self):
+        response = self.client.patch(f'/api/forum-categories/{self.category.pk}/', {'name': 'Foro'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
@@ -0,0 +1,109 @@
+"""
+Tests for the write-behind view/download counters.
+"""
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User, Group
+from rest_framework.test import APIClient
+from rest_framework import status
+from api.models import LibraryDocument, ForumCategory, ForumPost
+from api import counters
+
+
+@override_settings(COUNTER_FLUSH_INTERVAL=3600)
+class CounterBufferTest(TestCase):
+    """Test cases for buffering and flushing counter increments"""
+
+    def setUp(self):
+        counters.flush()
+        self.user = User.objects.create_user(username="counter_user")
+        self.document = LibraryDocument.objects.create(title="Doc", code="CNT-001", author=self.user)
+        self.other = LibraryDocument.objects.create(title="Doc 2", code="CNT-002", author=self.user)
+
+    def tearDown(self):
+        counters.flush()
+
+    def test_increments_are_buffered_until_flush(self):
+        counters.increment('document_view', self.document.pk)
+        counters.increment('document_view', self.document.pk)
+        self.assertEqual(counters.pending('document_view', self.document.pk), 2)
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.view_count, 0)
+
+        counters.flush()
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.view_count, 2)
+        self.assertEqual(counters.pending('document_view', self.document.pk), 0)
+
+    def test_flush_batches_equal_increments(self):
+        counters.increment('document_download', self.document.pk)
+        counters.increment('document_download', self.other.pk)
+        with self.assertNumQueries(1):
+            counters.flush()
+        self.assertEqual(
+            list(LibraryDocument.objects.order_by('code').values_list('download_count', flat=True)),
+            [1, 1]
+        )
+
+    def test_flush_does_not_touch_updated_at(self):
+        updated_at = self.document.updated_at
+        counters.increment('document_view', self.document.pk, 5)
+        counters.flush()
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.view_count, 5)
+        self.assertEqual(self.document.updated_at, updated_at)
+
+    def test_unknown_counter(self):
+        with self.assertRaises(ValueError):
+            counters.increment('unknown', 1)
+
+
+@override_settings(COUNTER_FLUSH_INTERVAL=0)
+class CounterEndpointsTest(TestCase):
+    """Test cases for the increment actions and the beacon endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="counter_user")
+        self.client.force_authenticate(user=self.user)
+        self.document = LibraryDocument.objects.create(title="Doc", code="CNT-001", author=self.user)
+        self.restricted = LibraryDocument.objects.create(title="Secret", code="CNT-002", author=self.user)
+        self.restricted.groups.add(Group.objects.create(name='Restricted'))
+        category = ForumCategory.objects.create(name="General")
+        self.post = ForumPost.objects.create(category=category, title="Hola", content="...", author=self.user)
+
+    def test_increment_view_returns_compact_payload(self):
+        response = self.client.post(f'/api/library-documents/{self.document.id}/increment_view/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'id': self.document.id, 'view_count': 1})
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.view_count, 1)
+
+    def test_increment_forum_views(self):
+        response = self.client.post(f'/api/forum-posts/{self.post.id}/increment_views/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views_count, 1)
+
+    def test_beacon_records_many_increments(self):
+        response = self.client.post('/api/counters/', {
+            'document_view': [self.document.id, self.document.id],
+            'document_download': [self.document.id],
+            'forum_view': [self.post.id],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.document.refresh_from_db()
+        self.post.refresh_from_db()
+        self.assertEqual(self.document.view_count, 2)
+        self.assertEqual(self.document.download_count, 1)
+        self.assertEqual(self.post.views_count, 1)
+
+    def test_beacon_skips_documents_outside_acl(self):
+        self.client.post('/api/counters/', {'document_view': [self.restricted.id]}, format='json')
+        self.restricted.refresh_from_db()
+        self.assertEqual(self.restricted.view_count, 0)
+
+    def test_beacon_rejects_invalid_payload(self):
+        response = self.client.post('/api/counters/', {'likes': [1]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post('/api/counters/', {'document_view': ['1']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
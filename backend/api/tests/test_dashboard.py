@@ -0,0 +1,122 @@
+"""
+Tests for the aggregated home page endpoint (/api/dashboard/).
+"""
+from datetime import timedelta
+
+from django.contrib.auth.models import Group, User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api import caching, roles
+from api.headcount import EMPLOYEES_GROUP
+from api.models import (
+    LibraryDocument, Policy, PolicyDistribution, TrainingAttendance, TrainingPlan, TrainingSession,
+)
+
+
+@override_settings(DASHBOARD_CACHE_TTL=60, ROLE_CACHE_TTL=60)
+class DashboardTest(TestCase):
+    """Test cases for the dashboard widgets"""
+
+    def setUp(self):
+        caching.get_cache().clear()
+        roles.invalidate()
+        self.client = APIClient()
+        self.employees = Group.objects.create(name=EMPLOYEES_GROUP)
+        self.hr = Group.objects.create(name='HR_Managers')
+        self.user = User.objects.create_user(username='reader', first_name='Ana')
+        self.user.groups.add(self.employees, self.hr)
+        veteran = User.objects.create_user(username='veteran')
+        veteran.date_joined = timezone.now() - timedelta(days=120)
+        veteran.save()
+        veteran.groups.add(self.employees)
+        LibraryDocument.objects.create(title='Público', code='DOC-1', author=self.user, status='published')
+        LibraryDocument.objects.create(title='RH', code='DOC-2', author=self.user,
+                                       status='published').groups.add(self.hr)
+        LibraryDocument.objects.create(title='Borrador', code='DOC-3', author=self.user, status='draft')
+
+    def tearDown(self):
+        caching.get_cache().clear()
+        roles.invalidate()
+
+    def get(self, query=''):
+        response = self.client.get('/api/dashboard/' + query)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_default_widgets(self):
+        self.client.force_authenticate(user=self.user)
+        data = self.get()
+        self.assertEqual(set(data), {'user', 'headcount', 'documents'})
+        self.assertEqual(data['user']['username'], 'reader')
+        self.assertEqual(data['user']['groups'], sorted([EMPLOYEES_GROUP, 'HR_Managers']))
+        self.assertEqual(data['documents'], {'count': 2})
+        self.assertEqual(data['headcount']['count'], 2)
+        self.assertEqual(data['headcount']['previous_count'], 1)
+        self.assertEqual(data['headcount']['percent_change'], 100.0)
+        self.assertTrue(data['headcount']['is_positive'])
+        self.assertEqual(data['headcount'], self.client.get('/api/metrics/active-employees/').data)
+
+    def test_anonymous_request(self):
+        data = self.get()
+        self.assertIsNone(data['user'])
+        self.assertEqual(data['documents'], {'count': 1})
+        self.assertEqual(data['headcount']['count'], 2)
+
+    def test_repeated_requests_are_served_from_caches(self):
+        self.client.force_authenticate(user=self.user)
+        # Group names, two headcount lookups (no snapshot yet, then the live count) and documents
+        with self.assertNumQueries(4):
+            self.get()
+        with self.assertNumQueries(0):
+            self.get()
+
+    def test_changes_invalidate_cached_widgets(self):
+        self.client.force_authenticate(user=self.user)
+        self.get()
+        User.objects.create_user(username='new').groups.add(self.employees)
+        LibraryDocument.objects.create(title='Nuevo', code='DOC-4', author=self.user, status='published')
+        data = self.get()
+        self.assertEqual(data['headcount']['count'], 3)
+        self.assertEqual(data['documents'], {'count': 3})
+
+    def test_unknown_widget(self):
+        response = self.client.get('/api/dashboard/?widgets=user,weather')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('weather', response.data['error'])
+
+    def test_personal_widgets(self):
+        query = '?widgets=pending_approvals,upcoming_trainings,unacknowledged_policies'
+        self.assertEqual(self.get(query), {
+            'pending_approvals': None, 'upcoming_trainings': None, 'unacknowledged_policies': None,
+        })
+
+        LibraryDocument.objects.create(title='Revisión', code='DOC-5', author=self.user, status='pending_approval')
+        plan = TrainingPlan.objects.create(
+            title='Plan', description='...', topics='...', origin='performance', scope='interdepartamental',
+            duration_hours=8, created_by=self.user,
+        )
+        start = timezone.now() + timedelta(days=2)
+        session = TrainingSession.objects.create(
+            training_plan=plan, title='Excel', instructor_name='Instructor', location='Sala 1',
+            start_datetime=start, end_datetime=start + timedelta(hours=2),
+        )
+        TrainingAttendance.objects.create(session=session, analyst=self.user)
+        policy = Policy.objects.create(
+            title='Política', code='POL-1', description='...', content='...', origin='audit',
+            origin_justification='...', created_by=self.user,
+        )
+        PolicyDistribution.objects.create(policy=policy, recipient=self.user, distributed_by=self.user)
+
+        self.client.force_authenticate(user=self.user)
+        data = self.get(query)
+        # Not a document manager
+        self.assertIsNone(data['pending_approvals'])
+        self.assertEqual([item['title'] for item in data['upcoming_trainings']], ['Excel'])
+        self.assertEqual(data['unacknowledged_policies']['count'], 1)
+        self.assertEqual(data['unacknowledged_policies']['items'][0]['code'], 'POL-1')
+
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.get('?widgets=pending_approvals')['pending_approvals'], {'documents': 1})
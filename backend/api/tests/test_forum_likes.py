@@ -0,0 +1,118 @@
+"""
+Tests for the idempotent like/unlike endpoints.
+"""
+import threading
+import time
+
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from rest_framework import status
+from api.models import ForumCategory, ForumPost
+
+
+class ForumLikeTest(TestCase):
+    """Test cases for like / unlike / toggle_like"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.author = User.objects.create_user(username="author")
+        self.user = User.objects.create_user(username="fan")
+        self.client.force_authenticate(user=self.user)
+        category = ForumCategory.objects.create(name="General")
+        self.post = ForumPost.objects.create(category=category, title="Hola", content="...", author=self.author)
+        self.url = f'/api/forum-posts/{self.post.id}/'
+
+    def test_like_is_idempotent(self):
+        for _ in range(3):
+            response = self.client.post(self.url + 'like/')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'id': self.post.id, 'liked': True, 'likes_count': 1})
+        self.assertEqual(self.post.liked_by.count(), 1)
+
+    def test_unlike_is_idempotent(self):
+        self.client.post(self.url + 'like/')
+        for _ in range(2):
+            response = self.client.post(self.url + 'unlike/')
+        self.assertEqual(response.data, {'id': self.post.id, 'liked': False, 'likes_count': 0})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+
+    def test_like_does_not_touch_updated_at(self):
+        updated_at = self.post.updated_at
+        self.client.post(self.url + 'like/')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.updated_at, updated_at)
+
+    def test_toggle_like_returns_full_post(self):
+        response = self.client.post(self.url + 'toggle_like/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['user_has_liked'])
+        self.assertEqual(response.data['likes_count'], 1)
+        self.assertEqual(response.data['title'], 'Hola')
+        response = self.client.post(self.url + 'toggle_like/')
+        self.assertFalse(response.data['user_has_liked'])
+        self.assertEqual(response.data['likes_count'], 0)
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(user=None)
+        response = self.client.post(self.url + 'like/')
+        self.assertIn(response.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+
+
+class ForumLikeConcurrencyTest(TransactionTestCase):
+    """
+    Many threads liking and unliking the same post keep likes_count exact.
+    The in-memory SQLite test database reports lock conflicts instead of
+    waiting, those requests are retried (each like/unlike is atomic).
+    """
+
+    THREADS = 8
+    ROUNDS = 5
+
+    def setUp(self):
+        self.author = User.objects.create_user(username="author")
+        self.users = [User.objects.create_user(username=f"fan{i}") for i in range(self.THREADS)]
+        category = ForumCategory.objects.create(name="General")
+        self.post = ForumPost.objects.create(category=category, title="Hola", content="...", author=self.author)
+
+    @staticmethod
+    def post_with_retry(client, url):
+        while True:
+            try:
+                return client.post(url)
+            except OperationalError as exc:
+                if 'locked' not in str(exc):
+                    raise
+                time.sleep(0.001)
+
+    def hammer(self, user, errors, barrier):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        url = f'/api/forum-posts/{self.post.id}/'
+        try:
+            barrier.wait()
+            for _ in range(self.ROUNDS):
+                # Duplicate likes and unlikes from the same user must not double-count
+                for action in ('like', 'like', 'unlike', 'like'):
+                    response = self.post_with_retry(client, url + action + '/')
+                    if response.status_code != 200:
+                        errors.append(response.status_code)
+        except Exception as exc:  # pragma: no cover - reported below
+            errors.append(exc)
+        finally:
+            connection.close()
+
+    def test_concurrent_likes(self):
+        errors = []
+        barrier = threading.Barrier(self.THREADS)
+        threads = [threading.Thread(target=self.hammer, args=(user, errors, barrier)) for user in self.users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, self.THREADS)
+        self.assertEqual(self.post.liked_by.count(), self.THREADS)
@@ -0,0 +1,104 @@
+"""
+Tests for the denormalized forum reply stats and the per-page like lookup.
+"""
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from api.models import ForumCategory, ForumPost
+
+
+class ForumReplyStatsTest(TestCase):
+    """Test cases for ForumPost.replies_count / last_reply_at"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="forum_user")
+        self.category = ForumCategory.objects.create(name="General")
+        self.post = ForumPost.objects.create(category=self.category, title="Hola", content="...", author=self.user)
+        self.other = ForumPost.objects.create(category=self.category, title="Otro", content="...", author=self.user)
+
+    def reply(self, parent):
+        return ForumPost.objects.create(
+            category=self.category, title="Re", content="...", author=self.user, parent_post=parent
+        )
+
+    def test_reply_increments_parent(self):
+        updated_at = self.post.updated_at
+        reply = self.reply(self.post)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.replies_count, 1)
+        self.assertEqual(self.post.last_reply_at, reply.created_at)
+        self.assertEqual(self.post.updated_at, updated_at)
+
+    def test_delete_recounts_parent(self):
+        first = self.reply(self.post)
+        second = self.reply(self.post)
+        second.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.replies_count, 1)
+        self.assertEqual(self.post.last_reply_at, first.created_at)
+        ForumPost.objects.filter(parent_post=self.post).delete()
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.replies_count, self.post.last_reply_at), (0, None))
+
+    def test_moving_a_reply_updates_both_parents(self):
+        reply = self.reply(self.post)
+        reply.parent_post = self.other
+        reply.save()
+        self.post.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(self.post.replies_count, 0)
+        self.assertEqual(self.other.replies_count, 1)
+
+
+class ForumListQueriesTest(TestCase):
+    """Test cases for constant-query forum lists"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="reader")
+        self.author = User.objects.create_user(username="author")
+        self.client.force_authenticate(user=self.user)
+        self.category = ForumCategory.objects.create(name="General")
+
+    def create_posts(self, count):
+        posts = []
+        for i in range(count):
+            post = ForumPost.objects.create(category=self.category, title=f"P{i}", content="...", author=self.author)
+            ForumPost.objects.create(
+                category=self.category, title="Re", content="...", author=self.author, parent_post=post
+            )
+            posts.append(post)
+        return posts
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_post_list_query_count_is_constant(self):
+        liked = self.create_posts(1)[0]
+        liked.liked_by.add(self.user)
+        url = '/api/forum-posts/?main_posts_only=true&page_size=50'
+        one, _ = self.count_queries(url)
+        self.create_posts(9)
+        many, response = self.count_queries(url)
+        self.assertEqual(one, many)
+        rows = {row['id']: row for row in response.data['results']}
+        self.assertEqual(len(rows), 10)
+        self.assertTrue(rows[liked.id]['user_has_liked'])
+        self.assertEqual(sum(row['user_has_liked'] for row in rows.values()), 1)
+        self.assertEqual({row['replies_count'] for row in rows.values()}, {1})
+
+    def test_category_list_query_count_is_constant(self):
+        self.create_posts(2)
+        one, _ = self.count_queries('/api/forum-categories/')
+        for i in range(4):
+            category = ForumCategory.objects.create(name=f"Cat {i}")
+            ForumPost.objects.create(category=category, title="P", content="...", author=self.author)
+        many, response = self.count_queries('/api/forum-categories/')
+        self.assertEqual(one, many)
+        counts = {row['name']: row['posts_count'] for row in response.data['results']}
+        self.assertEqual(counts['General'], 2)
@@ -0,0 +1,112 @@
+"""
+Tests for the daily headcount snapshots and the active employees metric.
+"""
+from datetime import date, timedelta
+from io import StringIO
+
+from django.contrib.auth.models import Group, User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api import caching, headcount
+from api.headcount import EMPLOYEES_GROUP
+from api.models import HeadcountSnapshot
+
+
+class HeadcountSnapshotTest(TestCase):
+    """Test cases for api.headcount and the snapshot_headcount command"""
+
+    def setUp(self):
+        caching.get_cache().clear()
+        self.client = APIClient()
+        self.employees = Group.objects.create(name=EMPLOYEES_GROUP)
+        self.it = Group.objects.create(name='IT_Department')
+        self.users = [User.objects.create_user(username=f'user{i}') for i in range(4)]
+        for user in self.users:
+            user.groups.add(self.employees)
+        self.users[0].groups.add(self.it)
+        self.today = timezone.localdate()
+
+    def tearDown(self):
+        caching.get_cache().clear()
+
+    def snapshot(self, day, count, group_name=EMPLOYEES_GROUP):
+        HeadcountSnapshot.objects.create(date=day, group_name=group_name, active_count=count)
+
+    def test_record_counts_groups_and_total(self):
+        User.objects.create_user(username='outsider')
+        self.users[1].is_active = False
+        self.users[1].save()
+        Group.objects.create(name='Empty')
+
+        headcount.record(date(2026, 1, 5))
+        counts = dict(HeadcountSnapshot.objects.values_list('group_name', 'active_count'))
+        self.assertEqual(counts, {'': 4, EMPLOYEES_GROUP: 3, 'IT_Department': 1, 'Empty': 0})
+
+    def test_record_replaces_the_day(self):
+        headcount.record(date(2026, 1, 5))
+        self.users[2].groups.remove(self.employees)
+        self.it.delete()
+        headcount.record(date(2026, 1, 5))
+        counts = dict(HeadcountSnapshot.objects.values_list('group_name', 'active_count'))
+        self.assertEqual(counts, {'': 4, EMPLOYEES_GROUP: 3})
+
+    def test_command(self):
+        out = StringIO()
+        call_command('snapshot_headcount', '--date', '2026-01-05', stdout=out)
+        self.assertIn('Recorded 2 groups for 2026-01-05 (4 active users)', out.getvalue())
+        self.assertTrue(HeadcountSnapshot.objects.filter(date=date(2026, 1, 5), group_name='').exists())
+        with self.assertRaises(CommandError):
+            call_command('snapshot_headcount', '--date', '05/01/2026', stdout=out)
+
+    def test_summary_reads_snapshots(self):
+        last_month_end = self.today.replace(day=1) - timedelta(days=1)
+        self.snapshot(last_month_end - timedelta(days=3), 5)
+        self.snapshot(last_month_end, 8)
+        self.snapshot(self.today - timedelta(days=1), 10)
+
+        with self.assertNumQueries(2):
+            data = headcount.summary(self.today)
+        self.assertEqual(data['count'], 10)
+        self.assertEqual(data['previous_count'], 8)
+        self.assertEqual(data['percent_change'], 25.0)
+        self.assertTrue(data['is_positive'])
+        self.assertEqual(data['as_of'], self.today - timedelta(days=1))
+
+    def test_summary_without_recent_snapshots_counts_live(self):
+        self.snapshot(self.today - timedelta(days=30), 100)
+        data = headcount.summary(self.today)
+        self.assertEqual(data['count'], 4)
+        self.assertIsNone(data['as_of'])
+
+    def test_endpoint_and_range_series(self):
+        for offset in range(10):
+            self.snapshot(self.today - timedelta(days=offset), 20 + offset)
+
+        response = self.client.get('/api/metrics/active-employees/', {'range': '1w'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 20)
+        self.assertEqual([point['count'] for point in response.data['series']], [26, 25, 24, 23, 22, 21, 20])
+        self.assertEqual(response.data['series'][-1]['date'], self.today)
+
+        self.assertNotIn('series', self.client.get('/api/metrics/active-employees/').data)
+        self.assertEqual(self.client.get('/api/metrics/active-employees/', {'range': 'forever'}).status_code, 400)
+
+    def test_new_snapshot_invalidates_cached_metric(self):
+        self.assertEqual(self.client.get('/api/metrics/active-employees/').data['count'], 4)
+        self.snapshot(self.today, 50)
+        self.assertEqual(self.client.get('/api/metrics/active-employees/').data['count'], 50)
+        headcount.record(self.today)
+        self.assertEqual(self.client.get('/api/metrics/active-employees/').data['count'], 4)
+
+    def test_parse_range(self):
+        self.assertEqual(headcount.parse_range('30d'), 30)
+        self.assertEqual(headcount.parse_range('12W'), 84)
+        self.assertEqual(headcount.parse_range('6m'), 180)
+        self.assertEqual(headcount.parse_range('1y'), 365)
+        for value in ('', '0d', '10', '6y', 'd30'):
+            with self.assertRaises(ValueError, msg=value):
+                headcount.parse_range(value)
@@ -0,0 +1,122 @@
+"""
+Tests for the request metrics middleware and /api/metrics/internal/ (api/instrumentation.py).
+"""
+import json
+import os
+import tempfile
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from api import instrumentation
+from api.models import Department
+
+
+def sample(text, line_prefix):
+    """Value of the exposition line starting with line_prefix"""
+    for line in text.splitlines():
+        if line.startswith(line_prefix + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return None
+
+
+class MetricsMiddlewareTestCase(TestCase):
+
+    def setUp(self):
+        instrumentation.registry.reset()
+        self.client = APIClient()
+        self.staff = User.objects.create_user(username='ops', password='x', is_staff=True)
+        self.employee = User.objects.create_user(username='employee')
+
+    def scrape(self):
+        self.client.force_authenticate(self.staff)
+        response = self.client.get('/api/metrics/internal/')
+        self.client.force_authenticate(None)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.content.decode()
+
+    def test_routes_are_labelled_by_view_name(self):
+        Department.objects.create(name='Finanzas')
+        self.client.force_authenticate(self.employee)
+        self.client.get('/api/departments/')
+        self.client.get('/api/departments/')
+        self.client.get('/api/health/')
+        self.client.get('/api/does-not-exist/')
+
+        text = self.scrape()
+
+        self.assertEqual(sample(text, 'http_requests_total{route="department-list",method="GET",status="200"}'), 2)
+        self.assertEqual(sample(text, 'http_requests_total{route="health_check",method="GET",status="200"}'), 1)
+        self.assertEqual(sample(text, 'http_requests_total{route="unmatched",method="GET",status="404"}'), 1)
+        self.assertEqual(
+            sample(text, 'http_request_duration_seconds_count{route="department-list",method="GET"}'), 2)
+        self.assertIn('# TYPE http_request_duration_seconds histogram', text)
+
+    def test_query_count_and_response_size(self):
+        self.client.force_authenticate(self.employee)
+        self.client.get('/api/health/')
+        self.client.get('/api/departments/')
+
+        text = self.scrape()
+
+        # health_check runs no queries: it lands in the le="0" bucket
+        self.assertEqual(sample(text, 'http_request_db_queries_bucket{route="health_check",le="0"}'), 1)
+        self.assertGreater(sample(text, 'http_request_db_queries_sum{route="department-list"}'), 0)
+        self.assertGreater(sample(text, 'http_response_size_bytes_sum{route="health_check"}'), 0)
+        self.assertEqual(sample(text, 'http_response_size_bytes_bucket{route="health_check",le="+Inf"}'), 1)
+
+    def test_histogram_buckets_are_cumulative(self):
+        for value in (0.001, 0.02, 0.3, 20):
+            instrumentation.registry.observe('ldap_login_phase_seconds', ('bind',), value)
+
+        text = instrumentation.render([instrumentation.registry.snapshot()])
+
+        self.assertEqual(sample(text, 'ldap_login_phase_seconds_bucket{phase="bind",le="0.005"}'), 1)
+        self.assertEqual(sample(text, 'ldap_login_phase_seconds_bucket{phase="bind",le="0.025"}'), 2)
+        self.assertEqual(sample(text, 'ldap_login_phase_seconds_bucket{phase="bind",le="10"}'), 3)
+        self.assertEqual(sample(text, 'ldap_login_phase_seconds_bucket{phase="bind",le="+Inf"}'), 4)
+        self.assertEqual(sample(text, 'ldap_login_phase_seconds_count{phase="bind"}'), 4)
+
+    @override_settings(ROLE_CACHE_TTL=60)
+    def test_cache_lookups_are_counted(self):
+        from api import roles
+        user = User.objects.create_user(username='reader')
+        roles.invalidate()
+        roles.get_group_names(User.objects.get(pk=user.pk))
+        roles.get_group_names(User.objects.get(pk=user.pk))
+
+        text = instrumentation.render([instrumentation.registry.snapshot()])
+
+        self.assertEqual(sample(text, 'cache_requests_total{cache="role",result="miss"}'), 1)
+        self.assertEqual(sample(text, 'cache_requests_total{cache="role",result="hit"}'), 1)
+
+    def test_endpoint_is_staff_only(self):
+        self.assertEqual(self.client.get('/api/metrics/internal/').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.force_authenticate(self.employee)
+        self.assertEqual(self.client.get('/api/metrics/internal/').status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_multiprocess_files_are_summed(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(METRICS_MULTIPROC_DIR=directory, METRICS_FLUSH_INTERVAL=0):
+            other = instrumentation.Registry()
+            other.record_request('health_check', 'GET', 200, 0.01, 0, 0.0, 60)
+            with open(os.path.join(directory, 'metrics_999999.json'), 'w') as fh:
+                json.dump(other.snapshot(), fh)
+            with open(os.path.join(directory, 'metrics_888888.json'), 'w') as fh:
+                fh.write('{"counters": [')
+
+            self.client.get('/api/health/')
+            self.assertTrue(os.path.exists(os.path.join(directory, f'metrics_{os.getpid()}.json')))
+
+            with self.assertLogs('api.instrumentation', 'WARNING'):
+                text = self.scrape()
+
+        # This process, the other worker's file; the truncated file is skipped
+        self.assertEqual(sample(text, 'http_requests_total{route="health_check",method="GET",status="200"}'), 2)
+
+    def test_label_values_are_escaped(self):
+        instrumentation.cache_lookup('we"ird\\name', True)
+        text = instrumentation.render([instrumentation.registry.snapshot()])
+        self.assertIn('cache_requests_total{cache="we\\"ird\\\\name",result="hit"} 1', text)
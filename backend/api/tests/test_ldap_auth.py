@@ -0,0 +1,316 @@
+"""
+Tests for the pooled LDAP login backend and circuit breaker (api/ldap_auth.py),
+against the in-process fake directory.
+"""
+import threading
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from ldap3.core.exceptions import LDAPInvalidFilterError, LDAPSocketOpenError
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from api import ldap_auth
+from api.ldap_fake import BIND_PASSWORD, FakeDirectory
+from api.models import LDAPUserState
+
+DIRECTORY = FakeDirectory()
+
+
+@override_settings(
+    AUTHENTICATION_BACKENDS=['api.ldap_auth.PooledLDAPBackend', 'django.contrib.auth.backends.ModelBackend'],
+    AUTH_LDAP_USER_SEARCH_BASE=DIRECTORY.base,
+    AUTH_LDAP_USER_SEARCH_FILTER='(sAMAccountName=%(user)s)',
+    AUTH_LDAP_BIND_DN=DIRECTORY.bind_dn,
+    AUTH_LDAP_BIND_PASSWORD=BIND_PASSWORD,
+)
+class PooledLDAPLoginTestCase(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.directory = FakeDirectory()
+        self.directory.add_user(
+            'jperez', email='jperez@example.com', first_name='Juan', last_name='Pérez',
+            groups=['Gerentes_RH', 'Staff'], password='s3cret',
+        )
+        self.connects = 0
+        self.down = False
+
+        def connect():
+            self.connects += 1
+            if self.down:
+                raise LDAPSocketOpenError('socket connection error while opening: timed out')
+            return self.directory.connect()
+
+        ldap_auth.set_pool(ldap_auth.LDAPConnectionPool(connect, size=2, timeout=1))
+        ldap_auth.breaker.reset()
+        ldap_auth.metrics.reset()
+        self.addCleanup(ldap_auth.set_pool, None)
+        self.addCleanup(ldap_auth.breaker.reset)
+
+    def login(self, username='jperez', password='s3cret'):
+        return self.client.post('/api/auth/login/', {'username': username, 'password': password}, format='json')
+
+    def test_login_creates_user_with_attributes_and_groups(self):
+        response = self.login()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        user = User.objects.get(username='jperez')
+        self.assertEqual((user.first_name, user.last_name, user.email), ('Juan', 'Pérez', 'jperez@example.com'))
+        self.assertFalse(user.has_usable_password())
+        # AD group CNs as they are, not AUTH_LDAP_GROUP_MAPPING
+        self.assertEqual(set(user.groups.values_list('name', flat=True)), {'Gerentes_RH', 'Staff'})
+        self.assertEqual(set(response.data['user']['groups']), {'Gerentes_RH', 'Staff'})
+        for phase in ('connect', 'search', 'bind', 'db', 'groups'):
+            self.assertIn(f'ldap-{phase};dur=', response['Server-Timing'])
+
+    def test_connections_are_reused_between_logins(self):
+        for _ in range(3):
+            self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+            self.client.cookies.clear()
+        self.assertEqual(self.connects, 1)
+        self.assertEqual(ldap_auth.metrics.snapshot()['phases']['bind']['count'], 3)
+
+    def test_wrong_password_keeps_connection_usable(self):
+        self.assertEqual(self.login(password='wrong').status_code, status.HTTP_401_UNAUTHORIZED)
+        # The pooled connection was rebound as the service account
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        self.assertEqual(self.connects, 1)
+        self.assertEqual(ldap_auth.metrics.snapshot()['outcomes'], {'success': 1, 'invalid': 1, 'unavailable': 0, 'writes_skipped': 0})
+
+    def test_unknown_user_and_filter_characters(self):
+        self.assertEqual(self.login(username='nobody').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.login(username='jp*').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertFalse(User.objects.exists())
+
+    def test_directory_down_opens_breaker_and_fails_fast(self):
+        self.down = True
+        for _ in range(3):
+            response = self.login()
+            self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(ldap_auth.breaker.state, 'open')
+
+        response = self.login()
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIn('Retry-After', response)
+        # Breaker open: the directory was not tried again
+        self.assertEqual(self.connects, 3)
+
+    def test_breaker_half_open_trial_closes_on_success(self):
+        self.down = True
+        for _ in range(3):
+            self.login()
+        self.down = False
+        self.addCleanup(setattr, ldap_auth.breaker, 'reset_timeout', ldap_auth.breaker.reset_timeout)
+        ldap_auth.breaker.reset_timeout = 0
+
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        self.assertEqual(ldap_auth.breaker.state, 'closed')
+
+    def test_connection_closed_by_server_is_replaced(self):
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        self.client.cookies.clear()
+        # AD's idle timeout closed the pooled connection
+        self.directory.drop_connections()
+
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+        self.assertEqual(self.connects, 2)
+        self.assertEqual(ldap_auth.breaker.state, 'closed')
+        self.assertEqual(ldap_auth.metrics.snapshot()['outcomes']['unavailable'], 0)
+
+    def test_failed_retry_counts_one_breaker_failure(self):
+        self.login()
+        self.client.cookies.clear()
+        self.directory.drop_connections()
+        self.down = True
+
+        self.assertEqual(self.login().status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        self.assertEqual(self.connects, 2)
+        self.assertEqual(ldap_auth.breaker._failures, 1)
+
+    @override_settings(AUTH_LDAP_USER_ATTR_MAP={'first_name': 'givenName', 'email': 'userPrincipalName'})
+    def test_attribute_map_comes_from_settings(self):
+        self.directory.update_user('jperez', userPrincipalName='juan.perez@example.com')
+
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+        user = User.objects.get(username='jperez')
+        self.assertEqual((user.first_name, user.last_name, user.email), ('Juan', '', 'juan.perez@example.com'))
+
+    def test_unexpected_error_in_half_open_trial_releases_the_breaker(self):
+        self.down = True
+        for _ in range(3):
+            self.login()
+        self.down = False
+        self.addCleanup(setattr, ldap_auth.breaker, 'reset_timeout', ldap_auth.breaker.reset_timeout)
+        ldap_auth.breaker.reset_timeout = 0
+        backend = ldap_auth.PooledLDAPBackend()
+
+        with patch.object(ldap_auth.PooledLDAPBackend, '_verify', side_effect=LDAPInvalidFilterError('bad filter')):
+            with self.assertRaises(LDAPInvalidFilterError):
+                backend.authenticate(None, username='jperez', password='s3cret')
+
+        # The next call is a new trial instead of being refused forever
+        self.assertIsNotNone(backend.authenticate(None, username='jperez', password='s3cret'))
+        self.assertEqual(ldap_auth.breaker.state, 'closed')
+
+    def test_local_accounts_still_log_in_when_directory_is_down(self):
+        User.objects.create_user(username='admin.local', password='localpass')
+        self.down = True
+        response = self.login(username='admin.local', password='localpass')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+@override_settings(
+    AUTHENTICATION_BACKENDS=['api.ldap_auth.PooledLDAPBackend', 'django.contrib.auth.backends.ModelBackend'],
+    AUTH_LDAP_USER_SEARCH_BASE=DIRECTORY.base,
+    AUTH_LDAP_USER_SEARCH_FILTER='(sAMAccountName=%(user)s)',
+    AUTH_LDAP_BIND_DN=DIRECTORY.bind_dn,
+    AUTH_LDAP_BIND_PASSWORD=BIND_PASSWORD,
+    AUTH_LDAP_FINGERPRINT_MAX_AGE=3600,
+)
+class LoginFingerprintTestCase(TestCase):
+    """Unchanged directory attributes skip the user update and group mirror"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.directory = FakeDirectory()
+        self.directory.add_user('jperez', email='jperez@example.com', first_name='Juan',
+                                groups=['Gerentes_RH'], password='s3cret')
+        ldap_auth.set_pool(ldap_auth.LDAPConnectionPool(self.directory.connect, size=1, timeout=1))
+        ldap_auth.breaker.reset()
+        ldap_auth.metrics.reset()
+        self.addCleanup(ldap_auth.set_pool, None)
+
+    def login(self):
+        self.client.cookies.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/auth/login/', {'username': 'jperez', 'password': 's3cret'},
+                                        format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [query['sql'] for query in queries]
+
+    def reconnect(self):
+        # The fake directory only picks up changes on a new connection
+        ldap_auth.set_pool(ldap_auth.LDAPConnectionPool(self.directory.connect, size=1, timeout=1))
+
+    def test_repeated_login_skips_profile_and_group_writes(self):
+        self.login()
+        queries = self.login()
+
+        writes = [sql for sql in queries if not sql.startswith(('SELECT', 'SAVEPOINT', 'RELEASE'))]
+        # Only login() bookkeeping is left: last_login and the session
+        self.assertFalse([sql for sql in writes if 'auth_group' in sql or 'api_ldapuserstate' in sql])
+        self.assertFalse([sql for sql in writes if sql.startswith('UPDATE "auth_user"') and 'last_login' not in sql])
+        # No group diff either
+        self.assertFalse([sql for sql in queries if '"auth_group"."name" IN' in sql])
+        self.assertEqual(ldap_auth.metrics.snapshot()['outcomes']['writes_skipped'], 1)
+
+    def test_changed_attributes_are_applied(self):
+        self.login()
+        self.directory.update_user('jperez', givenName='Juanito',
+                                   memberOf=self.directory.group_dns(['Gerentes_Proyecto']))
+        self.reconnect()
+
+        self.login()
+
+        user = User.objects.get(username='jperez')
+        self.assertEqual(user.first_name, 'Juanito')
+        self.assertEqual(list(user.groups.values_list('name', flat=True)), ['Gerentes_Proyecto'])
+        self.assertEqual(ldap_auth.metrics.snapshot()['outcomes']['writes_skipped'], 0)
+
+    def test_stale_fingerprint_is_refreshed(self):
+        self.login()
+        user = User.objects.get(username='jperez')
+        user.groups.clear()
+        LDAPUserState.objects.update(synced_at=timezone.now() - timedelta(hours=2))
+
+        self.login()
+
+        self.assertEqual(list(user.groups.values_list('name', flat=True)), ['Gerentes_RH'])
+        self.assertGreater(LDAPUserState.objects.get().synced_at, timezone.now() - timedelta(minutes=1))
+
+    @override_settings(AUTH_LDAP_FINGERPRINT_MAX_AGE=0)
+    def test_zero_max_age_always_rewrites(self):
+        self.login()
+        self.login()
+        self.assertEqual(ldap_auth.metrics.snapshot()['outcomes']['writes_skipped'], 0)
+
+    def test_attribute_map_change_invalidates_fingerprint(self):
+        attributes = {'mail': 'jperez@example.com', 'userPrincipalName': 'juan.perez@example.com'}
+        before = ldap_auth.attributes_fingerprint(attributes)
+        with override_settings(AUTH_LDAP_USER_ATTR_MAP={'email': 'userPrincipalName'}):
+            self.assertNotEqual(ldap_auth.attributes_fingerprint(attributes), before)
+
+    def test_group_membership_change_invalidates_fingerprint(self):
+        before = ldap_auth.attributes_fingerprint({'memberOf': ['CN=Gerentes_RH,DC=x']})
+        after = ldap_auth.attributes_fingerprint({'memberOf': ['CN=Gerentes_RH,DC=x', 'CN=Staff,DC=x']})
+        self.assertNotEqual(after, before)
+
+
+class LDAPConnectionPoolTestCase(TestCase):
+
+    class FakeConnection:
+        closed = False
+
+        def unbind(self):
+            self.closed = True
+
+    def test_pool_is_bounded(self):
+        pool = ldap_auth.LDAPConnectionPool(self.FakeConnection, size=1, timeout=0.05)
+        with pool.connection():
+            with self.assertRaises(ldap_auth.DirectoryUnavailable):
+                with pool.connection():
+                    pass
+
+    def test_waiting_caller_gets_released_connection(self):
+        pool = ldap_auth.LDAPConnectionPool(self.FakeConnection, size=1, timeout=2)
+        got = []
+        with pool.connection() as first:
+            waiter = threading.Thread(target=lambda: got.append(pool.connection().__enter__()))
+            waiter.start()
+        waiter.join()
+        self.assertIs(got[0], first)
+
+    def test_idle_connections_expire(self):
+        pool = ldap_auth.LDAPConnectionPool(self.FakeConnection, size=1, timeout=0.05, max_idle=0.01)
+        with pool.connection() as first:
+            pass
+        time.sleep(0.02)
+        with pool.connection() as second:
+            self.assertIsNot(second, first)
+        self.assertTrue(first.closed)
+        with pool.connection() as third:
+            self.assertIs(third, second)
+
+    def test_failure_on_reused_connection_is_stale(self):
+        pool = ldap_auth.LDAPConnectionPool(self.FakeConnection, size=1, timeout=0.05)
+        with self.assertRaises(LDAPSocketOpenError):
+            with pool.connection():
+                raise LDAPSocketOpenError()
+        with pool.connection() as first:
+            pass
+        with self.assertRaises(ldap_auth.StaleConnection):
+            with pool.connection() as conn:
+                raise LDAPSocketOpenError()
+        self.assertTrue(conn.closed)
+        with pool.connection(fresh=True) as conn:
+            self.assertIsNot(conn, first)
+
+    def test_failed_connection_is_discarded(self):
+        pool = ldap_auth.LDAPConnectionPool(self.FakeConnection, size=1, timeout=0.05)
+        with self.assertRaises(RuntimeError):
+            with pool.connection() as conn:
+                raise RuntimeError()
+        self.assertTrue(conn.closed)
+        with pool.connection() as fresh:
+            self.assertIsNot(fresh, conn)
@@ -0,0 +1,139 @@
+"""
+Tests for the diff-based AD group membership sync (api/ldap_sync.py).
+"""
+from io import StringIO
+from unittest.mock import patch
+import os
+
+from django.contrib.auth.models import User, Group
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from api import roles
+from api.ldap_fake import FakeDirectory
+from api.ldap_sync import sync_group_memberships, sync_user_relations
+
+BASE = 'OU=Groups,DC=example,DC=com'
+
+
+def member_of(*names):
+    return [f'CN={name},{BASE}' for name in names]
+
+
+class SyncUserRelationsTestCase(TestCase):
+    """sync_user_relations for a single user"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser')
+
+    def group_names(self):
+        return set(self.user.groups.values_list('name', flat=True))
+
+    def test_creates_and_maps_groups(self):
+        sync_user_relations(self.user, {'memberOf': member_of('Gerentes_RH', 'Comunicaciones', 'Custom_Team')})
+        self.assertEqual(self.group_names(), {'HR_Managers', 'Communications', 'Custom_Team'})
+
+    def test_removes_groups_not_in_directory(self):
+        old = Group.objects.create(name='Old_Group')
+        self.user.groups.add(old)
+        sync_user_relations(self.user, {'memberOf': member_of('HR_Managers')})
+        self.assertEqual(self.group_names(), {'HR_Managers'})
+        self.assertTrue(Group.objects.filter(name='Old_Group').exists())
+
+    def test_unchanged_membership_does_not_write(self):
+        sync_user_relations(self.user, {'memberOf': member_of('HR_Managers', 'Gerentes_Proyecto')})
+        # SELECT target groups + SELECT current memberships
+        with self.assertNumQueries(2):
+            sync_user_relations(self.user, {'memberOf': member_of('HR_Managers', 'Project_Managers')})
+
+    def test_queries_do_not_grow_with_group_count(self):
+        Group.objects.bulk_create([Group(name=f'Team_{i}') for i in range(30)])
+        with self.assertNumQueries(4):
+            # SELECT groups, SELECT memberships, add(): SELECT existing + INSERT
+            sync_user_relations(self.user, {'memberOf': member_of(*[f'Team_{i}' for i in range(30)])})
+        self.assertEqual(self.user.groups.count(), 30)
+
+    def test_invalidates_role_cache(self):
+        self.assertFalse(roles.has_role(User.objects.get(pk=self.user.pk), ['HR_Managers']))
+        sync_user_relations(self.user, {'memberOf': member_of('Gerentes_RH')})
+        self.assertTrue(roles.has_role(User.objects.get(pk=self.user.pk), ['HR_Managers']))
+
+    @override_settings(AUTH_LDAP_GROUP_MAPPING={'Recursos_Humanos': 'HR_Managers'})
+    def test_mapping_comes_from_settings(self):
+        sync_user_relations(self.user, {'memberOf': member_of('Recursos_Humanos', 'Gerentes_RH')})
+        self.assertEqual(self.group_names(), {'HR_Managers', 'Gerentes_RH'})
+
+
+class SyncGroupMembershipsTestCase(TestCase):
+    """Batch variant used by sync_ldap_users --sync-groups"""
+
+    def setUp(self):
+        User.objects.bulk_create([User(username=f'user{i}') for i in range(200)])
+        self.users = list(User.objects.order_by('id'))
+
+    def test_batch_sync_adds_and_removes(self):
+        stale = Group.objects.create(name='Stale')
+        self.users[0].groups.add(stale)
+        memberships = {user.pk: member_of('Gerentes_RH', f'Team_{user.pk % 3}') for user in self.users}
+
+        stats = sync_group_memberships(memberships)
+
+        self.assertEqual(stats['groups_added'], 400)
+        self.assertEqual(stats['groups_removed'], 1)
+        self.assertEqual(set(self.users[0].groups.values_list('name', flat=True)),
+                         {'HR_Managers', f'Team_{self.users[0].pk % 3}'})
+        self.assertEqual(Group.objects.get(name='HR_Managers').user_set.count(), 200)
+
+    def test_batch_sync_query_count_is_constant(self):
+        memberships = {user.pk: member_of('Gerentes_RH', 'Team_A') for user in self.users}
+        sync_group_memberships(memberships)
+        # Nothing changed: SELECT groups + SELECT memberships
+        with self.assertNumQueries(2):
+            stats = sync_group_memberships(memberships)
+        self.assertEqual(stats['users_changed'], 0)
+
+    def test_dry_run_writes_nothing(self):
+        stats = sync_group_memberships({self.users[0].pk: member_of('Brand_New')}, dry_run=True)
+        self.assertEqual(stats['users_changed'], 1)
+        self.assertFalse(Group.objects.filter(name='Brand_New').exists())
+
+
+@patch.dict(os.environ, {
+    'AUTH_LDAP_SERVER_URI': 'ldap://fake-ad',
+    'AUTH_LDAP_USER_SEARCH_BASE': 'DC=example,DC=com',
+    'AUTH_LDAP_SYNC_FILTER': '(&(objectClass=user)(sAMAccountName=*))',
+})
+class SyncLDAPUsersGroupsTestCase(TestCase):
+    """sync_ldap_users --sync-groups"""
+
+    def setUp(self):
+        self.directory = FakeDirectory()
+        for i in range(300):
+            self.directory.add_user(f'user{i:03d}', groups=['Gerentes_RH'] if i % 10 == 0 else ['Staff'])
+        connection_patch = patch('api.management.commands.sync_ldap_users.Connection', self.directory.connect)
+        connection_patch.start()
+        self.addCleanup(connection_patch.stop)
+
+    def sync(self, *args):
+        out = StringIO()
+        call_command('sync_ldap_users', '--sync-groups', '--page-size', '100', *args, stdout=out)
+        return out.getvalue()
+
+    def test_sync_groups_for_new_and_existing_users(self):
+        output = self.sync()
+
+        self.assertIn('Group memberships: 300 added, 0 removed', output)
+        # AD group CNs, not AUTH_LDAP_GROUP_MAPPING
+        self.assertEqual(Group.objects.get(name='Gerentes_RH').user_set.count(), 30)
+        self.assertEqual(Group.objects.get(name='Staff').user_set.count(), 270)
+        self.assertFalse(Group.objects.filter(name='HR_Managers').exists())
+
+        self.directory.update_user('user001', memberOf=self.directory.group_dns(['Gerentes_RH']))
+        output = self.sync()
+
+        self.assertIn('Group memberships: 1 added, 1 removed (1 users changed)', output)
+        self.assertTrue(User.objects.get(username='user001').groups.filter(name='Gerentes_RH').exists())
+
+    def test_groups_not_synced_without_flag(self):
+        call_command('sync_ldap_users', stdout=StringIO())
+        self.assertFalse(Group.objects.exists())
@@ -0,0 +1,116 @@
+"""
+Tests for the protected library document download endpoint.
+"""
+import shutil
+import tempfile
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User, Group
+from rest_framework.test import APIClient
+from rest_framework import status
+from api.models import LibraryDocument
+from api.downloads import parse_range
+
+CONTENT = b'0123456789' * 1000
+
+
+class ParseRangeTest(TestCase):
+    """Test cases for Range header parsing"""
+
+    def test_ranges(self):
+        self.assertEqual(parse_range('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(parse_range('bytes=900-', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=-100', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=0-5000', 1000), (0, 999))
+        self.assertIsNone(parse_range(None, 1000))
+        self.assertIsNone(parse_range('bytes=0-1,5-6', 1000))
+        with self.assertRaises(ValueError):
+            parse_range('bytes=1000-', 1000)
+
+
+@override_settings(COUNTER_FLUSH_INTERVAL=0)
+class LibraryDocumentDownloadTest(TestCase):
+    """Test cases for /api/library-documents/<id>/download/"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="downloader")
+        self.client.force_authenticate(user=self.user)
+        self.document = LibraryDocument.objects.create(
+            title="Manual", code="DL-001", author=self.user, status="published",
+            file=SimpleUploadedFile('manual.pdf', CONTENT, content_type='application/pdf')
+        )
+        self.url = f'/api/library-documents/{self.document.id}/download/'
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def download_count(self):
+        self.document.refresh_from_db()
+        return self.document.download_count
+
+    def test_full_download(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+        self.assertEqual(response['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('attachment', response['Content-Disposition'])
+        self.assertTrue(response['ETag'])
+        self.assertEqual(self.download_count(), 1)
+
+    def test_range_request(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT[10:20])
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(CONTENT)}')
+        # Resumed transfers are not counted again
+        self.assertEqual(self.download_count(), 0)
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(CONTENT)}-')
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+
+    def test_if_none_match_returns_304(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(self.download_count(), 1)
+
+    def test_if_range_mismatch_sends_full_file(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_acl_is_enforced(self):
+        self.document.groups.add(Group.objects.create(name='Restricted'))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_document_without_file(self):
+        document = LibraryDocument.objects.create(title="Sin archivo", code="DL-002", author=self.user)
+        response = self.client.get(f'/api/library-documents/{document.id}/download/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(LIBRARY_DOWNLOAD_ACCEL='nginx', LIBRARY_DOWNLOAD_ACCEL_PREFIX='/protected-media/')
+    def test_x_accel_redirect(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.document.file.name}')
+        self.assertEqual(response.content, b'')
+        self.assertEqual(self.download_count(), 1)
+
+    @override_settings(LIBRARY_DOWNLOAD_ACCEL='nginx', LIBRARY_DOWNLOAD_ACCEL_PREFIX='/protected-media/')
+    def test_x_accel_redirect_counts_only_the_first_byte(self):
+        self.client.get(self.url, HTTP_RANGE='bytes=0-9')
+        self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.client.get(self.url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(self.download_count(), 1)
+        # A stale If-Range means the proxy sends the whole file
+        self.client.get(self.url, HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(self.download_count(), 2)
@@ -0,0 +1,128 @@
+"""
+Tests for the document library full-text search (?q=).
+"""
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User, Group
+from rest_framework.test import APIClient
+from rest_framework import status
+from api.models import LibraryDocument
+from api.search import fold_text, get_backend, parse_query, prefix_stems, stem, tokenize
+
+
+class SearchNormalizationTest(TestCase):
+    """Test cases for text folding and stemming"""
+
+    def test_fold_text_removes_accents(self):
+        self.assertEqual(fold_text('Políticas de Gestión'), 'politicas de gestion')
+
+    def test_stemming_groups_word_forms(self):
+        self.assertEqual(tokenize('procedimientos'), tokenize('procedimiento'))
+        self.assertEqual(tokenize('políticas'), tokenize('politica'))
+        self.assertEqual(tokenize('seguridad'), tokenize('Seguridad'))
+
+    def test_partial_words_reach_the_stem_of_the_whole_word(self):
+        for word in ('seguridad', 'procedimiento', 'politicas', 'financiero'):
+            for length in range(3, len(word) + 1):
+                prefix = word[:length]
+                self.assertTrue(stem(word).startswith(prefix) or stem(word) in prefix_stems(prefix), prefix)
+
+    def test_parse_query(self):
+        terms, prefix, stems = parse_query('Procedimientos segúrida')
+        self.assertEqual(terms, ['proced'])
+        self.assertEqual(prefix, 'segurida')
+        self.assertIn('segur', stems)
+        self.assertEqual(parse_query('  '), ([], None, []))
+
+
+class LibraryFullTextSearchTest(TestCase):
+    """Test cases for ?q= search on library documents"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="searcher", password="testpass123")
+        self.client.force_authenticate(user=self.user)
+
+        self.doc_title = LibraryDocument.objects.create(
+            title="Manual de Procedimientos de Seguridad",
+            code="DOC-SEARCH-001",
+            content="Contenido general",
+            author=self.user,
+            status="published"
+        )
+        self.doc_content = LibraryDocument.objects.create(
+            title="Guía de Usuario",
+            code="DOC-SEARCH-002",
+            content="Este documento menciona la seguridad una sola vez",
+            author=self.user,
+            status="published"
+        )
+        self.doc_other = LibraryDocument.objects.create(
+            title="Reporte Financiero",
+            code="DOC-SEARCH-003",
+            content="Balances y estados",
+            author=self.user,
+            status="published"
+        )
+
+    def search_codes(self, query):
+        response = self.client.get('/api/library-documents/', {'q': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [doc['code'] for doc in response.data['results']]
+
+    def test_title_match_ranks_first(self):
+        """A title match outranks a match in the content"""
+        codes = self.search_codes('seguridad')
+        self.assertEqual(codes, ['DOC-SEARCH-001', 'DOC-SEARCH-002'])
+
+    def test_search_is_accent_and_stem_insensitive(self):
+        codes = self.search_codes('procedimiento segúridad')
+        self.assertEqual(codes, ['DOC-SEARCH-001'])
+
+    def test_prefix_match_for_partial_terms(self):
+        codes = self.search_codes('financ')
+        self.assertEqual(codes, ['DOC-SEARCH-003'])
+
+    def test_prefix_match_when_the_stem_is_shorter_than_the_prefix(self):
+        self.assertEqual(self.search_codes('segurida'), ['DOC-SEARCH-001', 'DOC-SEARCH-002'])
+        self.assertEqual(self.search_codes('manual procedimien'), ['DOC-SEARCH-001'])
+        self.assertEqual(self.search_codes('financier'), ['DOC-SEARCH-003'])
+
+    def test_no_results(self):
+        self.assertEqual(self.search_codes('inexistente'), [])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.doc_other.title = "Reporte de Auditoría"
+        self.doc_other.save()
+        self.assertEqual(self.search_codes('auditoria'), ['DOC-SEARCH-003'])
+        self.assertEqual(self.search_codes('financiero'), [])
+
+        self.doc_other.delete()
+        self.assertEqual(self.search_codes('auditoria'), [])
+
+    def test_search_respects_group_acl(self):
+        restricted = Group.objects.create(name='Restricted')
+        self.doc_other.groups.add(restricted)
+        self.assertEqual(self.search_codes('financiero'), [])
+
+        self.user.groups.add(restricted)
+        self.assertEqual(self.search_codes('financiero'), ['DOC-SEARCH-003'])
+
+    @override_settings(LIBRARY_SEARCH_MAX_RESULTS=2)
+    def test_result_limit_applies_after_the_acl(self):
+        restricted = Group.objects.create(name='Restricted')
+        for i in range(3):
+            LibraryDocument.objects.create(
+                title=f"Seguridad restringida {i}", code=f"DOC-HIDDEN-{i}", author=self.user, status="published",
+            ).groups.add(restricted)
+        # The hidden documents rank first (title matches) but must not use up the limit
+        self.assertEqual(self.search_codes('seguridad'), ['DOC-SEARCH-001', 'DOC-SEARCH-002'])
+
+    def test_explicit_ordering_overrides_rank(self):
+        response = self.client.get('/api/library-documents/', {'q': 'seguridad', 'ordering': '-code'})
+        codes = [doc['code'] for doc in response.data['results']]
+        self.assertEqual(codes, ['DOC-SEARCH-002', 'DOC-SEARCH-001'])
+
+    @override_settings(LIBRARY_SEARCH_BACKEND='database')
+    def test_database_fallback_backend(self):
+        self.assertEqual(get_backend().name, 'database')
+        self.assertEqual(self.search_codes('Financiero'), ['DOC-SEARCH-003'])
@@ -0,0 +1,92 @@
+"""
+Tests for the maintained LibraryDocument.is_public flag and visible_to() queries.
+"""
+from django.test import TestCase
+from django.contrib.auth.models import User, Group
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from api.models import LibraryDocument
+
+
+class LibraryDocumentVisibilityTest(TestCase):
+    """Test cases for is_public maintenance through m2m_changed"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="testpass123")
+        self.group_hr = Group.objects.create(name='HR_Managers')
+        self.group_it = Group.objects.create(name='IT_Department')
+        self.document = LibraryDocument.objects.create(
+            title="Documento",
+            code="DOC-VIS-001",
+            author=self.user,
+            status="published"
+        )
+
+    def assertPublic(self, expected):
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.is_public, expected)
+
+    def test_new_document_is_public(self):
+        self.assertPublic(True)
+
+    def test_adding_and_removing_groups(self):
+        self.document.groups.add(self.group_hr, self.group_it)
+        self.assertFalse(self.document.is_public)
+        self.assertPublic(False)
+
+        self.document.groups.remove(self.group_hr)
+        self.assertPublic(False)
+
+        self.document.groups.remove(self.group_it)
+        self.assertTrue(self.document.is_public)
+        self.assertPublic(True)
+
+    def test_set_and_clear(self):
+        self.document.groups.set([self.group_hr])
+        self.assertPublic(False)
+        self.document.groups.clear()
+        self.assertPublic(True)
+
+    def test_reverse_side_changes(self):
+        self.group_hr.library_documents.add(self.document)
+        self.assertPublic(False)
+        self.group_hr.library_documents.clear()
+        self.assertPublic(True)
+
+    def test_deleting_last_group_makes_document_public(self):
+        self.document.groups.add(self.group_hr)
+        self.group_hr.delete()
+        self.assertPublic(True)
+
+    def test_acl_changes_do_not_touch_updated_at(self):
+        updated_at = self.document.updated_at
+        self.document.groups.add(self.group_hr)
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.updated_at, updated_at)
+
+
+class VisibleToQueryTest(TestCase):
+    """Test cases for LibraryDocument.objects.visible_to()"""
+
+    def setUp(self):
+        self.group = Group.objects.create(name='Restricted')
+        self.member = User.objects.create_user(username="member")
+        self.member.groups.add(self.group)
+        self.outsider = User.objects.create_user(username="outsider")
+        self.public = LibraryDocument.objects.create(title="Public", code="VIS-PUB", author=self.member)
+        self.restricted = LibraryDocument.objects.create(title="Restricted", code="VIS-RES", author=self.member)
+        self.restricted.groups.add(self.group)
+
+    def test_member_and_outsider(self):
+        self.assertEqual(
+            set(LibraryDocument.objects.visible_to(self.member)), {self.public, self.restricted}
+        )
+        self.assertEqual(list(LibraryDocument.objects.visible_to(self.outsider)), [self.public])
+
+    def test_query_has_no_group_by_or_distinct(self):
+        with CaptureQueriesContext(connection) as ctx:
+            LibraryDocument.objects.visible_to(self.member).count()
+        self.assertEqual(len(ctx.captured_queries), 1)
+        sql = ctx.captured_queries[0]['sql'].upper()
+        self.assertNotIn('GROUP BY', sql)
+        self.assertNotIn('DISTINCT', sql)
@@ -0,0 +1,98 @@
+"""
+Tests for page-number (with optional count) and keyset pagination.
+"""
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from rest_framework import status
+from api.models import LibraryDocument, ForumCategory, ForumPost
+
+
+class PaginationTest(TestCase):
+    """Test cases for api.pagination"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="pager")
+        self.client.force_authenticate(user=self.user)
+        now = timezone.now()
+        documents = LibraryDocument.objects.bulk_create([
+            LibraryDocument(title=f"Doc {i}", code=f"PG-{i:03d}", author=self.user)
+            for i in range(25)
+        ])
+        # Two documents share a timestamp to exercise the id tiebreaker
+        for i, document in enumerate(documents):
+            LibraryDocument.objects.filter(pk=document.pk).update(created_at=now - timedelta(minutes=min(i, 20)))
+        self.expected = list(LibraryDocument.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        return ids, response
+
+    def test_page_number_is_default(self):
+        response = self.client.get('/api/library-documents/')
+        self.assertEqual(response.data['count'], 25)
+        self.assertIn('page=2', response.data['next'])
+
+    def test_page_size_and_skip_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/library-documents/', {'page_size': 20, 'count': 'false'})
+        self.assertIsNone(response.data['count'])
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertIsNotNone(response.data['next'])
+        self.assertFalse(any('COUNT(' in q['sql'] for q in queries))
+        response = self.client.get('/api/library-documents/', {'page_size': 20, 'count': 'false', 'page': 2})
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertIsNone(response.data['next'])
+
+    def test_keyset_walk_forward_matches_ordering(self):
+        ids, last = self.walk('/api/library-documents/?cursor=&page_size=7')
+        self.assertEqual(ids, self.expected)
+        self.assertEqual(last.data['count'], 25)
+
+    def test_keyset_previous_link(self):
+        first = self.client.get('/api/library-documents/', {'cursor': '', 'page_size': 10})
+        self.assertIsNone(first.data['previous'])
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual([r['id'] for r in back.data['results']], self.expected[:10])
+        self.assertIsNotNone(back.data['next'])
+
+    def test_keyset_without_count_uses_no_offset(self):
+        first = self.client.get('/api/library-documents/', {'cursor': '', 'count': 'false'})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(first.data['next'])
+        self.assertIsNone(response.data['count'])
+        sql = ' '.join(q['sql'] for q in queries)
+        self.assertNotIn('OFFSET', sql)
+        self.assertNotIn('COUNT(', sql)
+        self.assertEqual([r['id'] for r in response.data['results']], self.expected[10:20])
+
+    def test_keyset_follows_requested_ordering(self):
+        ids, _ = self.walk('/api/library-documents/?cursor=&ordering=title&page_size=8')
+        self.assertEqual(ids, list(LibraryDocument.objects.order_by('title', 'id').values_list('id', flat=True)))
+
+    def test_keyset_on_multi_column_ordering(self):
+        category = ForumCategory.objects.create(name="General")
+        posts = [
+            ForumPost.objects.create(category=category, title=f"P{i}", content="...", author=self.user, is_pinned=i % 3 == 0)
+            for i in range(12)
+        ]
+        ids, _ = self.walk('/api/forum-posts/?cursor=&page_size=5')
+        expected = list(ForumPost.objects.order_by('-is_pinned', '-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+        self.assertEqual(len(ids), len(posts))
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/library-documents/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
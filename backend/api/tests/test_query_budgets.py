@@ -0,0 +1,236 @@
+"""
+Query budgets for every router-registered list endpoint: listing 50 rows must
+run the same queries as listing 1 (no per-row lookups), within the budget
+declared below. A new viewset fails test_every_viewset_has_a_budget until it
+gets a seeder and a budget here.
+"""
+from datetime import timedelta
+
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.models import (
+    Department, LibraryDocument, Policy, PolicyDistribution, TrainingPlan, TrainingProvider,
+    TrainingQuotation, TrainingSession, TrainingAttendance,
+    InternalVacancy, VacancyApplication, VacancyTransition,
+    ForumCategory, ForumPost,
+)
+from api.tests.query_budget import QueryBudgetMixin, query_shape, repeated_shapes
+from api.urls import router
+
+# Router basename -> maximum queries for one list page: the rows and the page
+# COUNT (or the keyset probe), plus prefetches (document groups) and lookups
+# for the whole page (forum likes). The request user is authenticated with
+# force_authenticate, so no token or session queries are included.
+BUDGETS = {
+    'department': 2,
+    'library-document': 3,
+    'policy': 2,
+    'policy-distribution': 2,
+    'training-plan': 2,
+    'training-provider': 2,
+    'training-quotation': 2,
+    'training-session': 2,
+    'training-attendance': 2,
+    'internal-vacancy': 2,
+    'vacancy-application': 2,
+    'vacancy-transition': 2,
+    'forum-category': 2,
+    'forum-post': 3,
+}
+
+
+@override_settings(ROLE_CACHE_TTL=0)
+class ListEndpointQueryBudgetTest(QueryBudgetMixin, TestCase):
+    """Test cases for constant query counts on list endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.group = Group.objects.create(name='HR_Managers')
+        self.user = User.objects.create_user(username='manager', is_staff=True)
+        self.user.groups.add(self.group)
+        self.client.force_authenticate(user=self.user)
+        self.department = Department.objects.create(name='Sistemas')
+        self.sequence = 0
+
+    def next_id(self):
+        self.sequence += 1
+        return self.sequence
+
+    def create_user(self):
+        return User.objects.create_user(username=f'employee{self.next_id()}', first_name='Ana', last_name='López')
+
+    # Seeders: seed_<basename>(n) adds n rows listed by the endpoint, each with its related objects
+
+    def seed_department(self, n):
+        for _ in range(n):
+            Department.objects.create(name=f'Departamento {self.next_id()}')
+
+    def seed_library_document(self, n):
+        for _ in range(n):
+            document = LibraryDocument.objects.create(
+                title='Manual', code=f'DOC-{self.next_id()}', author=self.create_user(),
+                department=self.department, approver=self.user,
+            )
+            document.groups.add(self.group)
+
+    def create_policy(self):
+        return Policy.objects.create(
+            title='Política', code=f'POL-{self.next_id()}', description='...', content='...',
+            origin='audit', origin_justification='...', created_by=self.create_user(),
+            department=self.department, auditor_reviewer=self.user,
+        )
+
+    def seed_policy_distribution(self, n):
+        for _ in range(n):
+            PolicyDistribution.objects.create(
+                policy=self.create_policy(), recipient=self.create_user(), distributed_by=self.user
+            )
+
+    # One policy per distribution, so policies are listed with a distribution count
+    seed_policy = seed_policy_distribution
+
+    def create_plan(self):
+        return TrainingPlan.objects.create(
+            title=f'Plan {self.next_id()}', description='...', topics='...', origin='performance',
+            scope='interdepartamental', duration_hours=8, created_by=self.create_user(),
+            department=self.department, assigned_manager=self.user,
+        )
+
+    def create_provider(self):
+        return TrainingProvider.objects.create(name=f'Proveedor {self.next_id()}')
+
+    def create_quotation(self, plan=None, provider=None):
+        return TrainingQuotation.objects.create(
+            training_plan=plan or self.create_plan(), provider=provider or self.create_provider(),
+            temario='...', duration_hours=8, cost=100,
+        )
+
+    def create_session(self, plan=None):
+        start = timezone.now() + timedelta(days=1)
+        return TrainingSession.objects.create(
+            training_plan=plan or self.create_plan(), title=f'Sesión {self.next_id()}',
+            instructor_name='Instructor', provider=self.create_provider(), location='Sala 1',
+            start_datetime=start, end_datetime=start + timedelta(hours=2),
+        )
+
+    def seed_training_plan(self, n):
+        for _ in range(n):
+            plan = self.create_plan()
+            self.create_quotation(plan)
+            self.create_session(plan)
+
+    def seed_training_provider(self, n):
+        for _ in range(n):
+            self.create_quotation(provider=self.create_provider())
+
+    def seed_training_quotation(self, n):
+        for _ in range(n):
+            self.create_quotation()
+
+    def seed_training_session(self, n):
+        for _ in range(n):
+            session = self.create_session()
+            TrainingAttendance.objects.create(session=session, analyst=self.create_user(),
+                                              confirmation_status='confirmed')
+
+    def seed_training_attendance(self, n):
+        for _ in range(n):
+            TrainingAttendance.objects.create(session=self.create_session(), analyst=self.create_user(),
+                                              invited_by=self.user)
+
+    def create_vacancy(self):
+        return InternalVacancy.objects.create(
+            title=f'Analista {self.next_id()}', department=self.department, description='...',
+            responsibilities='...', technical_requirements='...', competencies='...',
+            experience_required='2 años', requested_by=self.create_user(), hr_manager=self.user,
+            authorization_justification='...',
+        )
+
+    def create_application(self, vacancy=None):
+        return VacancyApplication.objects.create(
+            vacancy=vacancy or self.create_vacancy(), applicant=self.create_user(), current_manager=self.user,
+        )
+
+    def seed_internal_vacancy(self, n):
+        for _ in range(n):
+            self.create_application(self.create_vacancy())
+
+    def seed_vacancy_application(self, n):
+        for _ in range(n):
+            self.create_application()
+
+    def seed_vacancy_transition(self, n):
+        for _ in range(n):
+            VacancyTransition.objects.create(
+                application=self.create_application(), previous_department=self.department,
+                new_department=self.department, previous_position='Analista', new_position='Jefe',
+                hr_coordinator=self.user,
+            )
+
+    def seed_forum_category(self, n):
+        for _ in range(n):
+            category = ForumCategory.objects.create(name=f'Categoría {self.next_id()}')
+            ForumPost.objects.create(category=category, title='Hola', content='...', author=self.create_user())
+
+    def seed_forum_post(self, n):
+        category = ForumCategory.objects.get_or_create(name='General')[0]
+        for _ in range(n):
+            post = ForumPost.objects.create(category=category, title='Hola', content='...',
+                                            author=self.create_user())
+            post.liked_by.add(self.user)
+
+    # Tests
+
+    def test_every_viewset_has_a_budget(self):
+        for prefix, viewset, basename in router.registry:
+            with self.subTest(basename=basename):
+                self.assertIn(basename, BUDGETS)
+                self.assertTrue(hasattr(self, 'seed_' + basename.replace('-', '_')))
+
+    def test_list_queries_do_not_grow_with_rows(self):
+        for prefix, viewset, basename in router.registry:
+            with self.subTest(basename=basename):
+                # Each endpoint starts from the rows created in setUp
+                savepoint = transaction.savepoint()
+                try:
+                    self.assertConstantQueries(
+                        f'/api/{prefix}/', getattr(self, 'seed_' + basename.replace('-', '_')),
+                        budget=BUDGETS[basename],
+                    )
+                finally:
+                    transaction.savepoint_rollback(savepoint)
+
+
+class QueryBudgetHelpersTest(QueryBudgetMixin, TestCase):
+    """Test cases for the query budget helpers themselves"""
+
+    def setUp(self):
+        self.users = [User.objects.create_user(username=f'user{i}') for i in range(5)]
+
+    def test_query_shape_ignores_literals(self):
+        self.assertEqual(
+            query_shape("SELECT * FROM t WHERE id = 12 AND name = 'O''Brien' AND pk IN (1, 2, 3)"),
+            'SELECT * FROM t WHERE id = ? AND name = ? AND pk IN (...)',
+        )
+        self.assertEqual(repeated_shapes(['SELECT 1', 'SELECT 2', 'SELECT 3'], max_repeats=2), {'SELECT ?': 3})
+
+    def test_per_row_queries_are_reported(self):
+        with self.assertRaisesRegex(AssertionError, 'Possible N\\+1'):
+            with self.assertNoRepeatedQueries():
+                for user in User.objects.all():
+                    list(user.groups.all())
+
+    def test_prefetched_rows_pass(self):
+        with self.assertNoRepeatedQueries():
+            for user in User.objects.prefetch_related('groups'):
+                list(user.groups.all())
+
+    def test_budget_is_enforced(self):
+        with self.assertRaisesRegex(AssertionError, '2 queries executed, budget is 1'):
+            with self.assertQueryBudget(1):
+                User.objects.count()
+                Group.objects.count()
@@ -0,0 +1,188 @@
+"""
+Tests for the response cache of read-mostly endpoints (api/caching.py).
+"""
+import threading
+import time
+
+from django.contrib.auth.models import Group, User
+from django.db.models.deletion import Collector
+from django.db.models.signals import post_delete
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api import caching
+from api.models import ForumCategory, ForumPost, LDAPUserState, LibraryDocument
+
+
+@override_settings(API_CACHE_TTL=300)
+class ResponseCacheTest(TestCase):
+    """Test cases for cached endpoints and their invalidation"""
+
+    def setUp(self):
+        caching.get_cache().clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='reader')
+        self.client.force_authenticate(user=self.user)
+        self.category = ForumCategory.objects.create(name='General')
+
+    def tearDown(self):
+        caching.get_cache().clear()
+
+    def get(self, url, user=None):
+        if user is not None:
+            self.client.force_authenticate(user=user)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_second_request_is_served_from_cache(self):
+        first = self.get('/api/forum-categories/active/')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            second = self.get('/api/forum-categories/active/')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.json(), first.json())
+
+    def test_query_params_are_part_of_the_key(self):
+        self.get('/api/forum-categories/active/')
+        response = self.get('/api/forum-categories/active/?fields=id,name')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(set(response.json()[0]), {'id', 'name'})
+
+    def test_save_and_delete_invalidate(self):
+        self.get('/api/forum-categories/active/')
+        self.category.name = 'Anuncios'
+        self.category.save()
+        response = self.get('/api/forum-categories/active/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()[0]['name'], 'Anuncios')
+
+        ForumPost.objects.create(category=self.category, title='Hola', content='...', author=self.user)
+        self.assertEqual(self.get('/api/forum-categories/active/').json()[0]['posts_count'], 1)
+
+        self.category.delete()
+        self.assertEqual(self.get('/api/forum-categories/active/').json(), [])
+
+    def test_login_does_not_invalidate(self):
+        self.get('/api/forum-categories/active/')
+        generation = caching.generations(['auth.User'])
+        self.user.save(update_fields=['last_login'])
+        self.assertEqual(caching.generations(['auth.User']), generation)
+        self.user.save()
+        self.assertNotEqual(caching.generations(['auth.User']), generation)
+
+    def test_group_sets_get_separate_entries(self):
+        hr = Group.objects.create(name='HR_Managers')
+        member = User.objects.create_user(username='member')
+        member.groups.add(hr)
+        colleague = User.objects.create_user(username='colleague')
+        colleague.groups.add(hr)
+        document = LibraryDocument.objects.create(title='Manual RH', code='DOC-RH', author=member,
+                                                  status='published')
+        document.groups.add(hr)
+
+        self.assertEqual([d['code'] for d in self.get('/api/library-documents/recent/', member).json()],
+                         ['DOC-RH'])
+        response = self.get('/api/library-documents/recent/', self.user)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json(), [])
+
+        # Same groups, same entry
+        response = self.get('/api/library-documents/recent/', colleague)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual([d['code'] for d in response.json()], ['DOC-RH'])
+
+    def test_relation_changes_invalidate(self):
+        hr = Group.objects.create(name='HR_Managers')
+        LibraryDocument.objects.create(title='Manual', code='DOC-1', author=self.user, status='published')
+        self.assertEqual(self.get('/api/metrics/documents-count/').json()['count'], 1)
+
+        hr.library_documents.add(LibraryDocument.objects.get())
+        self.assertEqual(self.get('/api/metrics/documents-count/').json()['count'], 0)
+        self.user.groups.add(hr)
+        self.assertEqual(self.get('/api/metrics/documents-count/').json()['count'], 1)
+
+    def test_bulk_writes_call_invalidate(self):
+        self.get('/api/forum-categories/active/')
+        ForumCategory.objects.update(name='Anuncios')
+        self.assertEqual(self.get('/api/forum-categories/active/').json()[0]['name'], 'General')
+        caching.invalidate(['api.ForumCategory'])
+        self.assertEqual(self.get('/api/forum-categories/active/').json()[0]['name'], 'Anuncios')
+
+    def test_errors_are_not_cached(self):
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get('/api/forum-categories/active/').status_code, 401)
+        self.assertEqual(self.get('/api/forum-categories/active/', self.user)['X-Cache'], 'MISS')
+
+    def test_unwatched_models_keep_fast_deletes(self):
+        self.assertTrue(post_delete.has_listeners(ForumCategory))
+        self.assertFalse(post_delete.has_listeners(LDAPUserState))
+        self.assertTrue(Collector(using='default').can_fast_delete(LDAPUserState.objects.all()))
+
+    @override_settings(API_CACHE_TTL=0)
+    def test_zero_ttl_disables_the_cache(self):
+        self.get('/api/forum-categories/active/')
+        response = self.get('/api/forum-categories/active/')
+        self.assertNotIn('X-Cache', response)
+
+
+class SingleFlightTest(TestCase):
+    """Test cases for caching.get_or_compute stampede protection"""
+
+    def setUp(self):
+        caching.get_cache().clear()
+
+    def tearDown(self):
+        caching.get_cache().clear()
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+        results = []
+        barrier = threading.Barrier(8)
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'value'
+
+        def worker():
+            barrier.wait()
+            results.append(caching.get_or_compute('test:stampede', compute, 60))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(results), [('value', False)] + [('value', True)] * 7)
+
+    def test_waiters_compute_when_owner_stores_nothing(self):
+        owner_started = threading.Event()
+        results = []
+
+        def failing():
+            owner_started.set()
+            time.sleep(0.1)
+            return 'error'
+
+        owner = threading.Thread(target=lambda: results.append(
+            caching.get_or_compute('test:uncacheable', failing, 60, cacheable=lambda value: value != 'error')
+        ))
+        owner.start()
+        owner_started.wait()
+        started = time.monotonic()
+        # Waits for the owner, sees it released the lock without a value and computes itself
+        self.assertEqual(caching.get_or_compute('test:uncacheable', lambda: 'fresh', 60), ('fresh', False))
+        owner.join()
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(results, [('error', False)])
+        self.assertEqual(caching.get_cache().get('test:uncacheable'), 'fresh')
+
+    @override_settings(API_CACHE_LOCK_TIMEOUT=0.1)
+    def test_lock_timeout_bounds_the_wait(self):
+        caching.get_cache().add('test:held:lock', 1, 60)
+        value, hit = caching.get_or_compute('test:held', lambda: 'fresh', 60)
+        self.assertEqual((value, hit), ('fresh', False))
+        self.assertEqual(caching.get_cache().get('test:held'), 'fresh')
@@ -0,0 +1,80 @@
+"""
+Tests for the role resolver used by the permission classes.
+"""
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User, Group
+from rest_framework.test import APIRequestFactory
+from rest_framework.request import Request
+from api import roles
+from api.permissions import IsDepartmentManager, IsHRManager, IsOwnerOrManager
+
+
+class _Obj:
+    author = None
+
+
+@override_settings(ROLE_CACHE_TTL=60)
+class RoleResolverTest(TestCase):
+    """Test cases for api.roles"""
+
+    def setUp(self):
+        roles.invalidate()
+        self.user = User.objects.create_user(username="manager")
+        self.hr = Group.objects.create(name='Gerentes_RH')
+        self.user.groups.add(self.hr)
+
+    def tearDown(self):
+        roles.invalidate()
+
+    def fresh_user(self):
+        # A new instance per request, as authentication returns
+        return User.objects.get(pk=self.user.pk)
+
+    def make_request(self, user):
+        request = Request(APIRequestFactory().post('/'))
+        request.user = user
+        return request
+
+    def test_composed_permissions_share_one_query(self):
+        request = self.make_request(self.fresh_user())
+        with self.assertNumQueries(1):
+            self.assertTrue((IsDepartmentManager | IsHRManager)().has_permission(request, None))
+            self.assertTrue(IsOwnerOrManager().has_object_permission(request, None, _Obj()))
+
+    def test_process_cache_is_reused_across_requests(self):
+        roles.get_group_names(self.fresh_user())
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertTrue(roles.has_role(user, ['HR_Managers', 'Gerentes_RH']))
+
+    def test_membership_change_invalidates(self):
+        user = self.fresh_user()
+        self.assertTrue(roles.has_role(user, ['Gerentes_RH']))
+        user.groups.remove(self.hr)
+        self.assertFalse(roles.has_role(user, ['Gerentes_RH']))
+        self.assertFalse(roles.has_role(self.fresh_user(), ['Gerentes_RH']))
+
+    def test_reverse_membership_change_invalidates(self):
+        roles.get_group_names(self.fresh_user())
+        managers = Group.objects.create(name='Gerentes_Departamento')
+        managers.user_set.add(self.user)
+        self.assertTrue(roles.has_role(self.fresh_user(), ['Gerentes_Departamento']))
+        managers.user_set.clear()
+        self.assertFalse(roles.has_role(self.fresh_user(), ['Gerentes_Departamento']))
+
+    def test_group_delete_invalidates(self):
+        roles.get_group_names(self.fresh_user())
+        self.hr.delete()
+        self.assertFalse(roles.has_role(self.fresh_user(), ['Gerentes_RH']))
+
+    @override_settings(ROLE_CACHE_TTL=0)
+    def test_cache_can_be_disabled(self):
+        roles.get_group_names(self.fresh_user())
+        user = self.fresh_user()
+        with self.assertNumQueries(1):
+            roles.get_group_names(user)
+
+    def test_anonymous_user_has_no_roles(self):
+        from django.contrib.auth.models import AnonymousUser
+        with self.assertNumQueries(0):
+            self.assertFalse(roles.has_role(AnonymousUser(), ['Gerentes_RH']))
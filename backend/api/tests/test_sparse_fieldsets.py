@@ -0,0 +1,57 @@
+"""
+Tests for sparse fieldsets (?fields= / ?omit=).
+"""
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from rest_framework import status
+from api.models import LibraryDocument, ForumCategory, ForumPost
+
+
+class SparseFieldsetTest(TestCase):
+    """Test cases for the dynamic field selection on API viewsets"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="reader", first_name="Ana")
+        self.client.force_authenticate(user=self.user)
+        self.document = LibraryDocument.objects.create(
+            title="Manual", code="SF-001", author=self.user, content="x" * 5000
+        )
+        category = ForumCategory.objects.create(name="General")
+        self.post = ForumPost.objects.create(category=category, title="Hola", content="...", author=self.user)
+
+    def test_fields_limits_the_response(self):
+        response = self.client.get('/api/library-documents/', {'fields': 'title,status,author_name'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        row = response.data['results'][0]
+        self.assertEqual(set(row), {'id', 'title', 'status', 'author_name'})
+        self.assertEqual(row['author_name'], 'Ana')
+
+    def test_omit_drops_fields(self):
+        response = self.client.get(f'/api/library-documents/{self.document.id}/', {'omit': 'content,description'})
+        self.assertNotIn('content', response.data)
+        self.assertNotIn('description', response.data)
+        self.assertIn('title', response.data)
+
+    def test_unselected_columns_are_deferred(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/library-documents/', {'fields': 'title,file_name'})
+        select = next(q['sql'] for q in queries if 'FROM "api_librarydocument"' in q['sql'] and 'LIMIT' in q['sql'])
+        self.assertNotIn('"api_librarydocument"."content"', select)
+        self.assertIn('"api_librarydocument"."file"', select)
+
+    def test_method_fields_are_not_computed_when_omitted(self):
+        with self.assertNumQueries(2):
+            # COUNT + page, no per-row group_names / replies / liked queries
+            self.client.get('/api/forum-posts/', {'fields': 'title,created_at'})
+
+    def test_writes_ignore_fieldsets(self):
+        response = self.client.patch(
+            f'/api/library-documents/{self.document.id}/?fields=title', {'version': '2.0'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['version'], '2.0')
+        self.assertIn('content', response.data)
@@ -5,12 +5,27 @@ This test module validates that the LDAP synchronization command correctly
 handles different LDAP filter configurations, especially the distinction between
 authentication filters (with %(user)s placeholder) and sync filters.
 """
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.core.management import call_command
 from django.core.management.base import CommandError
 from io import StringIO
 from unittest.mock import patch, MagicMock
+from rest_framework.authtoken.models import Token
+from collections import Counter
+from datetime import timedelta
 import os
+import threading
+
+from ldap3.core.exceptions import LDAPSocketOpenError
+
+from api import authentication
+from api.ldap_fake import FakeDirectory
+from api.ldap_sync import SyncSource, parse_sources
+from api.models import LDAPSyncState
 
 
 class SyncLDAPUsersFilterTestCase(TestCase):
@@ -186,3 +201,271 @@ class SyncLDAPUsersFilterTestCase(TestCase):
             call_command('sync_ldap_users', '--dry-run', stdout=out)
         
         self.assertIn('AUTH_LDAP_USER_SEARCH_BASE', str(cm.exception))
+
+
+FAKE_AD_ENV = {
+    'AUTH_LDAP_SERVER_URI': 'ldap://fake-ad',
+    'AUTH_LDAP_BIND_DN': 'CN=sync,CN=Users,DC=example,DC=com',
+    'AUTH_LDAP_BIND_PASSWORD': 'fake-password',
+    'AUTH_LDAP_USER_SEARCH_BASE': 'DC=example,DC=com',
+    'AUTH_LDAP_SYNC_FILTER': '(&(objectClass=user)(sAMAccountName=*))',
+}
+
+
+@patch.dict(os.environ, FAKE_AD_ENV)
+class SyncLDAPUsersPagedTestCase(TestCase):
+    """Paged search and batched writes against an in-process fake directory"""
+
+    def setUp(self):
+        self.directory = FakeDirectory()
+        self.directory.add_users(2500, disabled_every=100)
+        self.connection_patch = patch('api.management.commands.sync_ldap_users.Connection', self.directory.connect)
+        self.connection_patch.start()
+        self.addCleanup(self.connection_patch.stop)
+
+    def sync(self, *args):
+        out = StringIO()
+        call_command('sync_ldap_users', '--page-size', '500', *args, stdout=out)
+        return out.getvalue()
+
+    def test_initial_import_creates_all_users(self):
+        output = self.sync()
+
+        self.assertIn('Total found in LDAP: 2500', output)
+        self.assertIn('Created: 2500, Updated: 0, Skipped: 0', output)
+        self.assertIn('entries/sec', output)
+        self.assertEqual(User.objects.count(), 2500)
+        user = User.objects.get(username='user000007')
+        self.assertEqual(user.email, 'user000007@example.com')
+        self.assertEqual(user.first_name, 'Nombre7')
+        self.assertFalse(user.has_usable_password())
+        self.assertFalse(User.objects.get(username='user000100').is_active)
+        self.assertEqual(User.objects.filter(is_active=False).count(), 25)
+
+    def test_resync_updates_only_changed_users(self):
+        self.sync()
+        User.objects.filter(username='user000001').update(first_name='Stale')
+        User.objects.filter(username='user000100').update(is_active=True)
+
+        output = self.sync()
+
+        self.assertIn('Created: 0, Updated: 2, Skipped: 2498', output)
+        self.assertEqual(User.objects.get(username='user000001').first_name, 'Nombre1')
+        self.assertFalse(User.objects.get(username='user000100').is_active)
+
+    def test_queries_scale_with_pages_not_entries(self):
+        self.sync()
+        with CaptureQueriesContext(connection) as queries:
+            self.sync()
+        # One SELECT per 500-entry page, no writes for unchanged users,
+        # plus reading and saving the sync state
+        self.assertEqual(len(queries), 5 + 2)
+
+    def test_mark_inactive_deactivates_users_missing_from_directory(self):
+        gone = User.objects.create_user(username='left.company')
+        output = self.sync('--mark-inactive')
+
+        self.assertIn('Marked 1 users inactive', output)
+        gone.refresh_from_db()
+        self.assertFalse(gone.is_active)
+        self.assertTrue(User.objects.get(username='user000001').is_active)
+
+    def test_dry_run_writes_nothing(self):
+        output = self.sync('--dry-run')
+
+        self.assertIn('Created: 2500', output)
+        self.assertEqual(User.objects.count(), 0)
+
+    def test_resync_invalidates_cached_tokens_of_updated_users(self):
+        self.sync()
+        user = User.objects.get(username='user000100')
+        User.objects.filter(pk=user.pk).update(is_active=True)
+        token = Token.objects.create(user=user)
+        self.assertTrue(authentication.resolve_token(token.key)[1].is_active)
+
+        self.sync()
+
+        self.assertFalse(authentication.resolve_token(token.key)[1].is_active)
+
+
+@patch.dict(os.environ, FAKE_AD_ENV)
+class SyncLDAPUsersIncrementalTestCase(TestCase):
+    """--incremental fetches entries above the stored uSNChanged watermark"""
+
+    def setUp(self):
+        self.directory = FakeDirectory()
+        self.directory.add_users(50)
+        self.search_filters = []
+
+        def connect(*args, **kwargs):
+            conn = self.directory.connect()
+            search = conn.search
+
+            def recording_search(search_base, search_filter, *args, **kwargs):
+                self.search_filters.append(search_filter)
+                return search(search_base, search_filter, *args, **kwargs)
+            conn.search = recording_search
+            return conn
+
+        connection_patch = patch('api.management.commands.sync_ldap_users.Connection', connect)
+        connection_patch.start()
+        self.addCleanup(connection_patch.stop)
+
+    def sync(self, *args):
+        out = StringIO()
+        call_command('sync_ldap_users', *args, stdout=out)
+        return out.getvalue()
+
+    def state(self):
+        return LDAPSyncState.objects.get(server_uri='ldap://fake-ad', search_base='DC=example,DC=com')
+
+    def test_first_incremental_run_is_full_and_stores_watermark(self):
+        output = self.sync('--incremental')
+
+        self.assertIn('Full sync', output)
+        self.assertEqual(self.search_filters[-1], FAKE_AD_ENV['AUTH_LDAP_SYNC_FILTER'])
+        state = self.state()
+        self.assertEqual(state.highest_usn, self.directory.usn)
+        self.assertIsNotNone(state.last_full_sync_at)
+
+    def test_incremental_run_only_fetches_changed_entries(self):
+        self.sync('--incremental')
+        watermark = self.directory.usn
+        self.directory.update_user('user000003', givenName='Renamed')
+        self.directory.update_user('user000004', disabled=True)
+        self.directory.add_user('newcomer', email='newcomer@example.com')
+
+        output = self.sync('--incremental')
+
+        self.assertIn(f'uSNChanged > {watermark}', output)
+        self.assertIn(f'(uSNChanged>={watermark + 1})', self.search_filters[-1])
+        self.assertIn('Total found in LDAP: 3', output)
+        self.assertIn('Created: 1, Updated: 2, Skipped: 0', output)
+        self.assertEqual(User.objects.get(username='user000003').first_name, 'Renamed')
+        self.assertFalse(User.objects.get(username='user000004').is_active)
+        self.assertEqual(self.state().highest_usn, self.directory.usn)
+
+    def test_incremental_run_does_not_deactivate_unchanged_users(self):
+        self.sync('--incremental')
+        self.directory.update_user('user000001', mail='changed@example.com')
+
+        output = self.sync('--incremental', '--mark-inactive')
+
+        self.assertIn('Skipping --mark-inactive', output)
+        self.assertEqual(User.objects.filter(is_active=False).count(), 0)
+
+    def test_full_sync_runs_when_interval_elapsed(self):
+        self.sync('--incremental')
+        LDAPSyncState.objects.update(last_full_sync_at=timezone.now() - timedelta(hours=25))
+        self.directory.remove_user('user000010')
+
+        output = self.sync('--incremental', '--mark-inactive')
+
+        self.assertIn('Full sync', output)
+        self.assertIn('Marked 1 users inactive', output)
+        self.assertFalse(User.objects.get(username='user000010').is_active)
+        self.assertGreater(self.state().last_full_sync_at, timezone.now() - timedelta(minutes=1))
+
+    def test_full_flag_forces_full_sync(self):
+        self.sync('--incremental')
+        output = self.sync('--incremental', '--full')
+        self.assertIn('Full sync', output)
+        self.assertIn('Total found in LDAP: 50', output)
+
+    def test_dry_run_does_not_store_watermark(self):
+        self.sync('--incremental', '--dry-run')
+        self.assertFalse(LDAPSyncState.objects.exists())
+
+
+@patch.dict(os.environ, FAKE_AD_ENV)
+class SyncLDAPUsersMultiSourceTestCase(TestCase):
+    """Several search bases and servers read concurrently into one writer"""
+
+    def setUp(self):
+        self.main = FakeDirectory()
+        for i in range(120):
+            self.main.add_user(f'sales{i:03d}', ou='Sales')
+            self.main.add_user(f'ops{i:03d}', ou='Ops')
+        self.branch = FakeDirectory(base='DC=branch,DC=example,DC=com')
+        for i in range(80):
+            self.branch.add_user(f'branch{i:03d}')
+        # Also listed in the main directory
+        self.branch.add_user('sales000')
+        self.directories = {'ldap://fake-ad': self.main, 'ldap://fake-branch': self.branch}
+
+        self.lock = threading.Lock()
+        self.open_connections = Counter()
+        self.max_open_connections = Counter()
+        self.failing = set()
+
+        def connect(server_uri, **kwargs):
+            if server_uri in self.failing:
+                raise LDAPSocketOpenError('unable to open socket')
+            conn = self.directories[server_uri].connect()
+            with self.lock:
+                self.open_connections[server_uri] += 1
+                self.max_open_connections[server_uri] = max(
+                    self.max_open_connections[server_uri], self.open_connections[server_uri]
+                )
+            unbind = conn.unbind
+
+            def tracked_unbind():
+                with self.lock:
+                    self.open_connections[server_uri] -= 1
+                return unbind()
+            conn.unbind = tracked_unbind
+            return conn
+
+        for name, replacement in (('Server', lambda uri, **kwargs: uri), ('Connection', connect)):
+            patcher = patch(f'api.management.commands.sync_ldap_users.{name}', replacement)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def sync(self, *args):
+        out = StringIO()
+        call_command(
+            'sync_ldap_users', '--page-size', '50',
+            '--base', 'OU=Sales,DC=example,DC=com',
+            '--base', 'OU=Ops,DC=example,DC=com',
+            '--base', 'ldap://fake-branch|DC=branch,DC=example,DC=com',
+            *args, stdout=out,
+        )
+        return out.getvalue()
+
+    def test_merges_and_deduplicates_sources(self):
+        output = self.sync('--workers', '3')
+
+        self.assertIn('Total found in LDAP: 321', output)
+        self.assertIn('Created: 320', output)
+        self.assertIn('Duplicates across sources: 1', output)
+        self.assertEqual(User.objects.count(), 320)
+        self.assertIn('ldap://fake-ad OU=Sales,DC=example,DC=com: 120 entries in 3 pages', output)
+        self.assertIn('ldap://fake-branch DC=branch,DC=example,DC=com: 81 entries in 2 pages', output)
+        self.assertEqual(LDAPSyncState.objects.count(), 3)
+
+    def test_connections_per_server_are_bounded(self):
+        self.sync('--workers', '3', '--connections-per-server', '1')
+        self.assertEqual(self.max_open_connections['ldap://fake-ad'], 1)
+
+    def test_failed_source_skips_deactivation_and_fails_command(self):
+        self.sync()
+        self.failing.add('ldap://fake-branch')
+
+        with self.assertRaises(CommandError) as cm:
+            self.sync('--mark-inactive')
+
+        self.assertIn('1 of 3 sources', str(cm.exception))
+        self.assertTrue(User.objects.get(username='branch000').is_active)
+        self.assertEqual(User.objects.filter(is_active=False).count(), 0)
+
+    def test_all_sources_failing_is_a_connection_error(self):
+        self.failing.update(self.directories)
+        with self.assertRaises(CommandError) as cm:
+            self.sync()
+        self.assertIn('Failed to connect/bind', str(cm.exception))
+
+    def test_parse_sources(self):
+        self.assertEqual(
+            parse_sources(['OU=A,DC=x;ldap://dc2|OU=B,DC=x', 'OU=A,DC=x'], 'ldap://dc1'),
+            [SyncSource('ldap://dc1', 'OU=A,DC=x'), SyncSource('ldap://dc2', 'OU=B,DC=x')],
+        )
@@ -0,0 +1,87 @@
+"""
+Tests for the cached token authentication backend.
+"""
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework import status
+from api import authentication, roles
+
+
+@override_settings(AUTH_TOKEN_CACHE_TTL=60, ROLE_CACHE_TTL=60)
+class CachedTokenAuthenticationTest(TestCase):
+    """Test cases for api.authentication"""
+
+    def setUp(self):
+        authentication.cache.clear()
+        roles.invalidate()
+        self.user = User.objects.create_user(username="tokenuser", first_name="Ana")
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+
+    def tearDown(self):
+        authentication.cache.clear()
+        roles.invalidate()
+
+    def me(self):
+        return self.client.get('/api/auth/me/')
+
+    def test_cookie_authentication_is_cached(self):
+        self.client.cookies['auth_token'] = self.token.key
+        response = self.me()
+        self.assertTrue(response.data['authenticated'])
+        self.assertEqual(response.data['user']['username'], 'tokenuser')
+        with self.assertNumQueries(0):
+            response = self.me()
+        self.assertTrue(response.data['authenticated'])
+
+    def test_header_authentication_is_cached(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.me()
+        with self.assertNumQueries(0):
+            self.assertTrue(self.me().data['authenticated'])
+
+    def test_invalid_header_token_is_rejected(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+        self.assertEqual(self.me().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_invalid_cookie_is_anonymous(self):
+        self.client.cookies['auth_token'] = 'stale'
+        response = self.me()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['authenticated'])
+
+    def test_logout_invalidates_token(self):
+        self.client.cookies['auth_token'] = self.token.key
+        self.me()
+        self.client.post('/api/auth/logout/')
+        self.client.cookies['auth_token'] = self.token.key
+        self.assertFalse(self.me().data['authenticated'])
+
+    def test_token_delete_invalidates(self):
+        self.client.cookies['auth_token'] = self.token.key
+        self.me()
+        self.token.delete()
+        self.assertFalse(self.me().data['authenticated'])
+
+    def test_deactivation_invalidates(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.me()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.me().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cached_user_is_copied_per_request(self):
+        first = authentication.resolve_token(self.token.key)[1]
+        first.first_name = 'Changed'
+        second = authentication.resolve_token(self.token.key)[1]
+        self.assertEqual(second.first_name, 'Ana')
+        self.assertIsNot(first, second)
+
+    def test_cookie_authentication_enforces_csrf(self):
+        client = APIClient(enforce_csrf_checks=True)
+        client.cookies['auth_token'] = self.token.key
+        response = client.post('/api/counters/', {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertIn('CSRF', str(response.data))
@@ -0,0 +1,150 @@
+"""
+Upload-time file metadata (size, MIME type, SHA-256, page count).
+
+The hashing upload handlers compute the digest and PDF page count while the
+request body streams in, so no second pass over the file is needed. The
+values are stored on the model by capture_file_metadata() (pre_save signal)
+and serializers read the columns instead of stat()ing storage on every row.
+
+Files that did not come through the handlers (admin actions, scripts,
+backfill) are scanned once with scan_file().
+"""
+import hashlib
+import mimetypes
+import re
+
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+SCAN_CHUNK_SIZE = 64 * 1024
+
+# Page objects: "/Type /Page" but not the "/Type /Pages" tree nodes
+_PDF_PAGE_RE = re.compile(rb'/Type\s*/Page(?![a-zA-Z])')
+_PDF_PAGE_TAIL = 16
+
+
+class PdfPageCounter:
+    """
+    Streaming page counter for PDFs.
+    Counts page objects across chunk boundaries. PDFs that keep their page
+    objects inside compressed object streams report no pages (None).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._tail = b''
+
+    def feed(self, chunk):
+        data = self._tail + chunk
+        # Only count matches that end before the kept tail, the rest is re-scanned
+        limit = max(len(data) - _PDF_PAGE_TAIL, 0)
+        for match in _PDF_PAGE_RE.finditer(data):
+            if match.start() < limit:
+                self.count += 1
+        self._tail = data[limit:]
+
+    def result(self):
+        self.count += len(_PDF_PAGE_RE.findall(self._tail))
+        self._tail = b''
+        return self.count or None
+
+
+class FileDigest:
+    """Accumulates size, SHA-256 and PDF page count over file chunks"""
+
+    def __init__(self, name=''):
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+        self.pages = PdfPageCounter() if name.lower().endswith('.pdf') else None
+
+    def update(self, chunk):
+        self.size += len(chunk)
+        self.sha256.update(chunk)
+        if self.pages is not None:
+            self.pages.feed(chunk)
+
+    @property
+    def page_count(self):
+        return self.pages.result() if self.pages is not None else None
+
+
+def scan_file(fileobj, name=''):
+    """Read a file-like object once and return its FileDigest"""
+    digest = FileDigest(name or getattr(fileobj, 'name', '') or '')
+    if hasattr(fileobj, 'seek'):
+        fileobj.seek(0)
+    while True:
+        chunk = fileobj.read(SCAN_CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+    if hasattr(fileobj, 'seek'):
+        fileobj.seek(0)
+    return digest
+
+
+def guess_mime_type(name, content_type=None):
+    # Trust the extension (validated by the model) over the client-supplied header
+    return mimetypes.guess_type(name)[0] or content_type or 'application/octet-stream'
+
+
+class HashingUploadMixin:
+    """Computes a FileDigest while the upload handler receives chunks"""
+
+    def new_file(self, field_name, file_name, *args, **kwargs):
+        # Set up first: MemoryFileUploadHandler.new_file() raises StopFutureHandlers
+        self._digest = FileDigest(file_name or '')
+        super().new_file(field_name, file_name, *args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        # MemoryFileUploadHandler steps aside for large files; only the handler
+        # that actually keeps the data needs to hash it
+        if getattr(self, 'activated', True):
+            self._digest.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        if uploaded is not None:
+            uploaded.sha256 = self._digest.sha256.hexdigest()
+            uploaded.page_count = self._digest.page_count
+        return uploaded
+
+
+class HashingMemoryFileUploadHandler(HashingUploadMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(HashingUploadMixin, TemporaryFileUploadHandler):
+    pass
+
+
+def capture_file_metadata(document):
+    """
+    Fill the file_* columns of a LibraryDocument from a newly assigned file.
+    Does nothing when the file is unchanged (already committed to storage).
+    """
+    field_file = document.file
+    if not field_file:
+        document.file_size = None
+        document.file_mime_type = ''
+        document.file_sha256 = ''
+        document.file_page_count = None
+        return
+    if field_file._committed:
+        return
+
+    uploaded = field_file.file
+    sha256 = getattr(uploaded, 'sha256', None)
+    if sha256:
+        size = uploaded.size
+        page_count = getattr(uploaded, 'page_count', None)
+    else:
+        digest = scan_file(uploaded, field_file.name)
+        sha256 = digest.sha256.hexdigest()
+        size = digest.size
+        page_count = digest.page_count
+
+    document.file_size = size
+    document.file_mime_type = guess_mime_type(field_file.name, getattr(uploaded, 'content_type', None))
+    document.file_sha256 = sha256
+    document.file_page_count = page_count
@@ -37,8 +37,13 @@ urlpatterns = [
     path('health/', views.health_check, name='health_check'),
     path('welcome/', views.welcome, name='welcome'),
     # Metrics
+    path('metrics/internal/', views.internal_metrics, name='internal_metrics'),
     path('metrics/active-employees/', views.active_employees_count, name='active_employees_count'),
     path('metrics/documents-count/', views.documents_count, name='documents_count'),
+    # Home page figures in one request
+    path('dashboard/', views.dashboard_summary, name='dashboard'),
+    # Buffered view/download counters
+    path('counters/', views.counter_beacon, name='counter_beacon'),
     # Authentication endpoints
     path('auth/login/', views.ldap_login, name='ldap_login'),
     path('auth/logout/', views.ldap_logout, name='ldap_logout'),
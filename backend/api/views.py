@@ -1,12 +1,14 @@
 from rest_framework.decorators import api_view, action, authentication_classes, permission_classes
 from rest_framework.response import Response
 from rest_framework import status, viewsets, filters
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User, Group
-from django.db.models import Q, Count
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db import transaction
+from django.http import HttpResponse
+from django.db.models import Count, F, Q
 import logging
 from django.utils import timezone
 from django.conf import settings
@@ -20,6 +22,12 @@ from .permissions import (
     IsOwnerOrReadOnly,
     IsOwnerOrManager
 )
+from .search import LibraryFullTextFilter
+from . import authentication, counters, dashboard, headcount, instrumentation, ldap_auth
+from .caching import cached_response
+from .conditional import ConditionalGetMixin
+from .downloads import serve_file
+from .pagination import KeysetPagination
 from .models import (
     Department,
     # Business Process Models
@@ -31,6 +39,7 @@ from .models import (
     ForumCategory, ForumPost
 )
 from .serializers import (
+    sparse_fieldset,
     HealthCheckSerializer,
     DepartmentSerializer,
     # Business Process Serializers
@@ -177,8 +186,19 @@ def ldap_login(request):
             samesite=cookie_samesite,
             max_age=max_age,
         )
+        ldap_timings = getattr(request, 'ldap_timings', None)
+        if ldap_timings:
+            response['Server-Timing'] = ldap_auth.server_timing_header(ldap_timings)
 
         return response
+    elif getattr(request, 'ldap_unavailable', False):
+        # Directory down or circuit breaker open: fail fast instead of reporting bad credentials
+        logger.warning(f"Directory unavailable, login rejected for user: {username}")
+        return Response(
+            {'error': 'Directory service unavailable, please try again later'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={'Retry-After': str(ldap_auth.breaker.retry_after() or 1)},
+        )
     else:
         # Authentication failed
         logger.warning(f"Authentication failed for user: {username}")
@@ -216,6 +236,7 @@ def ldap_logout(request):
     # This handles clients that authenticate solely via the cookie token (no session)
     token_key = request.COOKIES.get('auth_token')
     if token_key:
+        authentication.invalidate_token(token_key)
         try:
             token_obj = Token.objects.filter(key=token_key).first()
             if token_obj:
@@ -244,95 +265,56 @@ def ldap_logout(request):
 def current_user(request):
     """
     Get current authenticated user information
+    The auth_token cookie is resolved by CachedTokenAuthentication, cache hits
+    answer without database queries.
     """
-    # If user is authenticated via session, return that
     if request.user.is_authenticated:
-        user = request.user
-    else:
-        # Try to authenticate via token in HttpOnly cookie
-        token_key = request.COOKIES.get('auth_token')
-        user = None
-        if token_key:
-            try:
-                token_obj = Token.objects.get(key=token_key)
-                user = token_obj.user
-            except Token.DoesNotExist:
-                user = None
-
-    if user:
-        user_groups = list(user.groups.values_list('name', flat=True))
         return Response({
             'authenticated': True,
-            'user': {
-                'id': user.id,
-                'username': user.username,
-                'email': user.email,
-                'first_name': user.first_name,
-                'last_name': user.last_name,
-                'is_staff': user.is_staff,
-                'is_superuser': user.is_superuser,
-                'groups': user_groups,
-            },
+            'user': dashboard.user_summary(request.user),
         }, status=status.HTTP_200_OK)
 
     return Response({'authenticated': False}, status=status.HTTP_200_OK)
 
 
 @api_view(['GET'])
+@permission_classes([IsAdminUser])
+def internal_metrics(request):
+    """
+    Request, database, cache and LDAP metrics in Prometheus text format
+    (see api/instrumentation.py). Staff only.
+    """
+    return HttpResponse(instrumentation.render(), content_type=instrumentation.CONTENT_TYPE)
+
+
+@api_view(['GET'])
+@cached_response('active_employees_count')
 def active_employees_count(request):
     """
     Returns the count of active employees that belong to the
     'GG_IMCPNET_TODOS_USUARIOS' group. If the group doesn't exist,
     the count will be 0.
+    Figures come from the daily headcount snapshots (api/headcount.py).
+    ?range=30d|12w|6m|1y adds the daily counts of that period as "series".
 
-    Response shape: { "count": number }
+    Response shape: { "count", "previous_count", "percent_change", "is_positive", "group",
+                      "as_of", "series"?: [{ "date", "count" }] }
     """
-    group_name = 'GG_IMCPNET_TODOS_USUARIOS'
-    now = timezone.now()
-    try:
-        group = Group.objects.get(name=group_name)
-        # Current active employees in the group
-        current_count = User.objects.filter(is_active=True, groups=group).count()
-
-        # Calculate end of previous month: first day of this month minus 1 second
-        first_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        from datetime import timedelta
-        last_month_end = first_of_month - timedelta(seconds=1)
-
-        # Approximate previous month's active employees by counting users
-        # who had joined on or before the end of last month and belong to the group.
-        # Note: if users were deactivated after joining, historic active status is not tracked
-        # in this schema; this is a reasonable approximation.
-        previous_count = User.objects.filter(groups=group, is_active=True, date_joined__lte=last_month_end).count()
-    except Group.DoesNotExist:
-        current_count = 0
-        previous_count = 0
-
-    # Compute percent change and whether it's positive
-    percent_change = None
-    is_positive = None
-    if previous_count == 0:
-        if current_count == 0:
-            percent_change = 0.0
-            is_positive = False
-        else:
-            # From 0 to some number -> treat as 100% increase
-            percent_change = 100.0
-            is_positive = True
-    else:
-        diff = current_count - previous_count
-        percent_change = round((diff / previous_count) * 100.0, 2)
-        is_positive = diff > 0
-    return Response({
-        'count': current_count,
-        'previous_count': previous_count,
-        'percent_change': percent_change,
-        'is_positive': is_positive,
-        'group': group_name,
-    }, status=status.HTTP_200_OK)
+    data = headcount.summary()
+    if 'range' in request.query_params:
+        try:
+            days = headcount.parse_range(request.query_params['range'])
+        except ValueError:
+            return Response(
+                {'error': 'Rango inválido, use por ejemplo 30d, 12w, 6m o 1y'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        data['series'] = headcount.series(days)
+    return Response(data, status=status.HTTP_200_OK)
 
 
 @api_view(['GET'])
+@cached_response('documents_count')
 def documents_count(request):
     """
     Returns the count of published library documents accessible to the user.
@@ -344,25 +326,8 @@ def documents_count(request):
     Response shape: { "count": number }
     """
     try:
-        # Only count published documents
-        queryset = LibraryDocument.objects.filter(status='published')
-        
-        # If user is authenticated, filter by groups
-        if request.user.is_authenticated:
-            user_groups = request.user.groups.all()
-            # Include documents with no groups OR documents where user belongs to at least one group
-            queryset = queryset.annotate(
-                groups_count=Count('groups')
-            ).filter(
-                Q(groups_count=0) | Q(groups__in=user_groups)
-            ).distinct()
-        else:
-            # Unauthenticated users can only see documents with no groups
-            queryset = queryset.annotate(
-                groups_count=Count('groups')
-            ).filter(groups_count=0)
-        
-        count = queryset.count()
+        # Only count published documents visible to the user
+        count = LibraryDocument.objects.filter(status='published').visible_to(request.user).count()
     except Exception:
         count = 0
 
@@ -371,7 +336,113 @@ def documents_count(request):
     }, status=status.HTTP_200_OK)
 
 
-class DepartmentViewSet(viewsets.ModelViewSet):
+@api_view(['GET'])
+def dashboard_summary(request):
+    """
+    Home page figures in one request (see api/dashboard.py).
+    ?widgets=user,headcount,documents (the default) selects the widgets; also
+    available: pending_approvals, upcoming_trainings, unacknowledged_policies.
+    Widgets that need a signed in user are null for anonymous requests.
+
+    Response shape: { "<widget>": value, ... }
+    """
+    requested = request.query_params.get('widgets')
+    names = dashboard.DEFAULT_WIDGETS
+    if requested:
+        names = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in names if name not in dashboard.WIDGETS]
+    if unknown:
+        return Response(
+            {'error': f"Widgets desconocidos: {', '.join(unknown)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return Response(dashboard.build(request.user, names), status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+def counter_beacon(request):
+    """
+    Record many counter increments in one call (e.g. from navigator.sendBeacon).
+    Increments are buffered and written in batches, see api/counters.py.
+
+    Body: { "document_view": [1, 2, 2], "document_download": [3], "forum_view": [7] }
+    Each id counts once per occurrence. Returns 204 No Content.
+    """
+    data = request.data if isinstance(request.data, dict) else {}
+    events = {}
+    total = 0
+    for name, ids in data.items():
+        if name not in counters.COUNTERS:
+            return Response({'error': f'Unknown counter: {name}'}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(ids, list) or not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in ids):
+            return Response({'error': f'{name} must be a list of ids'}, status=status.HTTP_400_BAD_REQUEST)
+        events[name] = ids
+        total += len(ids)
+
+    if total > getattr(settings, 'COUNTER_BEACON_MAX_EVENTS', 500):
+        return Response({'error': 'Too many events'}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Only count documents the caller is allowed to see
+    document_ids = set(events.get('document_view', [])) | set(events.get('document_download', []))
+    if document_ids:
+        visible = set(
+            LibraryDocument.objects.visible_to(request.user)
+            .filter(pk__in=document_ids).values_list('pk', flat=True)
+        )
+    for name, ids in events.items():
+        for pk in ids:
+            if name.startswith('document_') and pk not in visible:
+                continue
+            counters.increment(name, pk)
+
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class SparseFieldsetMixin:
+    """
+    Pushes ?fields= / ?omit= down to the database: on read requests every
+    model column that none of the selected serializer fields needs is
+    deferred, so large text columns are not fetched for list cards.
+    Foreign keys are never deferred (select_related and nested sources use them),
+    nor is the column ConditionalGetMixin derives validators from.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if sparse_fieldset(self.request, ()) is None:
+            return queryset
+        serializer = self.get_serializer_class()(context=self.get_serializer_context())
+        if not hasattr(serializer, 'get_required_model_fields'):
+            return queryset
+        required = serializer.get_required_model_fields()
+        deferred = [
+            field.name for field in queryset.model._meta.concrete_fields
+            if not field.primary_key and not field.is_relation and field.name not in required
+            and field.name != getattr(self, 'last_modified_field', None)
+        ]
+        return queryset.defer(*deferred) if deferred else queryset
+
+
+class CountAnnotationMixin:
+    """
+    Adds the viewset's count_annotations ({name: Count(...)}) to the queryset
+    so serializers read per-row counts from the row instead of running one
+    COUNT per object. Annotations whose field is left out by ?fields= /
+    ?omit= are skipped.
+    """
+    count_annotations = {}
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        selected = sparse_fieldset(self.request, self.count_annotations)
+        annotations = {
+            name: aggregate for name, aggregate in self.count_annotations.items()
+            if selected is None or name in selected
+        }
+        return queryset.annotate(**annotations) if annotations else queryset
+
+
+class DepartmentViewSet(ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for Department model
     Provides CRUD operations for departments
@@ -390,20 +461,26 @@ class DepartmentViewSet(viewsets.ModelViewSet):
 # BUSINESS PROCESS VIEWSETS - IMCP USE CASES
 # ========================================
 
-class LibraryDocumentViewSet(viewsets.ModelViewSet):
+class LibraryDocumentViewSet(ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for LibraryDocument model
     Biblioteca de Documentos Unificada
     Unifica: Documentación Técnica, Elaboración de Docs y Aprobación de Docs
     Permite subir, ver, descargar archivos, y realizar elaboración y aprobación
     
+    Full-text search: ?q=<terms> uses the library search index (ranked, accent
+    and stem insensitive). ?search= keeps the plain SearchFilter behaviour.
+    
     IMPORTANT: Permissions are set to AllowAny for testing purposes.
     In production, set the LIBRARY_DOCS_PRODUCTION environment variable to 'true'
     to enable proper permission checking (CanManageDocuments).
     """
     queryset = LibraryDocument.objects.select_related('department', 'author', 'approver').prefetch_related('groups').all()
     serializer_class = LibraryDocumentSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = KeysetPagination
+    # Buffered counters and the ACL flag are written with update()
+    conditional_fields = ('is_public', 'view_count', 'download_count')
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter, LibraryFullTextFilter]
     filterset_fields = ['document_type', 'status', 'department', 'author', 'approval_decision']
     search_fields = ['title', 'code', 'description', 'content', 'tags']
     ordering_fields = ['code', 'title', 'created_at', 'updated_at', 'download_count', 'view_count']
@@ -416,24 +493,7 @@ class LibraryDocumentViewSet(viewsets.ModelViewSet):
         - Have no groups assigned (accessible to all), OR
         - Have at least one group in common with the user's groups
         """
-        queryset = super().get_queryset()
-        
-        # If user is authenticated, filter by groups
-        if self.request.user.is_authenticated:
-            user_groups = self.request.user.groups.all()
-            # Include documents with no groups OR documents where user belongs to at least one group
-            queryset = queryset.annotate(
-                groups_count=Count('groups')
-            ).filter(
-                Q(groups_count=0) | Q(groups__in=user_groups)
-            ).distinct()
-        else:
-            # Unauthenticated users can only see documents with no groups
-            queryset = queryset.annotate(
-                groups_count=Count('groups')
-            ).filter(groups_count=0)
-        
-        return queryset
+        return super().get_queryset().visible_to(self.request.user)
     
     def get_permissions(self):
         """
@@ -482,6 +542,7 @@ class LibraryDocumentViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
+    @cached_response('library-document-recent')
     def recent(self, request):
         """Get recent documents (last 10)"""
         recent_docs = self.get_queryset().filter(status='published').order_by('-created_at')[:10]
@@ -595,26 +656,47 @@ class LibraryDocumentViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(document)
         return Response(serializer.data)
     
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """
+        Download the document file.
+        Enforces the group ACL, supports Range/ETag and proxy offloading
+        (LIBRARY_DOWNLOAD_ACCEL). Counts the download once per transfer.
+        """
+        document = self.get_object()
+        if not document.file:
+            return Response({'error': 'El documento no tiene archivo adjunto'}, status=status.HTTP_404_NOT_FOUND)
+        if not document.file.storage.exists(document.file.name):
+            return Response({'error': 'Archivo no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+
+        if document.file_sha256:
+            etag = f'"{document.file_sha256}"'
+        else:
+            etag = f'"{document.pk}-{int(document.updated_at.timestamp() * 1000000)}"'
+        return serve_file(
+            request, document.file, etag,
+            on_download=lambda: counters.increment('document_download', document.pk),
+            size=document.file_size
+        )
+    
     @action(detail=True, methods=['post'])
     def increment_view(self, request, pk=None):
-        """Increment view count"""
+        """Increment view count (buffered, does not modify updated_at)"""
         document = self.get_object()
-        document.view_count += 1
-        document.save()
-        serializer = self.get_serializer(document)
-        return Response(serializer.data)
+        view_count = document.view_count + counters.pending('document_view', document.pk) + 1
+        counters.increment('document_view', document.pk)
+        return Response({'id': document.pk, 'view_count': view_count})
     
     @action(detail=True, methods=['post'])
     def increment_download(self, request, pk=None):
-        """Increment download count"""
+        """Increment download count (buffered, does not modify updated_at)"""
         document = self.get_object()
-        document.download_count += 1
-        document.save()
-        serializer = self.get_serializer(document)
-        return Response(serializer.data)
+        download_count = document.download_count + counters.pending('document_download', document.pk) + 1
+        counters.increment('document_download', document.pk)
+        return Response({'id': document.pk, 'download_count': download_count})
 
 
-class PolicyViewSet(viewsets.ModelViewSet):
+class PolicyViewSet(ConditionalGetMixin, CountAnnotationMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for Policy model
     Caso de Uso: ESTABLECER POLÍTICAS
@@ -622,6 +704,7 @@ class PolicyViewSet(viewsets.ModelViewSet):
     """
     queryset = Policy.objects.select_related('department', 'created_by', 'auditor_reviewer', 'peer_reviewer', 'replaces_policy').all()
     serializer_class = PolicySerializer
+    count_annotations = {'distribution_count': Count('distributions', distinct=True)}
     permission_classes = [IsDepartmentManager | IsHRManager]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'origin', 'department', 'created_by', 'board_approved']
@@ -630,9 +713,10 @@ class PolicyViewSet(viewsets.ModelViewSet):
     ordering = ['-created_at']
     
     @action(detail=False, methods=['get'])
+    @cached_response('policy-published')
     def published(self, request):
         """Get published and active policies"""
-        published = self.queryset.filter(status='published')
+        published = self.get_queryset().filter(status='published')
         page = self.paginate_queryset(published)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -643,7 +727,7 @@ class PolicyViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def pending_approval(self, request):
         """Get policies pending board approval"""
-        pending = self.queryset.filter(status='pending_signatures', board_approved=False)
+        pending = self.get_queryset().filter(status='pending_signatures', board_approved=False)
         serializer = self.get_serializer(pending, many=True)
         return Response(serializer.data)
     
@@ -695,13 +779,14 @@ class PolicyViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class PolicyDistributionViewSet(viewsets.ModelViewSet):
+class PolicyDistributionViewSet(ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for PolicyDistribution model
     Distribución de políticas a personal
     """
     queryset = PolicyDistribution.objects.select_related('policy', 'recipient', 'distributed_by').all()
     serializer_class = PolicyDistributionSerializer
+    pagination_class = KeysetPagination
     permission_classes = [IsOwnerOrManager]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['policy', 'recipient', 'acknowledged']
@@ -730,7 +815,7 @@ class PolicyDistributionViewSet(viewsets.ModelViewSet):
         return Response({'error': 'Not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
 
 
-class TrainingPlanViewSet(viewsets.ModelViewSet):
+class TrainingPlanViewSet(ConditionalGetMixin, CountAnnotationMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for TrainingPlan model
     Caso de Uso: PLANIFICAR CAPACITACIONES PARA LOS ANALISTAS
@@ -738,6 +823,10 @@ class TrainingPlanViewSet(viewsets.ModelViewSet):
     """
     queryset = TrainingPlan.objects.select_related('department', 'created_by', 'assigned_manager').all()
     serializer_class = TrainingPlanSerializer
+    count_annotations = {
+        'session_count': Count('sessions', distinct=True),
+        'quotation_count': Count('quotations', distinct=True),
+    }
     permission_classes = [IsDepartmentManager | IsHRManager]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'origin', 'scope', 'modality', 'department', 'budget_approved']
@@ -748,7 +837,7 @@ class TrainingPlanViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def calendar(self, request):
         """Get training plans for calendar view"""
-        scheduled = self.queryset.filter(status__in=['scheduled', 'in_progress'])
+        scheduled = self.get_queryset().filter(status__in=['scheduled', 'in_progress'])
         serializer = self.get_serializer(scheduled, many=True)
         return Response(serializer.data)
     
@@ -775,13 +864,14 @@ class TrainingPlanViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class TrainingProviderViewSet(viewsets.ModelViewSet):
+class TrainingProviderViewSet(ConditionalGetMixin, CountAnnotationMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for TrainingProvider model
     Proveedores de capacitación
     """
     queryset = TrainingProvider.objects.all()
     serializer_class = TrainingProviderSerializer
+    count_annotations = {'quotation_count': Count('quotations', distinct=True)}
     permission_classes = [IsAdminOrReadOnly]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['is_active', 'rating']
@@ -790,14 +880,15 @@ class TrainingProviderViewSet(viewsets.ModelViewSet):
     ordering = ['name']
     
     @action(detail=False, methods=['get'])
+    @cached_response('training-provider-active')
     def active(self, request):
         """Get active providers"""
-        active = self.queryset.filter(is_active=True)
+        active = self.get_queryset().filter(is_active=True)
         serializer = self.get_serializer(active, many=True)
         return Response(serializer.data)
 
 
-class TrainingQuotationViewSet(viewsets.ModelViewSet):
+class TrainingQuotationViewSet(ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for TrainingQuotation model
     Cotizaciones de capacitación
@@ -825,7 +916,7 @@ class TrainingQuotationViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class TrainingSessionViewSet(viewsets.ModelViewSet):
+class TrainingSessionViewSet(ConditionalGetMixin, CountAnnotationMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for TrainingSession model
     Caso de Uso: ASISTEN A CAPACITACIONES DE LA GERENCIA
@@ -833,6 +924,12 @@ class TrainingSessionViewSet(viewsets.ModelViewSet):
     """
     queryset = TrainingSession.objects.select_related('training_plan', 'provider').all()
     serializer_class = TrainingSessionSerializer
+    count_annotations = {
+        'attendance_count': Count('attendances', distinct=True),
+        'confirmed_count': Count(
+            'attendances', filter=Q(attendances__confirmation_status='confirmed'), distinct=True
+        ),
+    }
     permission_classes = [IsDepartmentManager | IsHRManager]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'training_plan', 'provider']
@@ -844,7 +941,7 @@ class TrainingSessionViewSet(viewsets.ModelViewSet):
     def upcoming(self, request):
         """Get upcoming training sessions"""
         from django.utils import timezone
-        upcoming = self.queryset.filter(
+        upcoming = self.get_queryset().filter(
             start_datetime__gte=timezone.now(),
             status__in=['scheduled', 'confirmed']
         )
@@ -870,13 +967,14 @@ class TrainingSessionViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class TrainingAttendanceViewSet(viewsets.ModelViewSet):
+class TrainingAttendanceViewSet(ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for TrainingAttendance model
     Asistencia a capacitaciones
     """
     queryset = TrainingAttendance.objects.select_related('session', 'analyst', 'invited_by').all()
     serializer_class = TrainingAttendanceSerializer
+    pagination_class = KeysetPagination
     permission_classes = [IsOwnerOrManager]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['confirmation_status', 'attendance_status', 'session', 'analyst', 'certificate_issued']
@@ -938,7 +1036,7 @@ class TrainingAttendanceViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class InternalVacancyViewSet(viewsets.ModelViewSet):
+class InternalVacancyViewSet(ConditionalGetMixin, CountAnnotationMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for InternalVacancy model
     Caso de Uso: DISPONIBILIDAD DE VACANTE INTERNA
@@ -946,6 +1044,7 @@ class InternalVacancyViewSet(viewsets.ModelViewSet):
     """
     queryset = InternalVacancy.objects.select_related('department', 'requested_by', 'hr_manager').all()
     serializer_class = InternalVacancySerializer
+    count_annotations = {'application_count': Count('applications', distinct=True)}
     permission_classes = [IsHRManager | IsDepartmentManager]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'department', 'requested_by', 'budget_approved']
@@ -954,9 +1053,10 @@ class InternalVacancyViewSet(viewsets.ModelViewSet):
     ordering = ['-created_at']
     
     @action(detail=False, methods=['get'])
+    @cached_response('internal-vacancy-published')
     def published(self, request):
         """Get published vacancies"""
-        published = self.queryset.filter(status='published')
+        published = self.get_queryset().filter(status='published')
         page = self.paginate_queryset(published)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -994,13 +1094,14 @@ class InternalVacancyViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class VacancyApplicationViewSet(viewsets.ModelViewSet):
+class VacancyApplicationViewSet(ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for VacancyApplication model
     Aplicaciones a vacantes internas
     """
     queryset = VacancyApplication.objects.select_related('vacancy', 'applicant', 'current_manager').all()
     serializer_class = VacancyApplicationSerializer
+    pagination_class = KeysetPagination
     permission_classes = [IsOwnerOrManager]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'vacancy', 'applicant', 'current_manager_authorization']
@@ -1077,13 +1178,13 @@ class VacancyApplicationViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class VacancyTransitionViewSet(viewsets.ModelViewSet):
+class VacancyTransitionViewSet(ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for VacancyTransition model
     Transiciones de puesto
     """
     queryset = VacancyTransition.objects.select_related(
-        'application', 'previous_department', 'new_department', 'hr_coordinator'
+        'application__applicant', 'previous_department', 'new_department', 'hr_coordinator'
     ).all()
     serializer_class = VacancyTransitionSerializer
     permission_classes = [IsHRManager]
@@ -1119,13 +1220,16 @@ class VacancyTransitionViewSet(viewsets.ModelViewSet):
 # FORUM VIEWSETS
 # ========================================
 
-class ForumCategoryViewSet(viewsets.ModelViewSet):
+class ForumCategoryViewSet(ConditionalGetMixin, CountAnnotationMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for ForumCategory model
     Gestión de categorías de foro
     """
     queryset = ForumCategory.objects.all()
     serializer_class = ForumCategorySerializer
+    count_annotations = {
+        'posts_count': Count('posts', filter=Q(posts__parent_post__isnull=True), distinct=True)
+    }
     permission_classes = [IsAdminOrReadOnly]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['is_active']
@@ -1134,20 +1238,24 @@ class ForumCategoryViewSet(viewsets.ModelViewSet):
     ordering = ['order', 'name']
     
     @action(detail=False, methods=['get'])
+    @cached_response('forum-category-active')
     def active(self, request):
         """Get active forum categories"""
-        active_categories = self.queryset.filter(is_active=True)
+        active_categories = self.get_queryset().filter(is_active=True)
         serializer = self.get_serializer(active_categories, many=True)
         return Response(serializer.data)
 
 
-class ForumPostViewSet(viewsets.ModelViewSet):
+class ForumPostViewSet(ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for ForumPost model
     Gestión de posts de foro
     """
     queryset = ForumPost.objects.select_related('category', 'author', 'parent_post').all()
     serializer_class = ForumPostSerializer
+    pagination_class = KeysetPagination
+    # Counters and reply stats are written with update()
+    conditional_fields = ('views_count', 'likes_count', 'replies_count', 'last_reply_at')
     permission_classes = [IsOwnerOrReadOnly]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['category', 'author', 'is_pinned', 'is_locked', 'parent_post']
@@ -1207,12 +1315,11 @@ class ForumPostViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['post'])
     def increment_views(self, request, pk=None):
-        """Increment view count"""
+        """Increment view count (buffered, does not modify updated_at)"""
         post = self.get_object()
-        post.views_count += 1
-        post.save()
-        serializer = self.get_serializer(post)
-        return Response(serializer.data)
+        views_count = post.views_count + counters.pending('forum_view', post.pk) + 1
+        counters.increment('forum_view', post.pk)
+        return Response({'id': post.pk, 'views_count': views_count})
     
     @action(detail=True, methods=['post'])
     def toggle_pin(self, request, pk=None):
@@ -1232,28 +1339,46 @@ class ForumPostViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(post)
         return Response(serializer.data)
     
-    @action(detail=True, methods=['post'])
+    def _set_like(self, post, user, liked):
+        """
+        Add or remove the user's like on the through table and adjust
+        likes_count with F() only when a row was actually inserted or deleted,
+        so repeated and concurrent requests never double-count.
+        Returns the resulting likes_count.
+        """
+        Like = ForumPost.liked_by.through
+        with transaction.atomic():
+            if liked:
+                # get_or_create retries as a lookup when a concurrent insert wins the race
+                _, changed = Like.objects.get_or_create(forumpost_id=post.pk, user_id=user.pk)
+                delta = 1
+            else:
+                changed = Like.objects.filter(forumpost_id=post.pk, user_id=user.pk).delete()[0] > 0
+                delta = -1
+            if changed:
+                ForumPost.objects.filter(pk=post.pk).update(likes_count=F('likes_count') + delta)
+            return ForumPost.objects.filter(pk=post.pk).values_list('likes_count', flat=True).get()
+    
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    def like(self, request, pk=None):
+        """Like a post (idempotent)"""
+        post = self.get_object()
+        likes_count = self._set_like(post, request.user, True)
+        return Response({'id': post.pk, 'liked': True, 'likes_count': likes_count})
+    
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    def unlike(self, request, pk=None):
+        """Remove the current user's like (idempotent)"""
+        post = self.get_object()
+        likes_count = self._set_like(post, request.user, False)
+        return Response({'id': post.pk, 'liked': False, 'likes_count': likes_count})
+    
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def toggle_like(self, request, pk=None):
-        """Toggle like status for current user"""
+        """Toggle like status for current user (returns the full post, prefer like/unlike)"""
         post = self.get_object()
-        user = request.user
-        
-        if not user.is_authenticated:
-            return Response(
-                {'error': 'Authentication required to like posts'},
-                status=status.HTTP_401_UNAUTHORIZED
-            )
-        
-        if post.liked_by.filter(id=user.id).exists():
-            # Unlike
-            post.liked_by.remove(user)
-        else:
-            # Like
-            post.liked_by.add(user)
-        
-        # Update likes count based on actual count
-        post.likes_count = post.liked_by.count()
-        post.save()
+        liked = not post.liked_by.filter(id=request.user.id).exists()
+        post.likes_count = self._set_like(post, request.user, liked)
         serializer = self.get_serializer(post)
         return Response(serializer.data)
 
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+import json
 import os
 from dotenv import load_dotenv, find_dotenv
 
@@ -68,6 +69,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Per-route latency, query and response size metrics (api/instrumentation.py)
+    'api.instrumentation.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -150,6 +153,19 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Upload handlers that hash files while they stream in (api/uploads.py)
+FILE_UPLOAD_HANDLERS = [
+    'api.uploads.HashingMemoryFileUploadHandler',
+    'api.uploads.HashingTemporaryFileUploadHandler',
+]
+
+# Protected library downloads (/api/library-documents/<id>/download/)
+# '' streams the file from Django, 'nginx' hands off with X-Accel-Redirect,
+# 'sendfile' hands off with X-Sendfile (Apache mod_xsendfile / lighttpd)
+LIBRARY_DOWNLOAD_ACCEL = os.environ.get('LIBRARY_DOWNLOAD_ACCEL', '')
+# nginx "internal" location aliased to MEDIA_ROOT, used with LIBRARY_DOWNLOAD_ACCEL=nginx
+LIBRARY_DOWNLOAD_ACCEL_PREFIX = os.environ.get('LIBRARY_DOWNLOAD_ACCEL_PREFIX', '/protected-media/')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -180,10 +196,12 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        # Header or auth_token cookie, resolved through a process-local cache (api/authentication.py)
+        'api.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    # Page-number pagination with ?page_size= and ?count=false (api/pagination.py)
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.StandardResultsPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -192,6 +210,59 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Token authentication cache (api/authentication.py): seconds a resolved token stays cached
+# (0 disables it) and maximum number of cached tokens per process
+AUTH_TOKEN_CACHE_TTL = int(os.environ.get('AUTH_TOKEN_CACHE_TTL', '60'))
+AUTH_TOKEN_CACHE_SIZE = int(os.environ.get('AUTH_TOKEN_CACHE_SIZE', '1024'))
+
+# Seconds a user's group names stay in the process-local role cache (api/roles.py); 0 disables it
+ROLE_CACHE_TTL = int(os.environ.get('ROLE_CACHE_TTL', '60'))
+
+# Document library full-text search
+# 'auto' uses SQLite FTS5 or PostgreSQL tsvector depending on the database engine.
+# Other values: 'sqlite', 'postgresql', 'database' (icontains fallback, no index)
+LIBRARY_SEARCH_BACKEND = os.environ.get('LIBRARY_SEARCH_BACKEND', 'auto')
+# Maximum number of ranked matches returned by ?q= searches
+LIBRARY_SEARCH_MAX_RESULTS = int(os.environ.get('LIBRARY_SEARCH_MAX_RESULTS', '500'))
+
+# Write-behind view/download counters (api/counters.py)
+# Seconds between batched flushes; 0 writes every increment immediately
+COUNTER_FLUSH_INTERVAL = float(os.environ.get('COUNTER_FLUSH_INTERVAL', '10'))
+# Flush early once this many distinct objects have pending increments
+COUNTER_MAX_PENDING = int(os.environ.get('COUNTER_MAX_PENDING', '10000'))
+# Maximum increments accepted by one /api/counters/ call
+COUNTER_BEACON_MAX_EVENTS = int(os.environ.get('COUNTER_BEACON_MAX_EVENTS', '500'))
+
+# Request metrics served at /api/metrics/internal/ (api/instrumentation.py)
+# Directory shared by the worker processes of a host; each one writes its metrics there and
+# the endpoint sums them. Empty keeps metrics per process (fine for a single worker).
+METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR', '')
+# Seconds between a worker's writes to METRICS_MULTIPROC_DIR
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', '5'))
+
+# Django cache, used by the API response cache. Process-local memory unless CACHE_REDIS_URL
+# points at a Redis server (requires the redis package), which shares entries and
+# invalidations between all workers and hosts
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', '')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_REDIS_URL,
+    } if CACHE_REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'intranet',
+    },
+}
+
+# Response cache of read-mostly endpoints (api/caching.py)
+# Cache alias, and seconds a response stays cached (0 disables the response cache)
+API_CACHE_ALIAS = os.environ.get('API_CACHE_ALIAS', 'default')
+API_CACHE_TTL = int(os.environ.get('API_CACHE_TTL', '300'))
+# Seconds other requests wait for the one recomputing a missing response before computing it too
+API_CACHE_LOCK_TIMEOUT = float(os.environ.get('API_CACHE_LOCK_TIMEOUT', '10'))
+# Seconds cached /api/dashboard/ widgets (headcount, visible documents) are reused; 0 disables it
+DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL', '60'))
+
 # Logging configuration
 LOGGING = {
     'version': 1,
@@ -232,6 +303,58 @@ LOGGING = {
 AUTH_LDAP_SERVER_URI = os.environ.get('AUTH_LDAP_SERVER_URI', '')
 AUTH_LDAP_BIND_DN = os.environ.get('AUTH_LDAP_BIND_DN', '')
 AUTH_LDAP_BIND_PASSWORD = os.environ.get('AUTH_LDAP_BIND_PASSWORD', '')
+AUTH_LDAP_USER_SEARCH_BASE = os.environ.get('AUTH_LDAP_USER_SEARCH_BASE', 'DC=example,DC=com')
+AUTH_LDAP_USER_SEARCH_FILTER = os.environ.get('AUTH_LDAP_USER_SEARCH_FILTER', '(sAMAccountName=%(user)s)')
+# Network timeout: configurable via env var, default 5 seconds for faster fallback
+# when LDAP server is unreachable. Increase if you have slow network.
+AUTH_LDAP_NETWORK_TIMEOUT = int(os.environ.get('AUTH_LDAP_NETWORK_TIMEOUT', '5'))
+
+# Login backend (api/ldap_auth.py): service connections kept open per worker process,
+# consecutive directory failures before the circuit breaker opens, and seconds logins
+# fail fast (HTTP 503) before the directory is tried again
+AUTH_LDAP_POOL_SIZE = int(os.environ.get('AUTH_LDAP_POOL_SIZE', '4'))
+AUTH_LDAP_BREAKER_FAILURES = int(os.environ.get('AUTH_LDAP_BREAKER_FAILURES', '3'))
+AUTH_LDAP_BREAKER_RESET_SECONDS = int(os.environ.get('AUTH_LDAP_BREAKER_RESET_SECONDS', '30'))
+# Pooled connections idle for longer than this are closed instead of reused; keep it
+# below the domain controllers' MaxConnIdleTime (900 seconds by default)
+AUTH_LDAP_POOL_MAX_IDLE_SECONDS = int(os.environ.get('AUTH_LDAP_POOL_MAX_IDLE_SECONDS', '300'))
+# Logins skip rewriting the user and its groups while the directory attributes match the
+# fingerprint stored at a previous login no older than this many seconds (0 always rewrites)
+AUTH_LDAP_FINGERPRINT_MAX_AGE = int(os.environ.get('AUTH_LDAP_FINGERPRINT_MAX_AGE', '86400'))
+
+# sync_ldap_users --incremental falls back to a full sync (which also detects
+# deleted users) when the last full sync is older than this many hours
+AUTH_LDAP_FULL_SYNC_INTERVAL_HOURS = int(os.environ.get('AUTH_LDAP_FULL_SYNC_INTERVAL_HOURS', '24'))
+
+# AD group name -> Django group name for api.ldap_sync.sync_user_relations; AD groups
+# not listed keep their own name. Logins and sync_ldap_users --sync-groups mirror the
+# AD names unmapped, so existing group ACLs keep working.
+# AUTH_LDAP_GROUP_MAPPING (JSON object) adds entries or overrides these.
+AUTH_LDAP_GROUP_MAPPING = {
+    # HR and Management
+    'HR_Managers': 'HR_Managers',
+    'Gerentes_RH': 'HR_Managers',
+    'Department_Managers': 'Department_Managers',
+    'Gerentes_Departamento': 'Department_Managers',
+    # Communications
+    'Communications': 'Communications',
+    'Comunicaciones': 'Communications',
+    # Document Management
+    'Document_Managers': 'Document_Managers',
+    'Administradores_Documentos': 'Document_Managers',
+    # Resource Management
+    'Resource_Managers': 'Resource_Managers',
+    'Administradores_Recursos': 'Resource_Managers',
+    'Facilities': 'Facilities',
+    'Instalaciones': 'Facilities',
+    # Training
+    'Training_Managers': 'Training_Managers',
+    'Administradores_Capacitacion': 'Training_Managers',
+    # Project Management
+    'Project_Managers': 'Project_Managers',
+    'Gerentes_Proyecto': 'Project_Managers',
+}
+AUTH_LDAP_GROUP_MAPPING.update(json.loads(os.environ.get('AUTH_LDAP_GROUP_MAPPING', '{}')))
 
 # Configure django-auth-ldap if available and server URI is set
 if HAS_DJANGO_AUTH_LDAP and AUTH_LDAP_SERVER_URI:
@@ -242,9 +365,7 @@ if HAS_DJANGO_AUTH_LDAP and AUTH_LDAP_SERVER_URI:
     
     # Connection options to fix "Strong(er) authentication required" error
     # and support both LDAP and LDAPS connections
-    # Network timeout: configurable via env var, default 5 seconds for faster fallback
-    # when LDAP server is unreachable. Increase if you have slow network.
-    ldap_timeout = int(os.environ.get('AUTH_LDAP_NETWORK_TIMEOUT', '5'))
+    ldap_timeout = AUTH_LDAP_NETWORK_TIMEOUT
     AUTH_LDAP_CONNECTION_OPTIONS = {
         ldap.OPT_X_TLS_REQUIRE_CERT: ldap.OPT_X_TLS_NEVER,  # For self-signed certs
         ldap.OPT_REFERRALS: 0,  # Disable referrals (recommended for AD)
@@ -267,9 +388,9 @@ if HAS_DJANGO_AUTH_LDAP and AUTH_LDAP_SERVER_URI:
     
     # User Search
     AUTH_LDAP_USER_SEARCH = LDAPSearch(
-        os.environ.get('AUTH_LDAP_USER_SEARCH_BASE', 'DC=example,DC=com'),
+        AUTH_LDAP_USER_SEARCH_BASE,
         ldap.SCOPE_SUBTREE,
-        os.environ.get('AUTH_LDAP_USER_SEARCH_FILTER', '(sAMAccountName=%(user)s)')
+        AUTH_LDAP_USER_SEARCH_FILTER
     )
     
     # Map LDAP attributes to Django user fields
@@ -298,10 +419,13 @@ if HAS_DJANGO_AUTH_LDAP and AUTH_LDAP_SERVER_URI:
     
     # Update user profile on every login
     AUTH_LDAP_ALWAYS_UPDATE_USER = True
-    
-    # Authentication backends
+
+# Authentication backends. Active Directory logins go through the pooled ldap3
+# backend (api/ldap_auth.py), which follows the search, attribute map and group
+# mirroring configured above; local accounts fall back to ModelBackend.
+if AUTH_LDAP_SERVER_URI:
     AUTHENTICATION_BACKENDS = [
-        'django_auth_ldap.backend.LDAPBackend',
+        'api.ldap_auth.PooledLDAPBackend',
         'django.contrib.auth.backends.ModelBackend',
     ]
 else:
@@ -309,4 +433,3 @@ else:
     AUTHENTICATION_BACKENDS = [
         'django.contrib.auth.backends.ModelBackend',
     ]
-
@@ -31,9 +31,16 @@ export default function ForumPage() {
   }, [fetchPosts]);
 
   const handleToggleLike = async (postId: number) => {
-    const response = await forumPostApi.toggleLike(postId);
-    if (response.data) {
-      setPosts(posts.map(p => p.id === postId ? response.data as ForumPost : p));
+    const post = posts.find(p => p.id === postId);
+    const response = post?.user_has_liked
+      ? await forumPostApi.unlike(postId)
+      : await forumPostApi.like(postId);
+    const result = response.data;
+    if (result) {
+      setPosts(current => current.map(p => p.id === postId
+        ? { ...p, user_has_liked: result.liked, likes_count: result.likes_count }
+        : p
+      ));
     }
   };
 
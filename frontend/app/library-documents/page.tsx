@@ -60,11 +60,8 @@ export default function LibraryDocumentsPage() {
 
   const handleDownload = async (doc: LibraryDocument) => {
     if (doc.file) {
-      // Increment download counter
-      await libraryDocumentApi.incrementDownload(doc.id);
-      
-      // Open file in new tab
-      window.open(doc.file, '_blank');
+      // Protected download endpoint: checks group access and counts the download
+      window.open(libraryDocumentApi.downloadUrl(doc.id), '_blank');
     }
   };
 
@@ -1,4 +1,4 @@
-import { fetchApi } from "./client";
+import { API_BASE_URL, fetchApi } from "./client";
 import {
   LibraryDocument,
   Policy,
@@ -167,15 +167,18 @@ export const libraryDocumentApi = {
     });
   },
   incrementView: async (id: number) => {
-    return fetchApi<LibraryDocument>(
+    return fetchApi<{ id: number; view_count: number }>(
       `/api/library-documents/${id}/increment_view/`,
       {
         method: "POST",
       }
     );
   },
+  downloadUrl: (id: number) => {
+    return `${API_BASE_URL}/api/library-documents/${id}/download/`;
+  },
   incrementDownload: async (id: number) => {
-    return fetchApi<LibraryDocument>(
+    return fetchApi<{ id: number; download_count: number }>(
       `/api/library-documents/${id}/increment_download/`,
       {
         method: "POST",
@@ -958,7 +961,7 @@ export const forumPostApi = {
     });
   },
   incrementViews: async (id: number) => {
-    return fetchApi<ForumPost>(`/api/forum-posts/${id}/increment_views/`, {
+    return fetchApi<{ id: number; views_count: number }>(`/api/forum-posts/${id}/increment_views/`, {
       method: "POST",
     });
   },
@@ -977,4 +980,14 @@ export const forumPostApi = {
       method: "POST",
     });
   },
+  like: async (id: number) => {
+    return fetchApi<{ id: number; liked: boolean; likes_count: number }>(`/api/forum-posts/${id}/like/`, {
+      method: "POST",
+    });
+  },
+  unlike: async (id: number) => {
+    return fetchApi<{ id: number; liked: boolean; likes_count: number }>(`/api/forum-posts/${id}/unlike/`, {
+      method: "POST",
+    });
+  },
 };
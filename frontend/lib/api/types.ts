@@ -4,7 +4,8 @@ export interface ApiResponse<T> {
 }
 
 export interface PaginatedResponse<T> {
-  count: number;
+  // null when the request used ?count=false
+  count: number | null;
   next: string | null;
   previous: string | null;
   results: T[];
@@ -406,6 +407,7 @@ export interface ForumPost {
   likes_count: number;
   user_has_liked: boolean;
   replies_count: number;
+  last_reply_at: string | null;
   created_at: string;
   updated_at: string;
 }
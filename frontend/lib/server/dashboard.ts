@@ -16,53 +16,32 @@ export async function getDashboardData(): Promise<DashboardData> {
     .map((c: any) => `${c.name}=${c.value}`)
     .join("; ");
 
-  const employeesReq = fetch(`${API_BASE_URL}/api/metrics/active-employees/`);
-  const docsReq = fetch(`${API_BASE_URL}/api/metrics/documents-count/`);
-  const userReq = fetch(`${API_BASE_URL}/api/auth/me/`, {
-    headers: cookieHeader ? { cookie: cookieHeader } : undefined,
-    cache: "no-store",
-  });
-
-  const [employeesRes, docsRes, userRes] = await Promise.all([
-    employeesReq,
-    docsReq,
-    userReq.catch(() => null),
-  ]);
-
   let activeEmployeesCount = 0;
   let activeEmployeesPercentChange: number | null = null;
   let activeEmployeesIsPositive: boolean | null = null;
   let documentsCount = 0;
   let userGroups: string[] | null = null;
 
-  try {
-    if (employeesRes && employeesRes.ok) {
-      const data = await employeesRes.json();
-      activeEmployeesCount = data?.count ?? 0;
-      activeEmployeesPercentChange = data?.percent_change ?? null;
-      activeEmployeesIsPositive =
-        typeof data?.is_positive === "boolean" ? data.is_positive : null;
-    }
-  } catch (e) {
-    // swallow
-  }
-
-  try {
-    if (docsRes && docsRes.ok) {
-      const data = await docsRes.json();
-      documentsCount = data?.count ?? 0;
-    }
-  } catch (e) {
-    // swallow
-  }
+  // One request for every figure of the home page (user, headcount, documents)
+  const res = await fetch(`${API_BASE_URL}/api/dashboard/`, {
+    headers: cookieHeader ? { cookie: cookieHeader } : undefined,
+    cache: "no-store",
+  }).catch(() => null);
 
   try {
-    if (userRes && userRes.ok) {
-      const data = await userRes.json();
+    if (res && res.ok) {
+      const data = await res.json();
+      activeEmployeesCount = data?.headcount?.count ?? 0;
+      activeEmployeesPercentChange = data?.headcount?.percent_change ?? null;
+      activeEmployeesIsPositive =
+        typeof data?.headcount?.is_positive === "boolean"
+          ? data.headcount.is_positive
+          : null;
+      documentsCount = data?.documents?.count ?? 0;
       userGroups = data?.user?.groups ?? null;
     }
   } catch (e) {
-    userGroups = null;
+    // swallow
   }
 
   return {